@@ -0,0 +1,15 @@
+"""
+Performance Benchmarks
+
+Run from the project root:
+
+    python -m benchmarks                      # compare against the stored baseline
+    python -m benchmarks --update-baseline    # re-record the baseline
+    python -m benchmarks -k 'http.*' -k 'ai.move[master*'
+
+Benchmarks run against a throwaway test database seeded by benchmarks.data.
+Each one records p50/p95/p99 time and queries per call. The run fails
+(exit status 1) if any benchmark's queries per call went up, or its p50
+grew by more than --threshold over the baseline in
+benchmarks/baselines/<database vendor>.json.
+"""
@@ -0,0 +1,124 @@
+import argparse
+import os
+import sys
+import warnings
+from pathlib import Path
+
+BASELINE_DIR = Path(__file__).resolve().parent / 'baselines'
+CONFIRM_RETRIES = 2  # Re-measurements of a suspected slowdown before it fails the run
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Run the performance benchmarks')
+    parser.add_argument('-k', dest='patterns', action='append',
+                        help='Only run benchmarks matching this glob (repeatable)')
+    parser.add_argument('--baseline', help='Baseline JSON (default: baselines/<database vendor>.json)')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Write this run as the new baseline instead of comparing')
+    parser.add_argument('--threshold', type=float, default=0.50,
+                        help='Allowed p50 slowdown as a fraction of the baseline (default: 0.50)')
+    parser.add_argument('--min-delta-us', type=float, default=5.0,
+                        help='Ignore p50 slowdowns smaller than this many microseconds (default: 5)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiply every benchmark\'s iteration count (default: 1.0)')
+    parser.add_argument('--rounds', type=int, default=5,
+                        help='Timing rounds per benchmark; p50 is the best round\'s median (default: 5)')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Run everything this many times and keep each benchmark\'s median run (default: 1; '
+                             'use 3+ when recording a baseline)')
+    parser.add_argument('--output', help='Also write this run\'s results to a JSON file')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rps_project.settings')
+
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.db import connection
+
+    from game import analytics, profiles
+    from . import cases  # noqa: F401 - registers the benchmarks
+    from . import data, harness
+
+    settings.DEBUG = False
+    warnings.filterwarnings('ignore', message='No directory at')  # collectstatic output isn't needed
+    # No background buffer flushes: run() flushes between benchmarks, so queries per call are stable
+    analytics.FLUSH_EVERY = profiles.FLUSH_EVERY = float('inf')
+    analytics.FLUSH_INTERVAL = profiles.FLUSH_INTERVAL = float('inf')
+    analytics.flusher.interval = profiles.flusher.interval = None
+    # Likewise no round deadlines firing mid-run (benchmarks/deadlines.py measures those)
+    settings.ROUND_DEADLINES = False
+
+    baseline_path = Path(args.baseline) if args.baseline else BASELINE_DIR / f'{connection.vendor}.json'
+    benches = harness.selected(args.patterns)
+    if not benches:
+        sys.exit('No benchmarks match')
+
+    baseline = {}
+    if not args.update_baseline:
+        if baseline_path.exists():
+            baseline = harness.load_baseline(baseline_path)['benchmarks']
+        else:
+            print(f'No baseline at {baseline_path}; run with --update-baseline to record one')
+
+    def run(selection, repeat):
+        runs = {bench.name: [] for bench in selection}
+        for _ in range(repeat):
+            for bench in selection:
+                runs[bench.name].append(harness.measure(bench, args.scale, max(args.rounds, 1)))
+                analytics.flush()
+                profiles.flush()
+        return {name: harness.median_run(measured) for name, measured in runs.items()}
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        cache.clear()
+        data.seed()
+        results = run(benches, max(args.repeat, 1))
+        found = harness.regressions(results, baseline, args.threshold, args.min_delta_us)
+        # Confirm slowdowns before failing: re-measure and keep the better run.
+        # Query count regressions are deterministic and are not retried.
+        for _ in range(CONFIRM_RETRIES):
+            suspects = [bench for bench in benches
+                        if any(line.startswith(f'{bench.name}: p50') for line in found)]
+            if not suspects:
+                break
+            for name, result in run(suspects, 1).items():
+                if result['p50_us'] < results[name]['p50_us']:
+                    results[name] = result
+            found = harness.regressions(results, baseline, args.threshold, args.min_delta_us)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print(f"{'benchmark':<36}{'p50 us':>11}{'p95 us':>11}{'p99 us':>11}{'queries':>9}")
+    for name, result in results.items():
+        print(f"{name:<36}{result['p50_us']:>11.1f}{result['p95_us']:>11.1f}"
+              f"{result['p99_us']:>11.1f}{result['queries']:>9.2f}")
+
+    if args.output:
+        harness.save_baseline(args.output, results)
+
+    if args.update_baseline:
+        stored = harness.load_baseline(baseline_path)['benchmarks'] if baseline_path.exists() else {}
+        stored.update(results)
+        harness.save_baseline(baseline_path, stored)
+        print(f'Baseline written to {baseline_path}')
+        return
+
+    if found:
+        print(f'\n{len(found)} regression(s) against {baseline_path}:')
+        for line in found:
+            print(f'  {line}')
+        sys.exit(1)
+    if baseline:
+        print(f'\nNo regressions against {baseline_path}')
+
+if __name__ == '__main__':
+    main()
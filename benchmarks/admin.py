@@ -0,0 +1,211 @@
+"""
+Admin changelists on a big seeded database:
+
+    python -m benchmarks.admin
+    python -m benchmarks.admin --rounds 100000000 --database /data/admin.sqlite3 --stock
+
+Seeds players, sessions with --rounds rounds in all, online games and queue
+entries with seed_data, spread over --days days, into a file-backed SQLite
+database. The seeding runs before the admin indexes migration (0016), and
+that migration is then timed, i.e. adding the indexes to a full table. With
+--database the file is kept, and a later run reuses it instead of seeding
+again (100M rounds take ~20 minutes to seed and ~8 GB).
+
+Then a staff user loads each changelist through the test client: the plain
+list, a deep page, a filter, a date hierarchy drill-down to year, month and
+day, and the round change form (raw id widget). Reported per page: the
+database statements and the time of the first (cold) load and the median of
+--repeat more. --stock also loads each page once with the same columns,
+filters and date hierarchy on a stock ModelAdmin: exact counts, SELECT
+DISTINCT filter values, the stock date hierarchy and no joins.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+
+from .harness import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.admin',
+                                     description='Statements and load time of the admin changelists on big tables')
+    parser.add_argument('--rounds', type=int, default=1000000, help='Game rounds to seed (default: 1000000)')
+    parser.add_argument('--players', type=int, default=100000, help='Players to seed (default: 100000)')
+    parser.add_argument('--days', type=int, default=730, help='Spread timestamps over this many days (default: 730)')
+    parser.add_argument('--workers', type=int, default=1, help='seed_data worker processes (default: 1)')
+    parser.add_argument('--database', help='SQLite file to seed, or to reuse if it exists (default: a temporary one)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed loads per page after the first (default: 5)')
+    parser.add_argument('--stock', action='store_true', help='Also load every page once on stock ModelAdmins')
+    parser.add_argument('--output', help='Also write the results to a JSON file')
+    return parser.parse_args()
+
+
+def prepare(args, fresh):
+    """Migrate, seed (unless reusing) and add the admin indexes; returns their migration time in seconds"""
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    if not fresh:
+        return None
+    call_command('migrate', 'game', '0015', verbosity=0)
+    rounds_per_session = 20
+    print(f'seeding {args.rounds:,} rounds...', flush=True)
+    began = time.perf_counter()
+    call_command(
+        'seed_data', players=args.players, sessions=int(args.rounds / (rounds_per_session + 0.5)),
+        rounds_per_session=rounds_per_session, online_games=max(args.rounds // 1000, 1000), queue=10000,
+        days=args.days, workers=args.workers, batch_size=20000, stdout=io.StringIO(),
+    )
+    print(f'seeded in {time.perf_counter() - began:.0f}s', flush=True)
+    began = time.perf_counter()
+    call_command('migrate', 'game', verbosity=0)
+    return time.perf_counter() - began
+
+
+def pages():
+    """(model, admin, page, url) for every page loaded"""
+    from game.admin import estimated_count, first_value
+    from game.models import GameRound, GameSession, MatchmakingQueue, OnlineGame, Player
+
+    pages = []
+    for model, filter_query in (
+        (Player, None),
+        (GameSession, 'mode__exact=classic'),
+        (GameRound, 'result__exact=win'),
+        (OnlineGame, 'status__exact=finished'),
+        (MatchmakingQueue, 'status__exact=searching'),
+    ):
+        name = model._meta.model_name
+        base = f'/admin/game/{name}/'
+        pages.append((model, name, 'list', base))
+        if (estimated_count(model.objects.all()) or 0) > 50 * 100:
+            pages.append((model, name, 'page 50', f'{base}?p=50'))
+        if filter_query:
+            pages.append((model, name, 'filter', f'{base}?{filter_query}'))
+        latest = first_value(model.objects.all(), 'created_at', descending=True)
+        year = f'{base}?created_at__year={latest.year}'
+        pages += [
+            (model, name, 'year', year),
+            (model, name, 'month', f'{year}&created_at__month={latest.month}'),
+            (model, name, 'day', f'{year}&created_at__month={latest.month}&created_at__day={latest.day}'),
+        ]
+    round_id = first_value(GameRound.objects.all(), 'pk', descending=True)
+    pages.append((GameRound, 'gameround', 'change form', f'/admin/game/gameround/{round_id}/change/'))
+    return pages
+
+
+@contextmanager
+def stock(model_admin):
+    """Run the registered ModelAdmin with stock changelist behaviour, keeping its columns, filters and date hierarchy"""
+    from django.contrib import admin
+    from django.core.paginator import Paginator
+
+    overrides = {
+        'paginator': Paginator,
+        'show_full_result_count': True,
+        'list_select_related': False,
+        'list_filter': [item[0] if isinstance(item, tuple) else item for item in model_admin.list_filter],
+        'ordering': None,
+        'sortable_by': None,
+        'get_queryset': partial(admin.ModelAdmin.get_queryset, model_admin),
+    }
+    vars(model_admin).update(overrides)  # The admin URLs are bound to this instance
+    try:
+        yield
+    finally:
+        for name in overrides:
+            del vars(model_admin)[name]
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def load(client, url, connection):
+    """(statements, seconds) of one page load"""
+    counter = StatementCounter()
+    began = time.perf_counter()
+    with connection.execute_wrapper(counter):
+        response = client.get(url)
+    elapsed = time.perf_counter() - began
+    assert response.status_code == 200, (url, response.status_code)
+    return counter.count, elapsed
+
+
+def run(args):
+    from django.contrib import admin
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+
+    user, _ = User.objects.get_or_create(username='bench-admin', defaults={'is_staff': True, 'is_superuser': True})
+    client = Client()
+    client.force_login(user)
+    results = []
+    for model, name, page, url in pages():
+        statements, cold = load(client, url, connection)
+        warm = sorted(load(client, url, connection)[1] for _ in range(args.repeat))
+        row = {'admin': name, 'page': page, 'url': url, 'statements': statements,
+               'cold_ms': round(cold * 1000, 1), 'warm_p50_ms': round(percentile(warm, 50) * 1000, 1)}
+        if args.stock:
+            with stock(admin.site._registry[model]):
+                row['stock_statements'], stock_time = load(client, url, connection)
+            row['stock_ms'] = round(stock_time * 1000, 1)
+        results.append(row)
+        print(f'{name:18}{page:13}{statements:>6}{row["cold_ms"]:>10.1f}{row["warm_p50_ms"]:>10.1f}'
+              + (f'{row["stock_statements"]:>8}{row["stock_ms"]:>12.1f}' if args.stock else ''), flush=True)
+    return results
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.database or f'{tmp}/admin.sqlite3').resolve()
+        fresh = not path.exists()
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rps_project.settings')
+        sys.path.insert(0, str(ROOT))
+
+        import django
+        django.setup()
+
+        from django.conf import settings
+        from django.db import connection
+
+        from game.models import GameRound
+
+        settings.DEBUG = False
+        warnings.filterwarnings('ignore', message='No directory at')  # collectstatic output isn't needed
+        index_seconds = prepare(args, fresh)
+        rounds = GameRound.objects.count()
+        if index_seconds is not None:
+            print(f'admin indexes added in {index_seconds:.0f}s')
+        print(f'{rounds:,} rounds')
+        print(f'{"admin":18}{"page":13}{"stmts":>6}{"cold ms":>10}{"warm ms":>10}'
+              + (f'{"stock":>8}{"stock ms":>12}' if args.stock else ''))
+        results = run(args)
+        connection.close()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(
+            {'rounds': rounds, 'index_migration_s': index_seconds, 'pages': results}, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""
+Benchmark Cases
+
+Hot paths of the game, grouped by prefix:
+- rules.*: determine_winner / get_win_reason over every pair of elements
+- ai.*: one AI move (get_choice + add_to_history) per difficulty and history length
+- http.*: API requests through the Django test client, against the seeded data
+"""
+
+import itertools
+import json
+import uuid
+
+from django.core.cache import cache
+from django.test import Client
+
+from game import rankings
+from game.game_logic import (
+    FULL_ELEMENTS, GameAI, beats, determine_winner, get_elements_for_mode, get_win_reason,
+)
+from game.models import OnlineGame
+
+from .harness import benchmark
+
+PAIRS = list(itertools.product(FULL_ELEMENTS, FULL_ELEMENTS))
+WINNING_PAIRS = [(a, b) for a, b in PAIRS if beats(a, b)]
+
+
+@benchmark('rules.determine_winner[x100]', iterations=2000)
+def bench_determine_winner():
+    def call():
+        for player_choice, ai_choice in PAIRS:
+            determine_winner(player_choice, ai_choice)
+    return call
+
+
+@benchmark('rules.get_win_reason[x100]', iterations=2000)
+def bench_get_win_reason():
+    pairs = list(itertools.islice(itertools.cycle(WINNING_PAIRS), 100))
+
+    def call():
+        for winner, loser in pairs:
+            get_win_reason(winner, loser)
+    return call
+
+
+def _ai_move(difficulty, history):
+    def prepare():
+        elements = get_elements_for_mode('classic')
+        moves = itertools.cycle(['rock', 'rock', 'paper', 'scissors', 'paper'])
+        ai = GameAI(difficulty, seed=1)
+        for _ in range(history):
+            ai.get_choice(elements)
+            ai.add_to_history(next(moves))
+
+        def call():
+            ai.get_choice(elements)
+            ai.add_to_history(next(moves))
+        return call
+    return prepare
+
+
+for _difficulty in ('normal', 'hard', 'veteran', 'master'):
+    for _history in (10, 100):
+        benchmark(f'ai.move[{_difficulty},h={_history}]', iterations=2000)(_ai_move(_difficulty, _history))
+
+
+def _post(client, path, payload):
+    response = client.post(path, json.dumps(payload), content_type='application/json')
+    assert response.status_code == 200, (path, response.status_code, response.content[:200])
+    return response
+
+
+@benchmark('http.play_round[anonymous]')
+def bench_play_round():
+    client = Client()
+    moves = itertools.cycle(['rock', 'paper', 'scissors'])
+    return lambda: _post(client, '/api/play/', {
+        'choice': next(moves), 'difficulty': 'veteran', 'session_id': 'bench-anon', 'seed': 1,
+    })
+
+
+@benchmark('http.play_round[named]')
+def bench_play_round_named():
+    client = Client()
+    moves = itertools.cycle(['rock', 'paper', 'scissors'])
+    return lambda: _post(client, '/api/play/', {
+        'choice': next(moves), 'difficulty': 'hard', 'session_id': 'bench-named',
+        'player_name': 'bench-00042', 'seed': 1,
+    })
+
+
+@benchmark('http.play_session[named,100]', iterations=20, warmup=1)
+def bench_play_session():
+    # A named player's whole session, round by round, sending the token back like game.html. Each
+    # round is 5 statements on SQLite: BEGIN IMMEDIATE, the Player UPDATE, INSERT OR IGNORE and UPDATE
+    # of the windowed scores, and the SELECT of the player card with its live rank. The first round
+    # also records the session for replay (BEGIN + INSERT).
+    client = Client()
+    moves = ['rock', 'paper', 'scissors', 'rock'] * 25
+
+    def call():
+        payload = {'difficulty': 'hard', 'session_id': f'bench-{uuid.uuid4().hex[:12]}', 'player_name': 'bench-00044'}
+        for move in moves:
+            data = json.loads(_post(client, '/api/play/', {**payload, 'choice': move}).content)
+            payload['player_token'] = data['player_data']['player_token']
+    return call
+
+
+@benchmark('http.play_batch[named,100]', iterations=50, warmup=2)
+def bench_play_batch():
+    client = Client()
+    moves = ['rock', 'paper', 'scissors', 'rock'] * 25
+    return lambda: _post(client, '/api/play/batch/', {
+        'moves': moves, 'difficulty': 'master', 'session_id': 'bench-batch',
+        'player_name': 'bench-00043', 'seed': 1,
+    })
+
+
+@benchmark('http.join_matchmaking[match]')
+def bench_join_matchmaking():
+    client = Client()
+
+    def setup():
+        waiting = f'bench-{uuid.uuid4().hex[:12]}'
+        _post(client, '/api/matchmaking/join/', {'player_id': waiting, 'player_name': 'Waiting'})
+        return f'bench-{uuid.uuid4().hex[:12]}'
+
+    def call(player_id):
+        _post(client, '/api/matchmaking/join/', {'player_id': player_id, 'player_name': 'Joining'})
+    return setup, call
+
+
+def _new_game():
+    game_id = str(uuid.uuid4())
+    OnlineGame.objects.create(
+        game_id=game_id, mode='classic', status='playing',
+        player1_id='bench-p1', player1_name='Bench One',
+        player2_id='bench-p2', player2_name='Bench Two',
+    )
+    return game_id
+
+
+@benchmark('http.get_game_state')
+def bench_get_game_state():
+    client = Client()
+    game_id = _new_game()
+    return lambda: _post(client, '/api/game/state/', {'game_id': game_id, 'player_id': 'bench-p1'})
+
+
+@benchmark('http.make_choice[resolve round]')
+def bench_make_choice():
+    client = Client()
+
+    def setup():
+        game_id = _new_game()
+        _post(client, '/api/game/choice/', {'game_id': game_id, 'player_id': 'bench-p1', 'choice': 'rock'})
+        return game_id
+
+    def call(game_id):
+        _post(client, '/api/game/choice/', {'game_id': game_id, 'player_id': 'bench-p2', 'choice': 'scissors'})
+    return setup, call
+
+
+@benchmark('http.spectate[poll]')
+def bench_spectate():
+    client = Client()
+    game_id = _new_game()
+    return lambda: client.get('/api/game/spectate/', {'game_id': game_id})
+
+
+def _leaderboard(params):
+    def prepare():
+        client = Client()
+
+        def setup():
+            rankings.bump_score_version()  # Skip the page cache: measure the queries
+
+        def call(_):
+            response = client.get('/api/leaderboard/', params)
+            assert response.status_code == 200, response.content[:200]
+        return setup, call
+    return prepare
+
+
+benchmark('http.leaderboard[first page]')(_leaderboard({}))
+benchmark('http.leaderboard[around]')(_leaderboard({'around': 'bench-05000'}))
+benchmark('http.leaderboard[weekly]')(_leaderboard({'window': 'weekly'}))
+
+
+@benchmark('http.leaderboard[cached]')
+def bench_leaderboard_cached():
+    client = Client()
+    cache.clear()
+    return lambda: client.get('/api/leaderboard/', {'limit': 25})
+
+
+@benchmark('http.leaderboard_page', iterations=50, warmup=2)
+def bench_leaderboard_page():
+    client = Client()
+    return lambda: client.get('/leaderboard/')
+
+
+@benchmark('http.home', iterations=100)
+def bench_home():
+    client = Client()
+    return lambda: client.get('/')
+
+
+@benchmark('http.play_page', iterations=100)
+def bench_play_page():
+    client = Client()
+    return lambda: client.get('/play/', {'mode': 'full', 'difficulty': 'hard', 'player': 'bench-00042'})
+
+
+@benchmark('http.rules', iterations=100)
+def bench_rules():
+    client = Client()
+    return lambda: client.get('/rules/')
@@ -0,0 +1,363 @@
+"""
+Concurrent PvP load against file-backed SQLite databases, comparing the stock
+('default') and 'tuned' SQLite profiles (see game/sqlite.py), and optionally
+one database file for everything ('single') against game-state tables and
+leaderboard reads split off onto their own files ('split', see game/routers.py):
+
+    python -m benchmarks.concurrency
+    python -m benchmarks.concurrency --games 20,40,80 --workers 4 --duration 20
+    python -m benchmarks.concurrency --profiles tuned --layouts single,split --solo 20 --readers 10
+
+Each profile gets a fresh, migrated database. For each game count, --workers
+processes (standing in for gunicorn workers) share the games, and every game
+has two player threads that behave like pvp.html: poll /api/game/state/
+every --poll seconds, choose as soon as a round opens, ask for the next round
+once it is resolved, and start a new game when one ends. Alongside them,
+--solo single-player clients play a named round and --readers clients load
+the leaderboard page, each once per --poll seconds. A game count is
+sustained when no request failed and p95 latency stayed within --max-p95-ms.
+The split layout's replica is copied from the primary once, before the runs.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from .harness import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+CHOICES = ('rock', 'paper', 'scissors')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.concurrency',
+                                     description='Concurrent PvP games on SQLite: default vs tuned profile')
+    parser.add_argument('--games', default='10,20,40,80',
+                        help='Comma-separated concurrent game counts to try (default: 10,20,40,80)')
+    parser.add_argument('--profiles', default='default,tuned',
+                        help='SQLite profiles to compare (default: default,tuned)')
+    parser.add_argument('--layouts', default='single',
+                        help='Database layouts to compare: single, split (default: single)')
+    parser.add_argument('--solo', type=int, default=0,
+                        help='Concurrent single-player clients, writing Player rows (default: 0)')
+    parser.add_argument('--readers', type=int, default=0,
+                        help='Concurrent leaderboard page readers (default: 0)')
+    parser.add_argument('--seed-players', type=int, default=10000,
+                        help='Players seeded before the runs, for the leaderboard to scan (default: 10000)')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes (default: 2)')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per game count (default: 10)')
+    parser.add_argument('--poll', type=float, default=1.0,
+                        help='Seconds between state polls per player, as in pvp.html (default: 1.0)')
+    parser.add_argument('--max-p95-ms', type=float, default=250,
+                        help='p95 request latency a sustained game count must stay within (default: 250)')
+    parser.add_argument('--output', help='Also write the results to a JSON file')
+    # Internal: run one worker process's share of the games
+    parser.add_argument('--worker-games', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--worker-solo', type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument('--worker-readers', type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument('--worker-seed', type=int, default=0, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = Counter()
+        self.rounds = 0
+        self.games = 0
+        self.forfeits = 0
+
+    def record(self, kind, elapsed_ms, error=None):
+        with self.lock:
+            self.latencies.setdefault(kind, []).append(elapsed_ms)
+            if error:
+                self.errors[f'{kind}: {error}'[:120]] += 1
+
+    def count(self, field):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def to_json(self):
+        return {
+            'latencies': self.latencies, 'errors': dict(self.errors),
+            'rounds': self.rounds, 'games': self.games, 'forfeits': self.forfeits,
+        }
+
+
+class Slot:
+    """One of a worker's concurrent games; player one replaces it when it ends"""
+
+    def __init__(self, new_game):
+        self.new_game = new_game
+        self.game_id = new_game()
+        self.changed = threading.Condition()
+
+    def replace(self):
+        game_id = self.new_game()
+        with self.changed:
+            self.game_id = game_id
+            self.changed.notify_all()
+
+    def next_game(self, finished_id, stop_at):
+        with self.changed:
+            self.changed.wait_for(lambda: self.game_id != finished_id, timeout=max(stop_at - time.monotonic(), 0))
+            return self.game_id
+
+
+def _request(client, stats, kind, path, payload=None):
+    started = time.perf_counter()
+    try:
+        if payload is None:
+            response = client.get(path)
+        else:
+            response = client.post(path, json.dumps(payload), content_type='application/json')
+    except Exception as exc:  # Raised by the test client instead of a 500 response
+        stats.record(kind, (time.perf_counter() - started) * 1000, f'{type(exc).__name__}: {exc}')
+        return None
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if response.status_code != 200:
+        error = response.json().get('error', '') if payload is not None else ''
+        stats.record(kind, elapsed_ms, f'{response.status_code} {error}')
+        return None
+    stats.record(kind, elapsed_ms)
+    return response.json() if payload is not None else True
+
+
+def _play(slot, seat, stats, stop_at, poll, seed):
+    from django.db import connection
+    from django.test import Client
+
+    client = Client()
+    rng = random.Random(seed)
+    player_id = f'load-p{seat}'
+    game_id = slot.game_id
+    counted_round = asked_next = None
+    time.sleep(rng.uniform(0, poll))  # Spread the polls out like real clients
+    try:
+        while time.monotonic() < stop_at:
+            started = time.monotonic()
+            payload = {'game_id': game_id, 'player_id': player_id}
+            state = _request(client, stats, 'state', '/api/game/state/', payload)
+            if state:
+                status, current = state['status'], state['current_round']
+                if seat == 1 and status in ('round_complete', 'finished') and counted_round != current:
+                    counted_round = current
+                    stats.count('rounds')
+                if status == 'playing' and not state['you_chose']:
+                    _request(client, stats, 'choice', '/api/game/choice/', {**payload, 'choice': rng.choice(CHOICES)})
+                elif status == 'round_complete' and asked_next != current:
+                    asked_next = current
+                    _request(client, stats, 'next', '/api/game/next/', payload)
+                elif status in ('finished', 'forfeit'):
+                    if seat == 1:
+                        stats.count('games')
+                        if status == 'forfeit':
+                            stats.count('forfeits')
+                        try:
+                            slot.replace()
+                        except Exception as exc:
+                            stats.record('new game', 0, f'{type(exc).__name__}: {exc}')
+                    game_id = slot.next_game(game_id, stop_at)
+                    counted_round = asked_next = None
+                    continue
+            time.sleep(max(poll - (time.monotonic() - started), 0))
+    finally:
+        connection.close()
+
+
+def _every(poll, stop_at, seed, action):
+    """Call action(client, rng) once per poll seconds until stop_at"""
+    from django.db import connection
+    from django.test import Client
+
+    client = Client()
+    rng = random.Random(seed)
+    time.sleep(rng.uniform(0, poll))
+    try:
+        while time.monotonic() < stop_at:
+            started = time.monotonic()
+            action(client, rng)
+            time.sleep(max(poll - (time.monotonic() - started), 0))
+    finally:
+        connection.close()
+
+
+def _solo(name, stats):
+    def action(client, rng):
+        _request(client, stats, 'play', '/api/play/', {
+            'choice': rng.choice(CHOICES), 'difficulty': 'hard', 'session_id': name, 'player_name': name,
+        })
+    return action
+
+
+def _reader(stats):
+    def action(client, rng):
+        _request(client, stats, 'leaderboard', '/leaderboard/')
+    return action
+
+
+def run_worker(args):
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rps_project.settings')
+
+    import django
+    django.setup()
+
+    from django.db import connection
+    from game.models import OnlineGame
+
+    def new_game():
+        game_id = str(uuid.uuid4())
+        OnlineGame.objects.create(
+            game_id=game_id, mode='classic', status='playing',
+            player1_id='load-p1', player1_name='Load One',
+            player2_id='load-p2', player2_name='Load Two',
+        )
+        return game_id
+
+    stats = Stats()
+    slots = [Slot(new_game) for _ in range(args.worker_games)]
+    connection.close()
+    stop_at = time.monotonic() + args.duration
+    base_seed = args.worker_seed * 100003
+    threads = [
+        threading.Thread(target=_play, args=(slot, seat, stats, stop_at, args.poll, base_seed + index * 2 + seat))
+        for index, slot in enumerate(slots) for seat in (1, 2)
+    ]
+    threads += [
+        threading.Thread(target=_every, args=(args.poll, stop_at, base_seed - index - 1,
+                                              _solo(f'load-solo-{args.worker_seed}-{index}', stats)))
+        for index in range(args.worker_solo)
+    ]
+    threads += [
+        threading.Thread(target=_every, args=(args.poll, stop_at, base_seed + 50000 + index, _reader(stats)))
+        for index in range(args.worker_readers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(json.dumps(stats.to_json()))
+
+
+def _shares(total, workers):
+    return [total // workers + (index < total % workers) for index in range(workers)]
+
+
+def run_level(args, env, games):
+    """Run `games` concurrent games (and the solo/reader clients) split over the workers; returns the combined stats"""
+    processes = [
+        subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.concurrency', '--worker-games', str(share),
+             '--worker-solo', str(solo), '--worker-readers', str(readers),
+             '--worker-seed', str(index), '--duration', str(args.duration), '--poll', str(args.poll)],
+            cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True,
+        )
+        for index, (share, solo, readers) in enumerate(zip(
+            _shares(games, args.workers), _shares(args.solo, args.workers), _shares(args.readers, args.workers)
+        ))
+    ]
+    combined = {'latencies': {}, 'errors': Counter(), 'rounds': 0, 'games': 0, 'forfeits': 0}
+    for process in processes:
+        output, _ = process.communicate()
+        if process.returncode:
+            sys.exit(f'Worker failed with exit code {process.returncode}')
+        result = json.loads(output.strip().splitlines()[-1])
+        for kind, values in result['latencies'].items():
+            combined['latencies'].setdefault(kind, []).extend(values)
+        combined['errors'].update(result['errors'])
+        for field in ('rounds', 'games', 'forfeits'):
+            combined[field] += result[field]
+
+    latencies = sorted(value for values in combined['latencies'].values() for value in values)
+    failed = sum(combined['errors'].values())
+    p95 = percentile(latencies, 95)
+    return {
+        'games': games,
+        'requests_per_s': round(len(latencies) / args.duration, 1),
+        'rounds_per_s': round(combined['rounds'] / args.duration, 1),
+        'games_finished': combined['games'],
+        'p50_ms': round(percentile(latencies, 50), 1),
+        'p95_ms': round(p95, 1),
+        'p99_ms': round(percentile(latencies, 99), 1),
+        'failed': failed,
+        'forfeits': combined['forfeits'],
+        'p95_ms_by_kind': {
+            kind: round(percentile(sorted(values), 95), 1) for kind, values in sorted(combined['latencies'].items())
+        },
+        'errors': dict(combined['errors'].most_common(3)),
+        'sustained': failed == 0 and combined['forfeits'] == 0 and p95 <= args.max_p95_ms,
+    }
+
+
+def prepare_databases(args, directory, profile, layout):
+    """Create, migrate and seed fresh databases for one configuration; returns the workers' environment"""
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{directory}/load.sqlite3', SQLITE_PROFILE=profile,
+               DEBUG='False', PYTHONWARNINGS='ignore')
+    if layout == 'split':
+        env.update(GAMESTATE_DATABASE_URL=f'sqlite:///{directory}/gamestate.sqlite3',
+                   REPLICA_DATABASE_URL=f'sqlite:///{directory}/replica.sqlite3')
+    elif layout != 'single':
+        sys.exit(f'Unknown layout: {layout}')
+
+    def manage(*command):
+        subprocess.run([sys.executable, 'manage.py', *command], cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+
+    manage('migrate', '-v', '0')
+    if layout == 'split':
+        manage('migrate', '--database', 'gamestate', '-v', '0')
+    if args.seed_players:
+        manage('seed_data', '--players', str(args.seed_players), '--prefix', 'load')
+    if layout == 'split':
+        manage('sync_replica')
+    return env
+
+
+def main():
+    args = parse_args()
+    if args.worker_games is not None:
+        return run_worker(args)
+
+    game_counts = [int(count) for count in args.games.split(',')]
+    results = {}
+    print(f'{"config":14} {"games":>5} {"req/s":>7} {"rounds/s":>8} {"p50 ms":>7} {"p95 ms":>7} '
+          f'{"p99 ms":>8} {"failed":>6}  sustained')
+    for profile in args.profiles.split(','):
+        for layout in args.layouts.split(','):
+            config = f'{profile}/{layout}'
+            results[config] = []
+            with tempfile.TemporaryDirectory() as tmp:
+                env = prepare_databases(args, tmp, profile, layout)
+                for games in game_counts:
+                    row = run_level(args, env, games)
+                    results[config].append(row)
+                    print(f'{config:14} {games:5} {row["requests_per_s"]:7.1f} {row["rounds_per_s"]:8.1f} '
+                          f'{row["p50_ms"]:7.1f} {row["p95_ms"]:7.1f} {row["p99_ms"]:8.1f} {row["failed"]:6}  '
+                          f'{"yes" if row["sustained"] else "no"}')
+                    print(f'{"":20}p95 ms: ' + ', '.join(
+                        f'{kind} {value}' for kind, value in row['p95_ms_by_kind'].items()
+                    ))
+                    for error, count in row['errors'].items():
+                        print(f'{"":20}{count} x {error}')
+
+    print()
+    for config, rows in results.items():
+        sustained = [row['games'] for row in rows if row['sustained']]
+        print(f'{config}: most concurrent games sustained: {max(sustained) if sustained else "none"}')
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark Data
+
+Deterministic seed data for the benchmark database: players with realistic
+stat spreads (scored with Player.score_expression()) and windowed scores
+for the current leaderboard windows.
+"""
+
+import random
+
+from game.models import Player, WindowedScore
+from game.rankings import current_windows
+
+PLAYERS = 10000
+WINDOWED_PLAYERS = 2000
+
+
+def seed(players=PLAYERS, windowed_players=WINDOWED_PLAYERS, seed=0):
+    """Insert benchmark players and windowed scores; returns the player names"""
+    rng = random.Random(seed)
+    rows = []
+    for idx in range(players):
+        games = rng.randint(1, 500)
+        wins = rng.randint(0, games)
+        losses = rng.randint(0, games - wins)
+        hard = rng.randint(0, wins)
+        veteran = rng.randint(0, wins - hard)
+        rows.append(Player(
+            name=f'bench-{idx:05d}',
+            total_games=games,
+            total_wins=wins,
+            total_losses=losses,
+            total_draws=games - wins - losses,
+            normal_wins=wins - hard - veteran,
+            hard_wins=hard,
+            veteran_wins=veteran,
+            best_streak=rng.randint(0, min(wins, 20)),
+        ))
+    Player.objects.bulk_create(rows, batch_size=2000)
+    Player.objects.update(score=Player.score_expression())
+
+    ids = list(Player.objects.order_by('pk').values_list('pk', flat=True)[:windowed_players])
+    windowed = []
+    for window in current_windows():
+        for player_id in ids:
+            wins, losses = rng.randint(0, 40), rng.randint(0, 40)
+            windowed.append(WindowedScore(
+                window=window, player_id=player_id, total_wins=wins, total_losses=losses,
+                total_games=wins + losses, score=wins * Player.WIN_POINTS - losses * Player.LOSS_PENALTY,
+            ))
+    WindowedScore.objects.bulk_create(windowed, batch_size=2000)
+    return [row.name for row in rows]
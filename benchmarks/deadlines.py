@@ -0,0 +1,222 @@
+"""
+Server-side round deadlines (game/deadlines.py) with many live games:
+
+    python -m benchmarks.deadlines
+    python -m benchmarks.deadlines --games 10000,100000,1000000 --skip-db
+
+1. The timer wheel on its own, for each --games count: deadlines spread over
+   --spread seconds are scheduled, re-scheduled once (as a poll does), and
+   then fired tick by tick. The cost per tick is compared with a full scan of
+   every live deadline per tick, which is what a periodic sweep has to do.
+2. End to end, for the largest count: that many 'playing' games are inserted
+   into a fresh file-backed SQLite database with deadlines over the next
+   --spread seconds, half of them with one player's choice in. A scheduler
+   thread recovers them from the database once and ends them as they fall
+   due. Reported: recovery time, how late each game was ended (its
+   updated_at against its deadline), and the batched transactions used,
+   next to what a single query of a periodic sweep costs at that size.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+from .harness import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.deadlines',
+                                     description='Timer-wheel round deadlines with many live games')
+    parser.add_argument('--games', default='10000,100000',
+                        help='Comma-separated live game counts (default: 10000,100000)')
+    parser.add_argument('--spread', type=float, default=20,
+                        help='Seconds over which the deadlines fall (default: 20)')
+    parser.add_argument('--skip-db', action='store_true', help='Only benchmark the wheel itself')
+    parser.add_argument('--output', help='Also write the results to a JSON file')
+    return parser.parse_args()
+
+
+def bench_wheel(games, spread, tick):
+    """Schedule, re-schedule and fire games timers; returns timings"""
+    from game.deadlines import TimerWheel
+
+    rng = random.Random(games)
+    start = 1_000_000.0
+    deadlines = {f'game-{n}': start + rng.uniform(tick, spread) for n in range(games)}
+    wheel = TimerWheel(start, tick)
+
+    began = time.perf_counter()
+    for key, deadline in deadlines.items():
+        wheel.schedule(key, deadline)
+    schedule_us = (time.perf_counter() - began) / games * 1e6
+
+    began = time.perf_counter()
+    for key, deadline in deadlines.items():
+        wheel.schedule(key, deadline)
+    reschedule_us = (time.perf_counter() - began) / games * 1e6
+
+    tick_times = []
+    fired = 0
+    now = start
+    while wheel:
+        now += tick
+        began = time.perf_counter()
+        fired += len(wheel.advance(now))
+        tick_times.append(time.perf_counter() - began)
+    assert fired == games
+    tick_times.sort()
+
+    # A periodic sweep looks at every live deadline on every tick
+    live = list(deadlines.values())
+    sweeps = 20
+    began = time.perf_counter()
+    for sweep in range(sweeps):
+        cutoff = start + sweep * tick
+        [deadline for deadline in live if deadline <= cutoff]
+    scan_ms = (time.perf_counter() - began) / sweeps * 1000
+
+    return {
+        'games': games,
+        'schedule_us': round(schedule_us, 2),
+        'reschedule_us': round(reschedule_us, 2),
+        'ticks': len(tick_times),
+        'tick_p50_ms': round(percentile(tick_times, 50) * 1000, 3),
+        'tick_max_ms': round(tick_times[-1] * 1000, 3),
+        'fire_us_per_game': round(sum(tick_times) / games * 1e6, 2),
+        'cascades_per_game': round(wheel.cascaded / games, 2),
+        'full_scan_ms_per_tick': round(scan_ms, 3),
+    }
+
+
+def bench_end_to_end(games, spread):
+    """Live games on SQLite, ended by a scheduler thread; returns timings"""
+    from datetime import timedelta
+
+    from django.conf import settings
+    from django.db import connection
+    from django.db.models import F
+    from django.utils import timezone
+
+    from game import deadlines
+    from game.models import OnlineGame, PendingSettlement
+
+    rng = random.Random(0)
+    limit = timedelta(seconds=settings.ROUND_TIME_LIMIT + settings.ROUND_DEADLINE_GRACE)
+    first = timezone.now()
+    rows = []
+    for n in range(games):
+        deadline = first + timedelta(seconds=rng.uniform(0, spread))
+        rows.append(OnlineGame(
+            game_id=f'deadline-{n}', mode='classic', status='playing',
+            player1_id=f'p1-{n}', player1_name=f'One {n}', player2_id=f'p2-{n}', player2_name=f'Two {n}',
+            player1_choice='rock' if n % 2 else None, round_start_time=deadline - limit,
+        ))
+    began = time.perf_counter()
+    OnlineGame.objects.bulk_create(rows, batch_size=2000)
+    insert_s = time.perf_counter() - began
+    del rows
+    # Move the deadlines past the insert, leaving time to recover them into the wheel
+    shift = timezone.now() + timedelta(seconds=2 + games / 50000) - first
+    OnlineGame.objects.update(round_start_time=F('round_start_time') + shift)
+    first += shift
+
+    # What one pass of a periodic sweep would cost instead
+    began = time.perf_counter()
+    for _ in range(5):
+        list(OnlineGame.objects.filter(status='playing', round_start_time__lte=timezone.now() - limit)
+             .values_list('game_id', flat=True))
+    sweep_ms = (time.perf_counter() - began) / 5 * 1000
+
+    batches = []
+    expire = deadlines.expire
+
+    def timed_expire(game_ids, now=None):
+        began = time.perf_counter()
+        ended = expire(game_ids, now)
+        batches.append((len(game_ids), time.perf_counter() - began))
+        return ended
+    deadlines.expire = timed_expire
+
+    scheduler = deadlines.DeadlineScheduler()
+    began = time.perf_counter()
+    scheduler._recover()
+    recover_s = time.perf_counter() - began
+    scheduler._ensure_started()  # Its own _recover() finds everything already scheduled
+
+    while OnlineGame.objects.filter(status='playing').exists():
+        time.sleep(0.5)
+        if timezone.now() > first + timedelta(seconds=spread + 60):
+            raise RuntimeError('Games were not ended in time')
+    deadlines.expire = expire
+
+    lateness = sorted(
+        (updated_at - (round_start_time + limit)).total_seconds() * 1000
+        for updated_at, round_start_time in OnlineGame.objects.values_list('updated_at', 'round_start_time')
+    )
+    connection.close()
+    return {
+        'games': games,
+        'insert_s': round(insert_s, 2),
+        'recover_s': round(recover_s, 2),
+        'sweep_query_ms': round(sweep_ms, 1),
+        'late_p50_ms': round(percentile(lateness, 50), 1),
+        'late_p95_ms': round(percentile(lateness, 95), 1),
+        'late_max_ms': round(lateness[-1], 1),
+        'early': sum(1 for late in lateness if late < 0),
+        'expire_calls': len(batches),
+        'expire_ms_per_game': round(sum(seconds for _, seconds in batches) / games * 1000, 3),
+        'settlements': PendingSettlement.objects.count(),
+    }
+
+
+def main():
+    args = parse_args()
+    counts = [int(count) for count in args.games.split(',')]
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f'sqlite:///{tmp}/deadlines.sqlite3'
+        os.environ['SETTLEMENT_MODE'] = 'command'  # Only measure ending the games
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rps_project.settings')
+        sys.path.insert(0, str(ROOT))
+
+        import django
+        django.setup()
+
+        from django.core.management import call_command
+
+        from game.deadlines import TICK
+
+        results = {'wheel': [bench_wheel(games, args.spread, TICK) for games in counts]}
+        print(f'Timer wheel, deadlines over {args.spread:.0f}s, {TICK * 1000:.0f}ms ticks:')
+        print(f'  {"games":>8} {"sched us":>9} {"resched us":>10} {"tick p50 ms":>11} {"tick max ms":>11} '
+              f'{"fire us/game":>12} {"cascades":>8} {"full scan ms/tick":>17}')
+        for row in results['wheel']:
+            print(f'  {row["games"]:>8} {row["schedule_us"]:>9.2f} {row["reschedule_us"]:>10.2f} '
+                  f'{row["tick_p50_ms"]:>11.3f} {row["tick_max_ms"]:>11.3f} {row["fire_us_per_game"]:>12.2f} '
+                  f'{row["cascades_per_game"]:>8.2f} {row["full_scan_ms_per_tick"]:>17.3f}')
+
+        if not args.skip_db:
+            warnings.filterwarnings('ignore', message='No directory at')
+            call_command('migrate', verbosity=0)
+            row = results['end_to_end'] = bench_end_to_end(max(counts), args.spread)
+            print(f'\nEnd to end, {row["games"]} live games on SQLite:')
+            print(f'  inserted in {row["insert_s"]}s, recovered into the wheel in {row["recover_s"]}s '
+                  f'(one periodic-sweep query instead: {row["sweep_query_ms"]}ms)')
+            print(f'  ended late by p50 {row["late_p50_ms"]}ms, p95 {row["late_p95_ms"]}ms, '
+                  f'max {row["late_max_ms"]}ms ({row["early"]} early)')
+            print(f'  {row["expire_calls"]} expire calls, {row["expire_ms_per_game"]}ms per game, '
+                  f'{row["settlements"]} settlements queued')
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
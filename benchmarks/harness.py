@@ -0,0 +1,176 @@
+"""
+Benchmark Harness
+
+A benchmark is a prepare function registered with @benchmark. It runs once,
+untimed, and returns either the callable to time, or a (setup, call) pair in
+which setup() runs untimed before every iteration and its return value is
+passed to call(). Each run records time percentiles in microseconds and the
+mean number of SQL queries per call. Queries are counted with an execute
+wrapper, so DEBUG query logging is not needed.
+"""
+
+import fnmatch
+import gc
+import json
+import math
+import platform
+import time
+
+import django
+from django.db import connection
+from django.utils import timezone
+
+BENCHMARKS = {}  # name -> Benchmark, in registration order
+
+
+class Benchmark:
+    """A registered benchmark"""
+
+    def __init__(self, name, prepare, iterations, warmup):
+        self.name = name
+        self.prepare = prepare
+        self.iterations = iterations
+        self.warmup = warmup
+
+
+def benchmark(name, iterations=200, warmup=10):
+    """Register a prepare function under name"""
+    def register(prepare):
+        if name in BENCHMARKS:
+            raise ValueError(f'Duplicate benchmark: {name}')
+        BENCHMARKS[name] = Benchmark(name, prepare, iterations, warmup)
+        return prepare
+    return register
+
+
+def selected(patterns=None):
+    """Registered benchmarks whose names match any of the glob patterns (all if none)"""
+    if not patterns:
+        return list(BENCHMARKS.values())
+    return [bench for bench in BENCHMARKS.values()
+            if any(fnmatch.fnmatchcase(bench.name, pattern) for pattern in patterns)]
+
+
+class QueryCounter:
+    """connection.execute_wrapper that counts statements"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+
+def measure(bench, scale=1.0, rounds=5):
+    """
+    Run one benchmark; returns its result dict
+    The iterations are split into rounds. p50 is the lowest of the per-round
+    medians, which is much steadier on a busy machine than one overall median.
+    p95/p99 are taken over every iteration.
+    """
+    prepared = bench.prepare()
+    setup, call = prepared if isinstance(prepared, tuple) else (None, prepared)
+    iterations = max(int(bench.iterations * scale), rounds)
+    per_round = iterations // rounds
+
+    def run():
+        if setup:
+            call(setup())
+        else:
+            call()
+
+    for _ in range(bench.warmup):
+        run()
+
+    counter = QueryCounter()
+    medians = []
+    timings = []
+    queries = 0
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()  # As timeit does: collector pauses land on random iterations
+    try:
+        with connection.execute_wrapper(counter):
+            for _ in range(rounds):
+                round_timings = []
+                for _ in range(per_round):
+                    arg = setup() if setup else None
+                    before = counter.count  # Statements issued by setup() don't count
+                    started = time.perf_counter_ns()
+                    if setup:
+                        call(arg)
+                    else:
+                        call()
+                    round_timings.append(time.perf_counter_ns() - started)
+                    queries += counter.count - before
+                round_timings.sort()
+                medians.append(percentile(round_timings, 50))
+                timings.extend(round_timings)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    timings.sort()
+    return {
+        'iterations': len(timings),
+        'mean_us': round(sum(timings) / len(timings) / 1000, 2),
+        'p50_us': round(min(medians) / 1000, 2),
+        'p95_us': round(percentile(timings, 95) / 1000, 2),
+        'p99_us': round(percentile(timings, 99) / 1000, 2),
+        'queries': round(queries / len(timings), 2),
+    }
+
+
+def median_run(results):
+    """Of several results for one benchmark, the one with the median p50"""
+    return sorted(results, key=lambda result: result['p50_us'])[len(results) // 2]
+
+
+def environment():
+    """What a set of results was measured on"""
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+        'recorded_at': timezone.now().isoformat(timespec='seconds'),
+    }
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment(), 'benchmarks': results}, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def regressions(results, baseline, threshold, min_delta_us):
+    """
+    Regressions of results against a baseline
+    Time regresses when p50 grows by more than threshold (a fraction) and by
+    at least min_delta_us. Queries per call regress on any increase.
+    """
+    found = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries'] + 0.01:
+            found.append(f"{name}: queries/call {base['queries']} -> {result['queries']}")
+        limit = base['p50_us'] * (1 + threshold)
+        if result['p50_us'] > limit and result['p50_us'] - base['p50_us'] >= min_delta_us:
+            found.append(
+                f"{name}: p50 {base['p50_us']}us -> {result['p50_us']}us "
+                f"(+{result['p50_us'] / base['p50_us'] - 1:.0%}, limit +{threshold:.0%})"
+            )
+    return found
@@ -0,0 +1,260 @@
+"""
+Leaderboard reads on a big board while results keep coming in:
+
+    python -m benchmarks.leaderboard
+    python -m benchmarks.leaderboard --players 1000000 --rounds 50000000 --refresh 0,5
+
+Seeds --players players whose totals add up to about --rounds games, plus
+rows for the open daily, weekly and season windows for an --active share of
+them, into a fresh file-backed SQLite database. The boards only read these
+totals, so the rounds themselves are not inserted (benchmarks.admin covers
+big round tables).
+
+First, each board's first page and an "around me" page are loaded through
+the test client with the page cache emptied before every request, and so is
+page --deep-page (10 a page) of the all-time and weekly boards, opened with
+the cursor the page before it hands out. The same deep pages are also read
+with OFFSET for comparison. Reported: statements and latency per page.
+
+Then, for each --refresh value (LEADERBOARD_REFRESH, seconds), --results
+results are recorded for random players, each followed by --reads-per-result
+leaderboard requests spread over the boards. Reported: how often the score
+version moved, the share of requests answered from the page cache, and the
+request latency. --refresh 0 moves the version after every result.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+from .harness import QueryCounter, percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+BOARDS = ({}, {'window': 'weekly'}, {'window': 'daily'}, {'window': 'season'}, {'limit': 25})
+WINDOW_SHARE = {'daily': 0.02, 'weekly': 0.1, 'season': 0.4}  # Part of a player's games played in the window
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.leaderboard',
+                                     description='Leaderboard page cost and cache hits under a stream of results')
+    parser.add_argument('--players', type=int, default=1000000, help='Players to seed (default: 1000000)')
+    parser.add_argument('--rounds', type=int, default=50000000,
+                        help='Games the seeded totals add up to (default: 50000000)')
+    parser.add_argument('--active', type=float, default=0.3,
+                        help='Share of players with rows in the open windows (default: 0.3)')
+    parser.add_argument('--reads', type=int, default=20, help='Timed uncached loads per page (default: 20)')
+    parser.add_argument('--deep-page', type=int, default=10000, help='Deep page number to load (default: 10000)')
+    parser.add_argument('--results', type=int, default=500, help='Results recorded per refresh setting (default: 500)')
+    parser.add_argument('--reads-per-result', type=int, default=20,
+                        help='Leaderboard requests after each result (default: 20)')
+    parser.add_argument('--refresh', default='0,5', help='Comma-separated LEADERBOARD_REFRESH values (default: 0,5)')
+    parser.add_argument('--output', help='Also write the results to a JSON file')
+    return parser.parse_args()
+
+
+def _player(rng, name, mean_games, stamp):
+    games = max(int(rng.lognormvariate(math.log(mean_games) - 0.72, 1.2)), 1)
+    draws = int(games * rng.uniform(0.1, 0.3))
+    wins = int((games - draws) * rng.betavariate(5, 6))
+    losses = games - draws - wins
+    hard = int(wins * rng.uniform(0, 0.5))
+    veteran = int((wins - hard) * rng.uniform(0, 0.3))
+    score = wins * 10 + veteran * 5 + hard * 3 - losses * 2
+    streak = min(wins, rng.randint(0, 12))
+    return (name, games, wins, losses, draws, wins - hard - veteran, hard, veteran,
+            streak, rng.randint(0, streak), score, stamp, stamp)
+
+
+def seed(args):
+    """Insert players and open-window rows; returns the games their totals add up to"""
+    from django.db import connection, transaction
+    from django.db.models import Sum
+    from django.utils import timezone
+
+    from game.models import Player, WindowedScore
+    from game.rankings import window_key
+    from game.seeding import PLAYER_FIELDS, insert_rows
+
+    rng = random.Random(0)
+    stamp = connection.ops.adapt_datetimefield_value(timezone.now())
+    mean_games = max(args.rounds / max(args.players, 1), 1)
+    chunk = 50000
+    for start in range(0, args.players, chunk):
+        rows = [_player(rng, f'lb-{idx:08d}', mean_games, stamp)
+                for idx in range(start, min(start + chunk, args.players))]
+        with transaction.atomic():
+            insert_rows(Player, PLAYER_FIELDS, rows, 5000)
+
+    fields = ('window', 'player_id', 'score', 'total_wins', 'total_losses', 'total_draws', 'total_games', 'updated_at')
+    active = Player.objects.values_list('id', 'total_games', 'total_wins', 'total_losses')
+    rows = []
+    with transaction.atomic():
+        for player_id, games, wins, losses in active.iterator(chunk_size=chunk):
+            if rng.random() >= args.active:
+                continue
+            for window, share in WINDOW_SHARE.items():
+                part = rng.uniform(0, 2 * share)
+                w_wins, w_losses = int(wins * part), int(losses * part)
+                w_games = max(int(games * part), w_wins + w_losses)
+                rows.append((window_key(window), player_id, w_wins * 10 - w_losses * 2, w_wins, w_losses,
+                             w_games - w_wins - w_losses, w_games, stamp))
+            if len(rows) >= chunk:
+                insert_rows(WindowedScore, fields, rows, 5000)
+                rows = []
+        insert_rows(WindowedScore, fields, rows, 5000)
+    return Player.objects.aggregate(games=Sum('total_games'))['games'] or 0
+
+
+def deep_cursor(board, page):
+    """Cursor handed out by page - 1 of board, 10 a page (found with OFFSET, untimed)"""
+    from game import rankings
+
+    position = (page - 1) * rankings.DEFAULT_PAGE_SIZE
+    edge = board.order_by(*rankings.LEADERBOARD_ORDER)[position - 1]
+    return rankings.encode_cursor(edge, position)
+
+
+def timed(args, load):
+    """Run load() --reads times with an empty page cache; returns statements and latency"""
+    from django.core.cache import cache
+    from django.db import connection
+
+    durations = []
+    counter = QueryCounter()
+    for _ in range(args.reads):
+        cache.clear()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            load()
+            durations.append(time.perf_counter() - started)
+    durations.sort()
+    return {'queries': counter.count / args.reads,
+            'p50_ms': round(percentile(durations, 50) * 1000, 3),
+            'p99_ms': round(percentile(durations, 99) * 1000, 3)}
+
+
+def cold_pages(args):
+    """Statements and latency of each board page with an empty page cache"""
+    from django.test import Client
+
+    from game import rankings
+    from game.models import Player
+
+    client = Client()
+
+    def get(params):
+        def load():
+            response = client.get('/api/leaderboard/', params)
+            assert response.status_code == 200, response.content[:200]
+        return load
+
+    def offset(board, page):
+        start = (page - 1) * rankings.DEFAULT_PAGE_SIZE
+        return lambda: list(board.order_by(*rankings.LEADERBOARD_ORDER)[start:start + rankings.DEFAULT_PAGE_SIZE])
+
+    middle = Player.objects.order_by(*rankings.LEADERBOARD_ORDER)[args.players // 2].name
+    pages = {}
+    for window in ('all', 'weekly', 'daily', 'season'):
+        board = rankings.board(window)
+        params = {} if window == 'all' else {'window': window}
+        pages[window] = get(params)
+        if window in ('all', 'weekly'):
+            # A window with fewer rows is paged to its last full page instead
+            page = min(args.deep_page, board.count() // rankings.DEFAULT_PAGE_SIZE)
+            pages[f'{window} page {page}'] = get({**params, 'cursor': deep_cursor(board, page)})
+            pages[f'{window} page {page} (OFFSET)'] = offset(board, page)
+    pages['around'] = get({'around': middle})
+    return {label: timed(args, load) for label, load in pages.items()}
+
+
+def mixed(args, refresh):
+    """Record results between leaderboard requests with LEADERBOARD_REFRESH = refresh"""
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import Client
+
+    from game import rankings
+    from game.players import record_result_for
+
+    settings.LEADERBOARD_REFRESH = refresh
+    cache.clear()
+    client = Client()
+    rng = random.Random(1)
+    bumps = []
+    rankings.score_changed.connect(lambda **kwargs: bumps.append(kwargs['version']), weak=False,
+                                   dispatch_uid='benchmarks.leaderboard')
+    durations = []
+    built = 0
+    began = time.perf_counter()
+    for n in range(args.results):
+        name = f'lb-{rng.randrange(args.players):08d}'
+        record_result_for(name, rng.choice(('win', 'lose', 'draw')), 'hard')
+        for read in range(args.reads_per_result):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                client.get('/api/leaderboard/', BOARDS[(n + read) % len(BOARDS)])
+                durations.append(time.perf_counter() - started)
+            built += counter.count > 0
+    elapsed = time.perf_counter() - began
+    rankings.score_changed.disconnect(dispatch_uid='benchmarks.leaderboard')
+    durations.sort()
+    return {
+        'refresh': refresh,
+        'results': args.results,
+        'requests': len(durations),
+        'seconds': round(elapsed, 2),
+        'version_moves': len(bumps),
+        'cache_hit_rate': round(1 - built / len(durations), 4),
+        'p50_ms': round(percentile(durations, 50) * 1000, 3),
+        'p99_ms': round(percentile(durations, 99) * 1000, 3),
+    }
+
+
+def main():
+    args = parse_args()
+    refreshes = [float(value) for value in args.refresh.split(',')]
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f'sqlite:///{tmp}/leaderboard.sqlite3'
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rps_project.settings')
+        sys.path.insert(0, str(ROOT))
+
+        import django
+        django.setup()
+
+        from django.conf import settings
+        from django.core.management import call_command
+        from django.db import connection
+
+        settings.DEBUG = False
+        warnings.filterwarnings('ignore', message='No directory at')  # collectstatic output isn't needed
+        call_command('migrate', verbosity=0)
+        started = time.perf_counter()
+        games = seed(args)
+        results = {'players': args.players, 'games': games, 'seed_seconds': round(time.perf_counter() - started, 1),
+                   'cold': cold_pages(args), 'mixed': [mixed(args, refresh) for refresh in refreshes]}
+        connection.close()
+
+    print(f'{results["players"]} players, {results["games"]} games in their totals '
+          f'(seeded in {results["seed_seconds"]} s)')
+    print(f'{"page":<28}{"queries":>9}{"p50 ms":>10}{"p99 ms":>10}')
+    for label, page in results['cold'].items():
+        print(f'{label:<28}{page["queries"]:>9.1f}{page["p50_ms"]:>10.3f}{page["p99_ms"]:>10.3f}')
+    for run in results['mixed']:
+        print(f'LEADERBOARD_REFRESH={run["refresh"]:g}: {run["results"]} results, {run["requests"]} requests '
+              f'in {run["seconds"]} s; version moved {run["version_moves"]} times, '
+              f'{run["cache_hit_rate"]:.1%} from the page cache, p50 {run["p50_ms"]:.3f} ms, p99 {run["p99_ms"]:.3f} ms')
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
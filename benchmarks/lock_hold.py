@@ -0,0 +1,167 @@
+"""
+How long make_choice holds the database write lock, per move:
+
+    python -m benchmarks.lock_hold
+    python -m benchmarks.lock_hold --games 500
+
+Plays --games best-of-five PvP games through the test client against a fresh
+file-backed SQLite database (so the SQLite profile's pragmas apply). For each
+make_choice request, the write transaction is timed from its BEGIN to the end
+of its COMMIT, which on SQLite is how long every other writer (the opponent's
+choice, next_round, other games) has to wait. Moves are grouped into the
+first choice of a round, the choice that resolves a round, and the choice
+that finishes the game, the one that used to settle player stats inside the
+transaction. With SETTLEMENT_MODE=inline, the settlement's own transaction
+after the move's commit is reported separately as 'settle'.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+from collections import defaultdict
+from pathlib import Path
+
+from .harness import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+CHOICES = ('rock', 'paper', 'scissors')
+KINDS = ('choice', 'resolve', 'finish', 'settle')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.lock_hold',
+                                     description='Write-lock hold time of make_choice, per move')
+    parser.add_argument('--games', type=int, default=200, help='Games to play (default: 200)')
+    parser.add_argument('--players', type=int, default=1000,
+                        help='Player rows seeded beforehand (default: 1000)')
+    parser.add_argument('--output', help='Also write the results to a JSON file')
+    return parser.parse_args()
+
+
+class LockTimer:
+    """Times write transactions on one connection, from BEGIN to the end of COMMIT"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.started = None
+        self.statements = 0
+        self.held = []  # (seconds, statements) per committed transaction
+        commit = connection._commit
+
+        def timed_commit():
+            try:
+                return commit()
+            finally:
+                if self.started is not None:
+                    self.held.append((time.perf_counter() - self.started, self.statements))
+                    self.started = None
+        connection._commit = timed_commit
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith('BEGIN') and self.started is None:
+            self.started = time.perf_counter()
+            self.statements = 0
+        elif self.started is not None:
+            self.statements += 1
+        return execute(sql, params, many, context)
+
+    def take(self):
+        held, self.held = self.held, []
+        return held
+
+
+def play(client, timer, games, players, rng):
+    """Play games to the end; returns {kind: [(seconds, statements), ...]}"""
+    from game.models import OnlineGame
+
+    samples = defaultdict(list)
+    for number in range(games):
+        game_id = f'lock-{number}'
+        names = rng.sample(range(players), 2)
+        OnlineGame.objects.create(
+            game_id=game_id, mode='classic', status='playing',
+            player1_id='p1', player1_name=f'bench-{names[0]:05d}',
+            player2_id='p2', player2_name=f'bench-{names[1]:05d}',
+        )
+        while True:
+            first, second = rng.sample(CHOICES, 2) if rng.random() < 0.8 else [rng.choice(CHOICES)] * 2
+            timer.take()
+            _post(client, '/api/game/choice/', {'game_id': game_id, 'player_id': 'p1', 'choice': first})
+            samples['choice'].extend(timer.take())
+            _post(client, '/api/game/choice/', {'game_id': game_id, 'player_id': 'p2', 'choice': second})
+            held = timer.take()
+            status = OnlineGame.objects.values_list('status', flat=True).get(game_id=game_id)
+            if status == 'finished':
+                samples['finish'].append(held[0])
+                samples['settle'].extend(held[1:])
+                break
+            samples['resolve'].extend(held)
+            for player_id in ('p1', 'p2'):
+                _post(client, '/api/game/next/', {'game_id': game_id, 'player_id': player_id})
+    return samples
+
+
+def _post(client, path, payload):
+    response = client.post(path, json.dumps(payload), content_type='application/json')
+    assert response.status_code == 200, (path, response.status_code, response.content[:200])
+
+
+def summarize(samples):
+    summary = {}
+    for kind in KINDS:
+        held = sorted(seconds * 1000 for seconds, _ in samples[kind])
+        if not held:
+            continue
+        summary[kind] = {
+            'moves': len(held),
+            'p50_ms': round(percentile(held, 50), 3),
+            'p95_ms': round(percentile(held, 95), 3),
+            'max_ms': round(held[-1], 3),
+            'statements': round(sum(count for _, count in samples[kind]) / len(held), 2),
+        }
+    return summary
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f'sqlite:///{tmp}/lock_hold.sqlite3'
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rps_project.settings')
+        sys.path.insert(0, str(ROOT))
+
+        import django
+        django.setup()
+
+        from django.conf import settings
+        from django.core.management import call_command
+        from django.db import connection
+        from django.test import Client
+
+        from . import data
+
+        settings.DEBUG = False
+        warnings.filterwarnings('ignore', message='No directory at')  # collectstatic output isn't needed
+        call_command('migrate', verbosity=0)
+        data.seed(players=args.players, windowed_players=0)
+
+        timer = LockTimer(connection)
+        with connection.execute_wrapper(timer):
+            samples = play(Client(), timer, args.games, args.players, random.Random(0))
+        connection.close()
+
+    results = summarize(samples)
+    print(f'{"move":10}{"moves":>7}{"p50 ms":>9}{"p95 ms":>9}{"max ms":>9}{"stmts":>7}')
+    for kind, row in results.items():
+        print(f'{kind:10}{row["moves"]:>7}{row["p50_ms"]:>9.3f}{row["p95_ms"]:>9.3f}'
+              f'{row["max_ms"]:>9.3f}{row["statements"]:>7.2f}')
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
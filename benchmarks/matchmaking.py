@@ -0,0 +1,249 @@
+"""
+Matchmaking queue writes for searches that never find a human opponent:
+
+    python -m benchmarks.matchmaking
+    python -m benchmarks.matchmaking --searches 500 --vanished 0.5
+
+Plays --searches searchers one after another against a fresh file-backed
+SQLite database, so nobody is ever matched. Each searcher polls
+join_matchmaking every --poll seconds, the way the PvP page does, on a
+simulated clock. Most wait until they are given an AI opponent. If the
+server never does that, the page gives up after --client-timeout seconds
+and leaves the queue. A --vanished share of searchers close the tab after a
+few polls instead, without leaving; the next searcher arrives after their
+entry has expired. Reported per search: the requests made and the INSERT,
+UPDATE and DELETE statements run against the queue table. Also reported:
+the entries still in the table at the end, after the clock has moved past
+the expiry and one last searcher has come and gone.
+
+Then --queued searchers are put in the queue at once, and the per-poll
+reads of a waiting searcher are timed: its queue position (a seek to the
+oldest live ticket) and players online, both fresh and from the per-process
+cache, next to the COUNT(*) of the searchers ahead that a position would
+otherwise need.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+
+from .harness import QueryCounter, percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.matchmaking',
+                                     description='Matchmaking queue writes per abandoned search')
+    parser.add_argument('--searches', type=int, default=200, help='Searchers, one after another (default: 200)')
+    parser.add_argument('--vanished', type=float, default=0.25,
+                        help='Share of searchers that close the tab early (default: 0.25)')
+    parser.add_argument('--poll', type=float, default=2, help='Seconds between polls (default: 2)')
+    parser.add_argument('--client-timeout', type=float, default=90,
+                        help='Seconds after which the page itself gives up and leaves (default: 90)')
+    parser.add_argument('--queued', type=int, default=10000,
+                        help='Searchers queued at once for the position/online reads (default: 10000)')
+    parser.add_argument('--reads', type=int, default=200, help='Timed calls per read (default: 200)')
+    parser.add_argument('--output', help='Also write the results to a JSON file')
+    return parser.parse_args()
+
+
+class Clock:
+    """Simulated timezone.now(), moved forward by hand"""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += timedelta(seconds=seconds)
+
+
+class QueueWrites:
+    """Counts write statements against the matchmaking queue table"""
+
+    def __init__(self, table):
+        self.table = table
+        self.counts = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        verb = sql.split(None, 1)[0].upper()
+        if verb in WRITES and self.table in sql:
+            self.counts[verb] += 1
+        return execute(sql, params, many, context)
+
+    def take(self):
+        counts, self.counts = self.counts, Counter()
+        return counts
+
+
+def search(client, clock, writes, player_id, args, vanish_after=None):
+    """One searcher polling until it gets an opponent, gives up or vanishes; returns its stats"""
+    polls = []
+    started = clock.now
+    status = 'searching'
+    while True:
+        began = time.perf_counter()
+        response = client.post('/api/matchmaking/join/', {'player_id': player_id, 'player_name': 'Solo'},
+                               content_type='application/json')
+        polls.append(time.perf_counter() - began)
+        status = response.json()['status']
+        waited = (clock.now - started).total_seconds()
+        if status != 'searching':
+            break
+        if vanish_after is not None and waited >= vanish_after:
+            status = 'vanished'
+            break
+        if waited >= args.client_timeout:
+            client.post('/api/matchmaking/leave/', {'player_id': player_id}, content_type='application/json')
+            status = 'gave up'
+            break
+        clock.advance(args.poll)
+    return {'status': status, 'requests': len(polls) + (status == 'gave up'), 'polls': polls,
+            'writes': writes.take(), 'waited': (clock.now - started).total_seconds()}
+
+
+def run(args):
+    from django.db import connection
+    from django.test import Client
+    from django.utils import timezone
+
+    from game import matchmaking
+    from game.models import MatchmakingQueue
+
+    clock = Clock(timezone.now())
+    timezone.now = clock
+    writes = QueueWrites(MatchmakingQueue._meta.db_table)
+    client = Client()
+    rng = random.Random(0)
+    searches = []
+    with connection.execute_wrapper(writes):
+        for n in range(args.searches):
+            vanish_after = rng.uniform(4, 30) if rng.random() < args.vanished else None
+            searches.append(search(client, clock, writes, f'solo-{n}', args, vanish_after))
+            if vanish_after is not None:
+                clock.advance(matchmaking.QUEUE_EXPIRY_SECONDS + 20)  # Nobody arrives until it expired
+            clock.advance(args.poll)
+        clock.advance(matchmaking.QUEUE_EXPIRY_SECONDS + 20)
+        search(client, clock, writes, 'last', args, vanish_after=0)
+        client.post('/api/matchmaking/leave/', {'player_id': 'last'}, content_type='application/json')
+        writes.take()
+    left = MatchmakingQueue.objects.count()
+    connection.close()
+    return searches, left
+
+
+def queued_reads(args):
+    """Statements and time per call of the poll's queue reads with args.queued searchers waiting"""
+    from django.db import connection
+    from django.db.models import F
+    from django.utils import timezone
+
+    from game import matchmaking
+    from game.models import MatchmakingQueue
+
+    now = timezone.now()
+    MatchmakingQueue.objects.bulk_create([
+        MatchmakingQueue(player_id=f'queued-{n}', player_name='Queued', status='searching', last_seen=now)
+        for n in range(args.queued)
+    ], batch_size=2000)
+    MatchmakingQueue.objects.filter(ticket__isnull=True).update(ticket=F('id'))
+    last = MatchmakingQueue.objects.order_by('-ticket').values_list('ticket', flat=True).first()
+
+    def fresh_online():
+        matchmaking._online = (0, None)
+        return matchmaking.players_online()
+
+    reads = {
+        'queue_position': lambda: matchmaking.queue_position(last),
+        'players_online[fresh]': fresh_online,
+        'players_online[cached]': matchmaking.players_online,
+        'count_ahead': lambda: MatchmakingQueue.objects.filter(status='searching', ticket__lt=last).count(),
+    }
+    results = {}
+    for name, read in reads.items():
+        read()
+        counter = QueryCounter()
+        timings = []
+        with connection.execute_wrapper(counter):
+            for _ in range(args.reads):
+                began = time.perf_counter()
+                read()
+                timings.append(time.perf_counter() - began)
+        timings.sort()
+        results[name] = {'statements': round(counter.count / args.reads, 2),
+                         'p50_ms': round(percentile(timings, 50) * 1000, 3)}
+    connection.close()
+    return results
+
+
+def summarize(searches, left):
+    results = {'rows_left': left, 'by_outcome': {}}
+    groups = {}
+    for row in searches:
+        groups.setdefault(row['status'], []).append(row)
+    groups['all'] = searches
+    for status, rows in groups.items():
+        writes = Counter()
+        for row in rows:
+            writes.update(row['writes'])
+        polls = sorted(seconds for row in rows for seconds in row['polls'])
+        results['by_outcome'][status] = {
+            'searches': len(rows),
+            'waited_s': round(sum(row['waited'] for row in rows) / len(rows), 1),
+            'requests': round(sum(row['requests'] for row in rows) / len(rows), 1),
+            **{verb.lower(): round(writes[verb] / len(rows), 2) for verb in WRITES},
+            'writes': round(sum(writes.values()) / len(rows), 2),
+            'poll_p50_ms': round(percentile(polls, 50) * 1000, 3),
+        }
+    return results
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f'sqlite:///{tmp}/matchmaking.sqlite3'
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rps_project.settings')
+        sys.path.insert(0, str(ROOT))
+
+        import django
+        django.setup()
+
+        from django.conf import settings
+        from django.core.management import call_command
+
+        settings.DEBUG = False
+        warnings.filterwarnings('ignore', message='No directory at')  # collectstatic output isn't needed
+        call_command('migrate', verbosity=0)
+        results = summarize(*run(args))
+        if args.queued:
+            results['queued'] = {'searchers': args.queued, 'reads': queued_reads(args)}
+
+    print(f'{"outcome":10}{"searches":>9}{"waited s":>9}{"requests":>9}{"inserts":>8}{"updates":>8}'
+          f'{"deletes":>8}{"writes":>8}{"poll p50 ms":>12}')
+    for status, row in results['by_outcome'].items():
+        print(f'{status:10}{row["searches"]:>9}{row["waited_s"]:>9.1f}{row["requests"]:>9.1f}{row["insert"]:>8.2f}'
+              f'{row["update"]:>8.2f}{row["delete"]:>8.2f}{row["writes"]:>8.2f}{row["poll_p50_ms"]:>12.3f}')
+    print(f'queue entries left behind: {results["rows_left"]}')
+    if args.queued:
+        print(f'\nreads per poll with {args.queued} searchers queued')
+        print(f'{"read":24}{"stmts":>6}{"p50 ms":>10}')
+        for name, row in results['queued']['reads'].items():
+            print(f'{name:24}{row["statements"]:>6.2f}{row["p50_ms"]:>10.3f}')
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Overhead of the sampling profiler and allocation tracing (game/profiling.py):
+
+    python -m benchmarks.profiling
+    python -m benchmarks.profiling --requests 2000 --interval 0.005
+
+Times play_round (a named player against the 'hard' AI) and get_game_state
+through the test client against a fresh file-backed SQLite database, under:
+- none: ProfilingMiddleware removed from MIDDLEWARE
+- off: the middleware installed with no sampling rates (the default)
+- sampled: every request profiled (rate 100%), at --interval seconds per sample
+- tracemalloc: tracing on, no sampling
+The conditions take turns in --rounds rounds so that drift hits all of them
+alike. Overhead is each condition's p50 against 'none'. At a rate of r%,
+sampling costs about r% of the 'sampled' overhead per request on average.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+from collections import defaultdict
+from pathlib import Path
+
+from .harness import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+CONDITIONS = ('none', 'off', 'sampled', 'tracemalloc')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.profiling',
+                                     description='Request overhead of the sampling profiler and tracemalloc')
+    parser.add_argument('--requests', type=int, default=1000,
+                        help='Requests per endpoint and condition (default: 1000)')
+    parser.add_argument('--rounds', type=int, default=5, help='Turns each condition takes (default: 5)')
+    parser.add_argument('--interval', type=float, default=None,
+                        help='Seconds between stack samples (default: PROFILING_INTERVAL)')
+    parser.add_argument('--output', help='Also write the results to a JSON file')
+    return parser.parse_args()
+
+
+def endpoints(client):
+    """(name, call) pairs for the timed requests"""
+    play = json.dumps({'choice': 'rock', 'difficulty': 'hard', 'session_id': 'profiled', 'player_name': 'Profiled'})
+    state = json.dumps({'game_id': 'profiled', 'player_id': 'p1'})
+    return [
+        ('play_round', lambda: client.post('/api/play/', play, content_type='application/json')),
+        ('get_game_state', lambda: client.post('/api/game/state/', state, content_type='application/json')),
+    ]
+
+
+def run(args):
+    import tracemalloc
+
+    from django.conf import settings
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    from game import profiling
+    from game.models import OnlineGame
+
+    OnlineGame.objects.create(
+        game_id='profiled', mode='classic', status='round_complete',
+        player1_id='p1', player1_name='One', player2_id='p2', player2_name='Two',
+    )
+    if args.interval:
+        profiling.profiler.interval = args.interval
+    without = [name for name in settings.MIDDLEWARE if name != 'game.middleware.ProfilingMiddleware']
+    times = defaultdict(list)  # (endpoint, condition) -> seconds
+    for _ in range(args.rounds):
+        for condition in CONDITIONS:
+            with override_settings(MIDDLEWARE=without if condition == 'none' else settings.MIDDLEWARE):
+                calls = endpoints(Client())
+                profiling.profiler.set_rates({'*': 100} if condition == 'sampled' else {})
+                if condition == 'tracemalloc':
+                    profiling.tracer.start()
+                for name, call in calls:
+                    for _ in range(args.requests // args.rounds):
+                        began = time.perf_counter()
+                        response = call()
+                        times[name, condition].append(time.perf_counter() - began)
+                        assert response.status_code == 200, (name, response.status_code)
+                if tracemalloc.is_tracing():
+                    profiling.tracer.stop()
+    stats = profiling.profiler.stats()
+    return times, stats
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f'sqlite:///{tmp}/profiling.sqlite3'
+        os.environ['ROUND_DEADLINES'] = 'False'
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rps_project.settings')
+        sys.path.insert(0, str(ROOT))
+
+        import django
+        django.setup()
+
+        from django.conf import settings
+        from django.core.management import call_command
+        from django.db import connection
+
+        settings.DEBUG = False
+        warnings.filterwarnings('ignore', message='No directory at')  # collectstatic output isn't needed
+        call_command('migrate', verbosity=0)
+        times, stats = run(args)
+        connection.close()
+
+    results = {'requests': args.requests, 'samples': stats['samples'], 'endpoints': {}}
+    print(f'{"endpoint":16}{"condition":>12}{"p50 us":>10}{"p95 us":>10}{"overhead":>10}')
+    for name in ('play_round', 'get_game_state'):
+        base = percentile(sorted(times[name, 'none']), 50)
+        rows = results['endpoints'][name] = {}
+        for condition in CONDITIONS:
+            samples = sorted(times[name, condition])
+            p50 = percentile(samples, 50)
+            rows[condition] = {
+                'p50_us': round(p50 * 1e6, 1),
+                'p95_us': round(percentile(samples, 95) * 1e6, 1),
+                'overhead_pct': round((p50 / base - 1) * 100, 1),
+            }
+            row = rows[condition]
+            print(f'{name:16}{condition:>12}{row["p50_us"]:>10.1f}{row["p95_us"]:>10.1f}{row["overhead_pct"]:>+9.1f}%')
+    print(f'stack samples taken: {stats["samples"]}')
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Spectator fan-out through the broadcast hub:
+
+    python -m benchmarks.spectate
+    python -m benchmarks.spectate --spectators 10000 --games 100 --sweeps 5
+
+Creates --games live games on a fresh file-backed SQLite database and
+assigns --spectators spectators to them round-robin. In each sweep, every
+spectator polls /api/game/spectate/ once through the test client, sending
+If-None-Match with the version it has. Between sweeps every game moves on
+with a plain UPDATE, i.e. as if it had been played on another worker, so the
+hub only sees it on its next refresh. Reported: requests, database reads
+by the hub (one per poll without it), 200 and 304 answers, and the poll
+latency.
+
+Then --waiters threads long-poll one game that doesn't change, each with
+wait=--wait, to check that only SPECTATE_MAX_WAITERS of them hold a request
+thread while the others are answered at once.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from pathlib import Path
+
+from .harness import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.spectate',
+                                     description='Spectator polls served per database read')
+    parser.add_argument('--spectators', type=int, default=10000, help='Spectators (default: 10000)')
+    parser.add_argument('--games', type=int, default=100, help='Live games watched (default: 100)')
+    parser.add_argument('--sweeps', type=int, default=3, help='Polls per spectator (default: 3)')
+    parser.add_argument('--waiters', type=int, default=16, help='Concurrent long-polls (default: 16)')
+    parser.add_argument('--wait', type=float, default=2, help='Seconds each long-poll asks for (default: 2)')
+    parser.add_argument('--output', help='Also write the results to a JSON file')
+    return parser.parse_args()
+
+
+def create_games(count):
+    from django.utils import timezone
+
+    from game.models import OnlineGame
+
+    now = timezone.now()
+    OnlineGame.objects.bulk_create([
+        OnlineGame(game_id=f'spectate-{n}', mode='classic', status='playing', round_start_time=now,
+                   player1_id=f'p1-{n}', player1_name=f'Left {n}', player2_id=f'p2-{n}', player2_name=f'Right {n}')
+        for n in range(count)
+    ])
+    return [f'spectate-{n}' for n in range(count)]
+
+
+def fan_out(args, game_ids):
+    from django.db.models import F
+    from django.test import Client
+
+    from game.broadcast import hub
+    from game.models import OnlineGame
+
+    client = Client()
+    versions = [None] * args.spectators
+    polls = []
+    answers = {200: 0, 304: 0}
+    reads_before = hub.db_reads
+    began = time.perf_counter()
+    for _ in range(args.sweeps):
+        for spectator in range(args.spectators):
+            game_id = game_ids[spectator % len(game_ids)]
+            headers = {}
+            if versions[spectator] is not None:
+                headers['HTTP_IF_NONE_MATCH'] = f'"{game_id}-{versions[spectator]}"'
+            started = time.perf_counter()
+            response = client.get('/api/game/spectate/', {'game_id': game_id}, **headers)
+            polls.append(time.perf_counter() - started)
+            answers[response.status_code] += 1
+            if response.status_code == 200:
+                versions[spectator] = json.loads(response.content)['version']
+        OnlineGame.objects.filter(game_id__in=game_ids).update(
+            current_round=F('current_round') + 1, player1_score=F('player1_score') + 1)
+    elapsed = time.perf_counter() - began
+    polls.sort()
+    reads = hub.db_reads - reads_before
+    return {
+        'requests': len(polls),
+        'db_reads': reads,
+        'reads_per_1000_polls': round(reads * 1000 / len(polls), 2),
+        'ok': answers[200],
+        'not_modified': answers[304],
+        'polls_per_s': round(len(polls) / elapsed),
+        'poll_p50_ms': round(percentile(polls, 50) * 1000, 3),
+        'poll_p99_ms': round(percentile(polls, 99) * 1000, 3),
+    }
+
+
+def long_polls(args, game_id):
+    from django.conf import settings
+    from django.db import connection
+    from django.test import Client
+
+    version = json.loads(Client().get('/api/game/spectate/', {'game_id': game_id}).content)['version']
+    durations = []
+    lock = threading.Lock()
+
+    def waiter():
+        client = Client()
+        started = time.perf_counter()
+        client.get('/api/game/spectate/', {'game_id': game_id, 'since': version, 'wait': args.wait})
+        with lock:
+            durations.append(time.perf_counter() - started)
+        connection.close()
+
+    threads = [threading.Thread(target=waiter) for _ in range(args.waiters)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    waited = sum(1 for seconds in durations if seconds >= args.wait / 2)
+    return {'long_polls': args.waiters, 'waited': waited, 'answered_at_once': args.waiters - waited,
+            'max_waiters': settings.SPECTATE_MAX_WAITERS}
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f'sqlite:///{tmp}/spectate.sqlite3'
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rps_project.settings')
+        sys.path.insert(0, str(ROOT))
+
+        import django
+        django.setup()
+
+        from django.conf import settings
+        from django.core.management import call_command
+        from django.db import connection
+
+        settings.DEBUG = False
+        settings.ROUND_DEADLINES = False  # Games here never time out
+        warnings.filterwarnings('ignore', message='No directory at')  # collectstatic output isn't needed
+        call_command('migrate', verbosity=0)
+        game_ids = create_games(args.games)
+        results = {'spectators': args.spectators, 'games': args.games, 'sweeps': args.sweeps,
+                   'fan_out': fan_out(args, game_ids), 'long_poll': long_polls(args, game_ids[0])}
+        connection.close()
+
+    fan = results['fan_out']
+    print(f'{args.spectators} spectators on {args.games} games, {args.sweeps} sweeps')
+    print(f'{fan["requests"]} polls, {fan["db_reads"]} database reads ({fan["reads_per_1000_polls"]} per 1000 polls), '
+          f'{fan["ok"]} x 200, {fan["not_modified"]} x 304')
+    print(f'{fan["polls_per_s"]} polls/s, p50 {fan["poll_p50_ms"]:.3f} ms, p99 {fan["poll_p99_ms"]:.3f} ms')
+    poll = results['long_poll']
+    print(f'{poll["long_polls"]} concurrent long-polls: {poll["waited"]} waited, '
+          f'{poll["answered_at_once"]} answered at once (SPECTATE_MAX_WAITERS={poll["max_waiters"]})')
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
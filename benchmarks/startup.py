@@ -0,0 +1,226 @@
+"""
+Gunicorn cold start: time to first request and worker memory, for
+
+- lazy: no gunicorn.conf.py, each worker imports and builds everything itself
+- preload: gunicorn.conf.py with WARMUP=0 (app imported once in the master)
+- warm: gunicorn.conf.py with the warm-up (and WARMUP_LEADERBOARD=1)
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --workers 4 --repeat 5
+
+Each configuration is started --repeat times against the same seeded SQLite
+file. With one worker we measure the time from launch until the server first
+answers (TTFR, probed with a request that needs no template or database),
+then each page's first request against its median over later requests, and
+finally the same again for a replacement worker after the worker is killed
+(as after a crash or max_requests). With --workers workers, after every
+page has been served a few times, we read each worker's RSS, PSS and
+private memory from
+/proc/<pid>/smaps_rollup. RSS counts pages shared with the master in full;
+PSS splits them between the processes sharing them, so copy-on-write sharing
+shows up as lower PSS and private memory, not lower RSS.
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PAGES = ['/', '/play/?mode=full', '/pvp/', '/rules/', '/leaderboard/', '/api/leaderboard/', '/api/elements/?mode=full']
+CONFIGS = {
+    'lazy': (None, {}),
+    'preload': (ROOT / 'gunicorn.conf.py', {'WARMUP': '0'}),
+    'warm': (ROOT / 'gunicorn.conf.py', {'WARMUP': '1', 'WARMUP_LEADERBOARD': '1'}),
+}
+STEADY_REQUESTS = 20
+READY_PATH = '/api/elements/?mode=classic'  # No template, no database
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup',
+                                     description='Gunicorn time to first request and worker memory')
+    parser.add_argument('--configs', default=','.join(CONFIGS),
+                        help=f'Configurations to compare (default: {",".join(CONFIGS)})')
+    parser.add_argument('--workers', type=int, default=4, help='Workers for the memory measurement (default: 4)')
+    parser.add_argument('--repeat', type=int, default=3, help='Starts per configuration (default: 3)')
+    parser.add_argument('--seed-players', type=int, default=10000,
+                        help='Players seeded for the leaderboard pages (default: 10000)')
+    parser.add_argument('--output', help='Also write the results to a JSON file')
+    return parser.parse_args()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _get(url, timeout=30):
+    """GET url; returns (status, seconds)"""
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        status = exc.code
+    return status, time.perf_counter() - started
+
+
+class Server:
+    def __init__(self, config, env, workers):
+        self.port = _free_port()
+        config_file, extra_env = CONFIGS[config]
+        self.empty_config = None
+        if config_file is None:
+            self.empty_config = tempfile.NamedTemporaryFile('w', suffix='.py', delete=False)
+            self.empty_config.close()
+            config_file = self.empty_config.name
+        self.started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'rps_project.wsgi:application', '-c', str(config_file),
+             '--workers', str(workers), '--bind', f'127.0.0.1:{self.port}', '--log-level', 'warning'],
+            cwd=ROOT, env={**env, **extra_env},
+        )
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.port}{path}'
+
+    def first_response(self, since=None, deadline=60):
+        """Seconds from since (default: launch) until the server answers READY_PATH"""
+        since = since or self.started
+        while time.perf_counter() - since < deadline:
+            try:
+                if _get(self.url(READY_PATH), timeout=5)[0] == 200:
+                    return time.perf_counter() - since
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise RuntimeError(f'No answer within {deadline}s')
+
+    def worker_pids(self):
+        children = Path(f'/proc/{self.process.pid}/task/{self.process.pid}/children').read_text().split()
+        return [int(pid) for pid in children]
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait(timeout=30)
+        if self.empty_config:
+            os.unlink(self.empty_config.name)
+
+
+def memory_kb(pid):
+    """Rss, Pss and private (clean + dirty) kB of a process"""
+    fields = {}
+    for line in Path(f'/proc/{pid}/smaps_rollup').read_text().splitlines()[1:]:
+        name, value = line.split(':', 1)
+        fields[name] = int(value.split()[0])
+    return {'rss': fields['Rss'], 'pss': fields['Pss'],
+            'private': fields['Private_Clean'] + fields['Private_Dirty']}
+
+
+def _first_hits(server):
+    """Each page's first request (ms)"""
+    first = {}
+    for path in PAGES:
+        status, seconds = _get(server.url(path))
+        if status != 200:
+            raise RuntimeError(f'{path} returned {status}')
+        first[path] = seconds * 1000
+    return first
+
+
+def measure_latency(config, env):
+    """One worker: TTFR and first-request latencies at launch and after a respawn, plus steady state (ms)"""
+    server = Server(config, env, workers=1)
+    try:
+        ttfr = server.first_response()
+        first = _first_hits(server)
+        steady = {
+            path: statistics.median(_get(server.url(path))[1] for _ in range(STEADY_REQUESTS)) * 1000
+            for path in PAGES
+        }
+        (worker,) = server.worker_pids()
+        killed = time.perf_counter()
+        os.kill(worker, signal.SIGKILL)
+        respawn = server.first_response(since=killed)
+        respawn_first = _first_hits(server)
+    finally:
+        server.stop()
+    return {'ttfr_ms': ttfr * 1000, 'first_ms': first, 'steady_ms': steady,
+            'respawn_ms': respawn * 1000, 'respawn_first_ms': respawn_first}
+
+
+def measure_memory(config, env, workers):
+    """Memory of the master and each worker after every page was served a few times per worker"""
+    server = Server(config, env, workers=workers)
+    try:
+        server.first_response()
+        for _ in range(3 * workers):
+            for path in PAGES:
+                _get(server.url(path))
+        master = memory_kb(server.process.pid)
+        per_worker = [memory_kb(pid) for pid in server.worker_pids()]
+    finally:
+        server.stop()
+    return {'master': master, 'workers': per_worker}
+
+
+def main():
+    args = parse_args()
+    configs = args.configs.split(',')
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{tmp}/startup.sqlite3', DEBUG='False',
+                   PYTHONWARNINGS='ignore')
+        for command in (['migrate', '-v', '0'], ['seed_data', '--players', str(args.seed_players), '--prefix', 'start']):
+            subprocess.run([sys.executable, 'manage.py', *command], cwd=ROOT, env=env, check=True,
+                           stdout=subprocess.DEVNULL)
+
+        for config in configs:
+            runs = [measure_latency(config, env) for _ in range(args.repeat)]
+            memory = measure_memory(config, env, args.workers)
+            results[config] = {
+                'ttfr_ms': statistics.median(run['ttfr_ms'] for run in runs),
+                'respawn_ms': statistics.median(run['respawn_ms'] for run in runs),
+                'first_ms': {path: statistics.median(run['first_ms'][path] for run in runs) for path in PAGES},
+                'respawn_first_ms': {
+                    path: statistics.median(run['respawn_first_ms'][path] for run in runs) for path in PAGES
+                },
+                'steady_ms': {path: statistics.median(run['steady_ms'][path] for run in runs) for path in PAGES},
+                'memory_kb': memory,
+            }
+
+    print(f'Time to first request (median of {args.repeat} starts, 1 worker):')
+    for config in configs:
+        print(f'  {config:8} launch {results[config]["ttfr_ms"]:7.0f} ms   '
+              f'worker respawn {results[config]["respawn_ms"]:7.0f} ms')
+    print('\nFirst request after launch / after respawn / steady-state median, per page (ms):')
+    print(f'  {"page":26}' + ''.join(f'{config:>24}' for config in configs))
+    for path in PAGES:
+        cells = ''.join(
+            f'{results[config]["first_ms"][path]:>8.1f} /{results[config]["respawn_first_ms"][path]:>6.1f} /'
+            f'{results[config]["steady_ms"][path]:>6.1f}' for config in configs
+        )
+        print(f'  {path:26}{cells}')
+    print(f'\nMemory with {args.workers} workers (MB, mean per worker; master):')
+    for config in configs:
+        memory = results[config]['memory_kb']
+        mean = {key: statistics.mean(worker[key] for worker in memory['workers']) / 1024 for key in ('rss', 'pss', 'private')}
+        print(f'  {config:8} RSS {mean["rss"]:6.1f}  PSS {mean["pss"]:6.1f}  private {mean["private"]:6.1f}'
+              f'   master RSS {memory["master"]["rss"] / 1024:6.1f}  PSS {memory["master"]["pss"] / 1024:6.1f}')
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
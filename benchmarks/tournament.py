@@ -0,0 +1,202 @@
+"""
+A whole tournament played by simulated clients:
+
+    python -m benchmarks.tournament
+    python -m benchmarks.tournament --players 256 --format single_elim
+
+Registers --players players in a tournament on a fresh file-backed SQLite
+database and plays it to the end through the HTTP API. At the start of each
+round every client asks for its game (api/tournament/<id>/game/). The games
+then run side by side: each pass over the open games makes one move step in
+every game, i.e. both choices and, unless the game is over, both next-round
+requests. After each pass, pending settlements are applied the way the
+settlement worker does it, which records match results and schedules the
+next round once the last game settles.
+
+Reported per tournament round: the games played, client requests, and the
+scheduler's own CPU time and database statements. The scheduler work is
+split into scheduling the round (standings, pairing and the bulk inserts)
+and recording its results as they settle. Swiss pairing CPU is also shown
+on its own.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+CHOICES = ('rock', 'paper', 'scissors')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.tournament',
+                                     description='Scheduler cost of a tournament played by simulated clients')
+    parser.add_argument('--players', type=int, default=1024, help='Registered players (default: 1024)')
+    parser.add_argument('--format', choices=('swiss', 'single_elim'), default='swiss',
+                        help='Tournament format (default: swiss)')
+    parser.add_argument('--rounds', type=int, default=0,
+                        help='Swiss rounds (default: 0, i.e. log2 of the players, rounded up)')
+    parser.add_argument('--output', help='Also write the results to a JSON file')
+    return parser.parse_args()
+
+
+class SchedulerMeter:
+    """CPU time and statements of the wrapped tournament functions, per tournament round"""
+
+    def __init__(self, tournaments):
+        self.tournaments = tournaments
+        self.active = None
+        self.rounds = defaultdict(lambda: defaultdict(float))
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.active is not None:
+            self.rounds[self.active[0]][f'{self.active[1]}_statements'] += 1
+        return execute(sql, params, many, context)
+
+    def wrap(self, name, kind, round_of, nested=False):
+        """Measure a tournament function; a nested one only has its CPU time taken, inside its caller's"""
+        original = getattr(self.tournaments, name)
+
+        def measured(*args, **kwargs):
+            if nested:
+                active, self.active = self.active, None
+                number = round_of()
+                self.active = active
+                began = time.process_time()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    self.rounds[number][f'{kind}_cpu_ms'] += (time.process_time() - began) * 1000
+            if self.active is not None:  # Called from another measured function
+                return original(*args, **kwargs)
+            self.active = (round_of(), kind)
+            began = time.process_time()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.rounds[self.active[0]][f'{kind}_cpu_ms'] += (time.process_time() - began) * 1000
+                self.active = None
+        setattr(self.tournaments, name, measured)
+
+
+def _post(client, path, payload):
+    response = client.post(path, json.dumps(payload), content_type='application/json')
+    assert response.status_code == 200, (path, response.status_code, response.content[:200])
+
+
+def play(client, tournament_id, players, rng):
+    """Play the tournament to the end; returns ({round: client requests}, the finished tournament)"""
+    from game import settlement
+    from game.models import OnlineGame, Tournament
+
+    requests = defaultdict(int)
+    while True:
+        tournament = Tournament.objects.get(pk=tournament_id)
+        if tournament.status == 'finished':
+            return requests, tournament
+        number = tournament.current_round
+        games = {}
+        for player_id in players:
+            response = client.get(f'/api/tournament/{tournament_id}/game/', {'player_id': player_id}).json()
+            requests[number] += 1
+            if response['game_id'] and not response['match_over']:
+                games.setdefault(response['game_id'], []).append(player_id)
+        while games:
+            for game_id, (first, second) in list(games.items()):
+                moves = rng.sample(CHOICES, 2) if rng.random() < 0.8 else [rng.choice(CHOICES)] * 2
+                _post(client, '/api/game/choice/', {'game_id': game_id, 'player_id': first, 'choice': moves[0]})
+                _post(client, '/api/game/choice/', {'game_id': game_id, 'player_id': second, 'choice': moves[1]})
+                requests[number] += 2
+                if OnlineGame.objects.values_list('status', flat=True).get(game_id=game_id) == 'finished':
+                    del games[game_id]
+                    continue
+                for player_id in (first, second):
+                    _post(client, '/api/game/next/', {'game_id': game_id, 'player_id': player_id})
+                requests[number] += 2
+            settlement.apply_pending()  # What the settlement worker does after these commits
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f'sqlite:///{tmp}/tournament.sqlite3'
+        os.environ['SETTLEMENT_MODE'] = 'command'  # Settlements are applied by play(), between passes
+        os.environ['ROUND_DEADLINES'] = 'False'  # Every client plays; no game times out
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rps_project.settings')
+        sys.path.insert(0, str(ROOT))
+
+        import django
+        django.setup()
+
+        from django.conf import settings
+        from django.core.management import call_command
+        from django.db import connection
+        from django.db.models import Count
+        from django.test import Client
+
+        from game import tournaments
+        from game.models import Tournament
+
+        settings.DEBUG = False
+        warnings.filterwarnings('ignore', message='No directory at')  # collectstatic output isn't needed
+        call_command('migrate', verbosity=0)
+
+        players = [f'client-{number:05d}' for number in range(args.players)]
+        tournament = tournaments.create(
+            'Benchmark', [(player_id, f'Player {number:05d}') for number, player_id in enumerate(players)],
+            format=args.format, rounds=args.rounds,
+        )
+        current = lambda: Tournament.objects.values_list('current_round', flat=True).get(pk=tournament.pk)
+        meter = SchedulerMeter(tournaments)
+        meter.wrap('advance', 'schedule', lambda: current() + 1)
+        meter.wrap('record_results', 'record', current)
+        meter.wrap('swiss_pairings', 'pairing', lambda: current() + 1, nested=True)
+
+        began = time.perf_counter()
+        with connection.execute_wrapper(meter):
+            tournaments.advance_due()
+            requests, tournament = play(Client(), tournament.pk, players, random.Random(0))
+        elapsed = time.perf_counter() - began
+        games = dict(tournament.matches.filter(game_id__isnull=False).values_list('round').annotate(Count('pk')))
+        connection.close()
+
+    results = {'players': args.players, 'format': args.format, 'rounds': tournament.rounds,
+               'winner': tournament.winner_name, 'elapsed_s': round(elapsed, 1), 'by_round': []}
+    for number in range(1, tournament.rounds + 1):
+        row = meter.rounds[number]
+        results['by_round'].append({
+            'round': number,
+            'games': games.get(number, 0),
+            'requests': requests[number],
+            'schedule_cpu_ms': round(row['schedule_cpu_ms'], 1),
+            'schedule_statements': int(row['schedule_statements']),
+            'pairing_cpu_ms': round(row['pairing_cpu_ms'], 1),
+            'record_cpu_ms': round(row['record_cpu_ms'], 1),
+            'record_statements': int(row['record_statements']),
+        })
+    finish = meter.rounds[tournament.rounds + 1]
+    results['finish'] = {'cpu_ms': round(finish['schedule_cpu_ms'], 1),
+                         'statements': int(finish['schedule_statements'])}
+
+    print(f'{args.format}, {args.players} players, {tournament.rounds} rounds, '
+          f'played in {results["elapsed_s"]}s, won by {tournament.winner_name}')
+    print(f'{"round":>5}{"games":>7}{"requests":>10}{"sched cpu ms":>14}{"sched stmts":>13}'
+          f'{"pairing ms":>12}{"record cpu ms":>15}{"record stmts":>14}')
+    for row in results['by_round']:
+        print(f'{row["round"]:>5}{row["games"]:>7}{row["requests"]:>10}{row["schedule_cpu_ms"]:>14.1f}'
+              f'{row["schedule_statements"]:>13}{row["pairing_cpu_ms"]:>12.1f}{row["record_cpu_ms"]:>15.1f}'
+              f'{row["record_statements"]:>14}')
+    print(f'finishing: {results["finish"]["cpu_ms"]}ms CPU, {results["finish"]["statements"]} statements')
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,216 @@
+"""
+Admin
+
+The changelists of the big tables (players, sessions, rounds, online games,
+matchmaking) are built to stay fast at hundreds of millions of rows. Stock
+changelists count the whole table twice and list distinct filter values with
+SELECT DISTINCT. Their date hierarchies take the first and last date and the
+distinct years, months or days in one pass over every row (on SQLite, that
+pass calls a Python function per row). Here instead:
+- EstimatedCountPaginator counts at most COUNT_LIMIT rows. An unfiltered list
+  that goes past that uses the planner's row estimate or the id span, and a
+  filtered one stops at COUNT_LIMIT. There is no second, unfiltered count.
+- IndexedDatesQuerySet and IndexedValuesFilter read the first/last dates and
+  the distinct periods or values with one ordered LIMIT 1 query each, jumping
+  from one to the next along an index (a loose index scan). Their cost grows
+  with the number of values shown, not with the rows.
+- Foreign keys in list_display are joined (list_select_related). Their form
+  widgets are raw id inputs, not a <select> of every row. Lists sort only on
+  indexed columns.
+"""
+
+from datetime import datetime, timedelta
+
+from django.conf import settings
 from django.contrib import admin
-from .models import Player, GameSession, GameRound
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Min, QuerySet
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import GameRound, GameSession, MatchmakingQueue, OnlineGame, Player, Tournament
+
+COUNT_LIMIT = 10000  # Rows a changelist counts exactly; past that it estimates (unfiltered) or stops
+
+
+def first_value(queryset, field, descending=False, **bound):
+    """The smallest (or largest) non-null value of field, past a bound if given: one ordered LIMIT 1 query"""
+    if bound:
+        # The bound goes first: given two lower bounds on a column, SQLite seeks to the first and scans from there
+        queryset = queryset.model._base_manager.using(queryset.db).filter(**bound) & queryset
+    ordered = queryset.filter(**{f'{field}__isnull': False}).order_by(f'-{field}' if descending else field)
+    return ordered.values_list(field, flat=True).first()
+
+
+def distinct_values(queryset, field):
+    """The distinct non-null values of field in order, one query per value (a loose index scan)"""
+    values = []
+    value = first_value(queryset, field)
+    while value is not None:
+        values.append(value)
+        value = first_value(queryset, field, **{f'{field}__gt': value})
+    return values
+
+
+def estimated_count(queryset):
+    """Rough row count of the queryset's table, without counting it; None if there's nothing to go on"""
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] >= 0:  # -1 until the table is first analyzed
+            return int(row[0])
+    if queryset.model._meta.pk.get_internal_type() in ('AutoField', 'BigAutoField'):
+        # Ids are handed out in order, so their span is the row count plus the rows deleted since
+        first, last = first_value(queryset, 'pk'), first_value(queryset, 'pk', descending=True)
+        return None if first is None else last - first + 1
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that counts no more than COUNT_LIMIT rows"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        counted = queryset[:COUNT_LIMIT + 1].count()
+        if counted <= COUNT_LIMIT:
+            return counted
+        if not queryset.query.has_filters():
+            estimate = estimated_count(queryset)
+            if estimate is not None:
+                return max(estimate, counted)
+        return COUNT_LIMIT  # Filtered: narrow it down (e.g. by date) to page further
+
+
+def _period_start(value, kind, tzinfo):
+    if tzinfo is not None:
+        value = value.astimezone(tzinfo)
+    return datetime(value.year, 1 if kind == 'year' else value.month, 1 if kind != 'day' else value.day,
+                    tzinfo=tzinfo)
+
+
+def _next_period(start, kind):
+    if kind == 'year':
+        return start.replace(year=start.year + 1)
+    if kind == 'month':
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start + timedelta(days=1)  # Wall-clock arithmetic, so midnight stays midnight across DST
+
+
+class IndexedDatesQuerySet(QuerySet):
+    """
+    QuerySet for admin lists whose first/last dates and date periods come from an index
+    aggregate() of plain Min/Max fields reads each bound with its own LIMIT 1
+    query, instead of one query that SQLite can only answer with a scan.
+    datetimes() by year, month or day returns a list. It jumps from the start
+    of each period to the first row of the next one that has rows.
+    """
+
+    def aggregate(self, *args, **kwargs):
+        bounds = {alias: self._bound(aggregate) for alias, aggregate in kwargs.items()}
+        if args or not kwargs or None in bounds.values():
+            return super().aggregate(*args, **kwargs)
+        return {alias: first_value(self, field, descending) for alias, (field, descending) in bounds.items()}
+
+    @staticmethod
+    def _bound(aggregate):
+        """(field name, descending) for Min('field') / Max('field'), else None"""
+        if type(aggregate) not in (Min, Max) or aggregate.filter is not None or aggregate.distinct:
+            return None
+        source = aggregate.get_source_expressions()[0]
+        if not hasattr(source, 'name'):
+            return None
+        return source.name, isinstance(aggregate, Max)
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None, **kwargs):
+        if kind not in ('year', 'month', 'day'):
+            return super().datetimes(field_name, kind, order, tzinfo, **kwargs)
+        if tzinfo is None and settings.USE_TZ:
+            tzinfo = timezone.get_current_timezone()
+        periods = []
+        value = first_value(self, field_name)
+        while value is not None:
+            periods.append(_period_start(value, kind, tzinfo))
+            value = first_value(self, field_name, **{f'{field_name}__gte': _next_period(periods[-1], kind)})
+        return periods if order == 'ASC' else periods[::-1]
+
+
+class IndexedValuesFilter(admin.AllValuesFieldListFilter):
+    """AllValuesFieldListFilter for a non-null column that leads an index; see distinct_values()"""
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.lookup_choices = distinct_values(model_admin.get_queryset(request), field.name)
+
+
+class BigTableAdmin(admin.ModelAdmin):
+    """Changelist defaults for tables too big to count or scan"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return IndexedDatesQuerySet(self.model, query=queryset.query, using=queryset._db, hints=queryset._hints)
 
 
 @admin.register(Player)
-class PlayerAdmin(admin.ModelAdmin):
+class PlayerAdmin(BigTableAdmin):
     list_display = ['name', 'score', 'total_wins', 'total_losses', 'total_games', 'best_streak', 'created_at']
     list_filter = ['created_at']
     search_fields = ['name']
-    ordering = ['-score']
+    date_hierarchy = 'created_at'
+    ordering = ['-score', '-total_wins', 'total_losses', 'id']  # player_leaderboard_idx
+    sortable_by = ['name', 'score', 'created_at']
 
 
 @admin.register(GameSession)
-class GameSessionAdmin(admin.ModelAdmin):
+class GameSessionAdmin(BigTableAdmin):
     list_display = ['id', 'player', 'difficulty', 'mode', 'player_wins', 'ai_wins', 'draws', 'total_rounds', 'created_at']
-    list_filter = ['difficulty', 'mode', 'created_at']
+    list_filter = ['difficulty', ('mode', IndexedValuesFilter), 'created_at']
+    list_select_related = ['player']
+    raw_id_fields = ['player']
+    date_hierarchy = 'created_at'
+    ordering = ['-created_at', '-id']
+    sortable_by = ['id', 'created_at']
 
 
 @admin.register(GameRound)
-class GameRoundAdmin(admin.ModelAdmin):
+class GameRoundAdmin(BigTableAdmin):
     list_display = ['id', 'session', 'player_choice', 'ai_choice', 'result', 'created_at']
-    list_filter = ['result', 'created_at']
+    list_filter = [('result', IndexedValuesFilter), 'created_at']
+    list_select_related = ['session']
+    raw_id_fields = ['session']
+    date_hierarchy = 'created_at'
+    ordering = ['-created_at', '-id']
+    sortable_by = ['id', 'created_at']
+
+
+@admin.register(OnlineGame)
+class OnlineGameAdmin(BigTableAdmin):
+    list_display = ['game_id', 'mode', 'status', 'player1_name', 'player2_name', 'player1_score', 'player2_score',
+                    'current_round', 'winner', 'created_at']
+    list_filter = [('status', IndexedValuesFilter), 'created_at']
+    search_fields = ['game_id__exact']  # Unique index; '=' would be a case-insensitive scan
+    date_hierarchy = 'created_at'
+    ordering = ['-created_at', '-id']
+    sortable_by = ['game_id', 'created_at']
+
+
+@admin.register(MatchmakingQueue)
+class MatchmakingQueueAdmin(BigTableAdmin):
+    list_display = ['player_name', 'mode', 'status', 'ticket', 'matched_game_id', 'created_at', 'last_seen']
+    list_filter = [('status', IndexedValuesFilter)]
+    search_fields = ['player_id__exact']
+    date_hierarchy = 'created_at'
+    ordering = ['created_at', 'id']
+    sortable_by = ['created_at', 'last_seen']
+
+
+@admin.register(Tournament)
+class TournamentAdmin(admin.ModelAdmin):
+    list_display = ['name', 'format', 'mode', 'status', 'current_round', 'rounds', 'winner_name', 'starts_at']
+    list_filter = ['format', 'status']
+    readonly_fields = ['current_round', 'open_matches', 'winner_name', 'finished_at']
@@ -0,0 +1,144 @@
+"""
+Element Usage Analytics
+
+Rounds from play_round and make_choice are counted into an in-process buffer
+keyed by (day, mode, difficulty, player_choice, ai_choice, result). The buffer
+is flushed into ElementUsage rollup rows in batches, once it holds
+FLUSH_EVERY rounds or FLUSH_INTERVAL seconds have passed, and again when the
+worker exits. Flushes run on a background thread (see game/flushing.py), never
+in the request that made them due. A batch that fails is retried one rollup
+row at a time and the rows that still fail are dropped, so one bad key can't
+block later flushes. Reads only touch the rollup table, whose size depends on the
+number of days and element combinations, never on how many rounds were played.
+"""
+
+import atexit
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .flushing import BackgroundFlusher
+from .models import ElementUsage
+
+FLUSH_EVERY = 200  # Rounds buffered before writing
+FLUSH_INTERVAL = 30  # Seconds between writes when traffic is light
+
+ROLLUP_FIELDS = ('day', 'mode', 'difficulty', 'player_choice', 'ai_choice', 'result')
+
+_pending = Counter()
+_pending_rounds = 0
+_last_flush = time.monotonic()
+_lock = threading.Lock()
+
+
+def record_round(mode, difficulty, player_choice, ai_choice, result):
+    """Count one round into the rollup buffer, waking the flush thread if it is due"""
+    global _pending_rounds
+    key = (timezone.localdate(), mode, difficulty, player_choice, ai_choice, result)
+    with _lock:
+        _pending[key] += 1
+        _pending_rounds += 1
+        due = (_pending_rounds >= FLUSH_EVERY or
+               time.monotonic() - _last_flush >= FLUSH_INTERVAL)
+    if due:
+        flusher.wake()
+    else:
+        flusher.start()  # Its timer writes what's buffered if no more traffic comes
+
+
+def _write(batch):
+    with transaction.atomic():
+        # Make sure every rollup row exists, then add the deltas in place
+        ElementUsage.objects.bulk_create(
+            [ElementUsage(**dict(zip(ROLLUP_FIELDS, key))) for key in batch],
+            ignore_conflicts=True,
+        )
+        for key, count in batch.items():
+            ElementUsage.objects.filter(**dict(zip(ROLLUP_FIELDS, key))).update(
+                count=F('count') + count
+            )
+
+
+def flush():
+    """Write buffered counts into ElementUsage; returns the number of rounds written (dropped ones excluded)"""
+    global _pending, _pending_rounds, _last_flush
+    with _lock:
+        batch, _pending = _pending, Counter()
+        rounds, _pending_rounds = _pending_rounds, 0
+        _last_flush = time.monotonic()
+    if not batch:
+        return 0
+
+    try:
+        _write(batch)
+        return rounds
+    except Exception:
+        traceback.print_exc()
+    # Retry row by row and drop the rows that still fail
+    written = 0
+    for key, count in batch.items():
+        try:
+            _write({key: count})
+            written += count
+        except Exception:
+            print(f'element usage: dropped {count} rounds for {key!r}')
+    return written
+
+
+flusher = BackgroundFlusher('analytics-flush', flush, FLUSH_INTERVAL)
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def element_usage(days=7, mode=None, difficulty=None):
+    """
+    Summarise the rollups for the last `days` days
+    Returns pick counts per element for both sides and result totals,
+    grouped by mode and difficulty.
+    """
+    today = timezone.localdate()
+    rows = ElementUsage.objects.filter(day__gt=today - timedelta(days=days))
+    if mode:
+        rows = rows.filter(mode=mode)
+    if difficulty:
+        rows = rows.filter(difficulty=difficulty)
+
+    def nested():
+        return defaultdict(lambda: defaultdict(dict))
+
+    player_picks = nested()
+    for row in rows.values('mode', 'difficulty', 'player_choice').annotate(total=Sum('count')):
+        player_picks[row['mode']][row['difficulty']][row['player_choice']] = row['total']
+
+    ai_picks = nested()
+    for row in rows.values('mode', 'difficulty', 'ai_choice').annotate(total=Sum('count')):
+        ai_picks[row['mode']][row['difficulty']][row['ai_choice']] = row['total']
+
+    results = nested()
+    for row in rows.values('mode', 'difficulty', 'result').annotate(total=Sum('count')):
+        results[row['mode']][row['difficulty']][row['result']] = row['total']
+
+    def plain(tree):
+        return {m: {d: dict(v) for d, v in diffs.items()} for m, diffs in tree.items()}
+
+    return {
+        'days': days,
+        'since': (today - timedelta(days=days - 1)).isoformat(),
+        'player_picks': plain(player_picks),
+        'ai_picks': plain(ai_picks),
+        'results': plain(results),
+    }
@@ -1,6 +1,24 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
 
 
 class GameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'game'
+
+    def ready(self):
+        from .sqlite import configure_connection
+        connection_created.connect(configure_connection, dispatch_uid='game.sqlite.configure_connection')
+
+        from .fragments import drop_top_players
+        from .rankings import score_changed
+        score_changed.connect(drop_top_players, dispatch_uid='game.fragments.drop_top_players')
+
+        # Checked here, at startup, rather than by the first request the profiler looks at
+        from .profiling import parse_rates
+        try:
+            parse_rates(settings.PROFILING_SAMPLE_RATES)
+        except ValueError as e:
+            raise ImproperlyConfigured(f'PROFILING_SAMPLE_RATES: {e}')
@@ -0,0 +1,196 @@
+"""
+Spectator Broadcast Hub
+
+Spectators of an OnlineGame all read the same snapshot. Each worker keeps one
+channel per watched game holding the serialized snapshot bytes and a version
+number. A channel re-reads its game from the database at most once per
+REFRESH_INTERVAL, however many spectators poll it. A snapshot is only
+re-serialized when the game actually changed. Views that change a game in
+this worker publish straight into the hub, so local watchers see moves
+without waiting for the next refresh.
+
+Watchers can long-poll: wait_for_change() blocks on a condition variable
+until the channel's version moves past the one they already have. A waiting
+watcher holds a request thread, so only max_waiters of them wait at once per
+worker; the others get the current snapshot straight away.
+"""
+
+import json
+import threading
+import time
+
+from .game_logic import ELEMENTS
+from .models import OnlineGame
+
+REFRESH_INTERVAL = 1.0  # Seconds between database reads per watched game
+FEATURED_INTERVAL = 5.0  # Seconds between refreshes of the featured games list
+MAX_CHANNELS = 5000
+IDLE_CHANNEL_SECONDS = 300
+
+SNAPSHOT_FIELDS = (
+    'game_id', 'mode', 'status', 'current_round',
+    'player1_name', 'player1_score', 'player1_choice',
+    'player2_name', 'player2_score', 'player2_choice',
+    'winner', 'forfeit_by', 'round_result', 'round_start_time',
+)
+
+
+def build_snapshot(game):
+    """Public view of a game: choices are only revealed once the round is over"""
+    revealed = game['status'] in ('round_complete', 'finished', 'forfeit')
+    snapshot = {
+        'game_id': game['game_id'],
+        'mode': game['mode'],
+        'status': game['status'],
+        'current_round': game['current_round'],
+        'player1_name': game['player1_name'],
+        'player2_name': game['player2_name'],
+        'player1_score': game['player1_score'],
+        'player2_score': game['player2_score'],
+        'player1_chose': bool(game['player1_choice']),
+        'player2_chose': bool(game['player2_choice']),
+        'winner': game['winner'],
+        'forfeit_by': game['forfeit_by'],
+        'round_start_time': game['round_start_time'].isoformat() if game['round_start_time'] else None,
+    }
+    if revealed and game['round_result']:
+        snapshot['round_result'] = json.loads(game['round_result'])
+    elif revealed and game['player1_choice'] and game['player2_choice']:
+        snapshot['round_result'] = {
+            'player1_choice': game['player1_choice'],
+            'player1_emoji': ELEMENTS[game['player1_choice']]['emoji'],
+            'player2_choice': game['player2_choice'],
+            'player2_emoji': ELEMENTS[game['player2_choice']]['emoji'],
+        }
+    return snapshot
+
+
+class _Channel:
+    __slots__ = ('version', 'body', 'snapshot', 'refreshed_at', 'last_read', 'lock')
+
+    def __init__(self):
+        self.version = 0
+        self.body = None
+        self.snapshot = None
+        self.refreshed_at = 0.0
+        self.last_read = 0.0
+        self.lock = threading.Lock()
+
+
+class BroadcastHub:
+    """Shares one serialized snapshot per game among all of its spectators"""
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._featured = ([], 0.0)
+        self._waiters = 0
+        self.db_reads = 0  # Exposed for benchmarks
+    
+    def __len__(self):
+        return len(self._channels)
+
+    def _channel(self, game_id):
+        with self._lock:
+            channel = self._channels.get(game_id)
+            if channel is None:
+                if len(self._channels) >= MAX_CHANNELS:
+                    self._evict_idle()
+                channel = self._channels[game_id] = _Channel()
+            return channel
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - IDLE_CHANNEL_SECONDS
+        for game_id in [g for g, c in self._channels.items() if c.last_read < cutoff]:
+            del self._channels[game_id]
+
+    def _store(self, channel, snapshot):
+        """Swap in a new snapshot if it differs; returns True if the version moved"""
+        if snapshot == channel.snapshot:
+            return False
+        with self._changed:
+            channel.version += 1
+            snapshot = dict(snapshot, version=channel.version)
+            channel.snapshot = {k: v for k, v in snapshot.items() if k != 'version'}
+            channel.body = json.dumps(snapshot).encode()
+            self._changed.notify_all()
+        return True
+
+    def get(self, game_id):
+        """
+        Return (version, body) for a game, or None if it doesn't exist
+        Reads the database at most once per refresh interval per game.
+        """
+        channel = self._channel(game_id)
+        now = time.monotonic()
+        channel.last_read = now
+        if channel.body is not None and now - channel.refreshed_at < self.refresh_interval:
+            return channel.version, channel.body
+
+        with channel.lock:
+            # Another spectator may have refreshed while we waited
+            if channel.body is None or time.monotonic() - channel.refreshed_at >= self.refresh_interval:
+                game = OnlineGame.objects.filter(game_id=game_id).values(*SNAPSHOT_FIELDS).first()
+                self.db_reads += 1
+                channel.refreshed_at = time.monotonic()
+                if game is None:
+                    with self._lock:
+                        self._channels.pop(game_id, None)
+                    return None
+                self._store(channel, build_snapshot(game))
+        return channel.version, channel.body
+
+    def publish(self, game):
+        """Push a freshly saved OnlineGame into the hub (no database read)"""
+        with self._lock:
+            channel = self._channels.get(game.game_id)
+        if channel is None:
+            return  # Nobody is watching this game in this worker
+        values = {field: getattr(game, field) for field in SNAPSHOT_FIELDS}
+        with channel.lock:
+            self._store(channel, build_snapshot(values))
+            channel.refreshed_at = time.monotonic()
+
+    def wait_for_change(self, game_id, since_version, timeout, max_waiters):
+        """
+        Block until the game's version passes since_version or timeout expires
+        If max_waiters callers are already waiting, returns the current snapshot without waiting.
+        """
+        result = self.get(game_id)
+        if result is None or result[0] > since_version:
+            return result
+        with self._lock:
+            if self._waiters >= max_waiters:
+                return result
+            self._waiters += 1
+        try:
+            deadline = time.monotonic() + timeout
+            while result is not None and result[0] <= since_version:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                with self._changed:
+                    self._changed.wait(min(remaining, self.refresh_interval))
+                result = self.get(game_id)
+        finally:
+            with self._lock:
+                self._waiters -= 1
+        return result
+
+    def featured_games(self, limit=5):
+        """Most recently active live games, refreshed at most every FEATURED_INTERVAL"""
+        games, fetched_at = self._featured
+        if time.monotonic() - fetched_at >= FEATURED_INTERVAL:
+            games = list(
+                OnlineGame.objects.filter(status__in=['playing', 'round_complete'])
+                .order_by('-updated_at')
+                .values('game_id', 'mode', 'player1_name', 'player2_name',
+                        'player1_score', 'player2_score', 'current_round')[:limit]
+            )
+            self._featured = (games, time.monotonic())
+        return games[:limit]
+
+
+hub = BroadcastHub()
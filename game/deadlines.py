@@ -0,0 +1,251 @@
+"""
+Round Deadlines
+
+The server owns the PvP round clock: a round that is still 'playing'
+ROUND_TIME_LIMIT (+ ROUND_DEADLINE_GRACE for latency) seconds after its
+round_start_time ends the game, and whoever has not chosen forfeits. If
+neither player chose, the game ends with no winner. Clients only display the
+countdown.
+
+Deadlines are kept in a hierarchical timer wheel (Varghese & Lauck): LEVELS
+wheels of SLOTS slots, where level n's slots each span SLOTS**n ticks.
+Scheduling and cancelling are O(1) dict operations. Each tick empties one
+level-0 slot, and when a level wraps, one slot of the level above is
+re-distributed into the levels below. Every timer is re-distributed at most
+LEVELS - 1 times, so expiring is O(1) amortized per timer, however many games
+are live, and nothing ever scans all games.
+
+Each process runs one scheduler thread, started on first use. At start it
+loads every game still 'playing' once, since timers don't survive a
+restart. Games are scheduled again wherever a round starts and whenever a
+player polls a game, so every worker that serves a game tracks its deadline.
+Expiring is idempotent: expired games are re-checked under the row lock, in
+batches of EXPIRE_BATCH per transaction, and one that already moved on is
+left alone.
+"""
+
+import math
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import settlement, tournaments
+from .broadcast import hub
+from .models import OnlineGame
+from .routers import gamestate_db
+
+TICK = 0.1  # Seconds per level-0 slot
+SLOTS = 256  # Level 0 spans 25.6s, so round deadlines never need re-distributing
+LEVELS = 3  # 256**3 ticks: deadlines up to ~19 days ahead before they park
+EXPIRE_BATCH = 500  # Games ended per transaction
+
+
+class TimerWheel:
+    """
+    Hierarchical timer wheel of keys with deadlines (in seconds, any clock)
+    Not thread-safe; DeadlineScheduler guards it with a lock.
+    """
+
+    def __init__(self, now, tick=TICK, slots=SLOTS, levels=LEVELS):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.current = math.floor(now / tick)
+        self._wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self._where = {}  # key -> (level, slot)
+        self.cascaded = 0  # Timers re-distributed to a lower level, for benchmarks
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def schedule(self, key, deadline, value=None):
+        """Fire key (with value) at the first tick at or after deadline; replaces an earlier timer for key"""
+        self.cancel(key)
+        self._place(key, max(math.ceil(deadline / self.tick), self.current + 1), value)
+
+    def cancel(self, key):
+        where = self._where.pop(key, None)
+        if where is not None:
+            level, slot = where
+            del self._wheels[level][slot][key]
+
+    def _place(self, key, due, value):
+        # Beyond the top wheel's reach a timer parks in its last slot and is re-placed on every lap
+        position = min(due, self.current + self.slots ** self.levels - 1)
+        delta = position - self.current
+        level = 0
+        while level < self.levels - 1 and delta >= self.slots ** (level + 1):
+            level += 1
+        slot = (position // self.slots ** level) % self.slots
+        self._wheels[level][slot][key] = (due, value)
+        self._where[key] = (level, slot)
+
+    def advance(self, now):
+        """Move the wheel to now; returns the (key, value) pairs that fell due, tick by tick"""
+        target = math.floor(now / self.tick)
+        if not self._where:
+            self.current = max(self.current, target)
+            return []
+        fired = []
+        while self.current < target:
+            self.current += 1
+            # Re-distribute the slot of every level that just wrapped, highest first
+            level = 1
+            while level < self.levels and self.current % self.slots ** level == 0:
+                level += 1
+            for upper in range(level - 1, 0, -1):
+                slot = (self.current // self.slots ** upper) % self.slots
+                entries, self._wheels[upper][slot] = self._wheels[upper][slot], {}
+                for key, (due, value) in entries.items():
+                    self._place(key, due, value)
+                self.cascaded += len(entries)
+            slot = self.current % self.slots
+            entries, self._wheels[0][slot] = self._wheels[0][slot], {}
+            for key, (due, value) in entries.items():
+                if due > self.current:
+                    self._place(key, due, value)  # Parked far-future timer, another lap to go
+                    continue
+                del self._where[key]
+                fired.append((key, value))
+        return fired
+
+
+def round_deadline(round_start_time):
+    """When a round that started at round_start_time times out"""
+    return round_start_time + timedelta(seconds=settings.ROUND_TIME_LIMIT + settings.ROUND_DEADLINE_GRACE)
+
+
+def expire(game_ids, now=None):
+    """
+    End the games among game_ids whose current round is past its deadline
+    Runs in batches of EXPIRE_BATCH, each in one transaction; returns the
+    games that were ended.
+    """
+    now = now or timezone.now()
+    ended = []
+    for start in range(0, len(game_ids), EXPIRE_BATCH):
+        batch = game_ids[start:start + EXPIRE_BATCH]
+        with transaction.atomic(using=gamestate_db()):
+            games = OnlineGame.objects.select_for_update().filter(game_id__in=batch, status='playing')
+            timed_out = []
+            for game in games:
+                if game.round_start_time and round_deadline(game.round_start_time) <= now:
+                    timed_out.append(game)
+                else:
+                    scheduler.watch(game)  # A newer round started since this timer was set
+            # One UPDATE per outcome rather than a per-row CASE (bulk_update)
+            outcomes = {
+                'player1': (F('player1_name'), F('player2_name')),
+                'player2': (F('player2_name'), F('player1_name')),
+                None: (None, None),  # Neither chose: nobody wins
+            }
+            winners = {outcome: [] for outcome in outcomes}
+            settlements = []
+            for game in timed_out:
+                if game.player1_choice and not game.player2_choice:
+                    outcome, game.winner, game.forfeit_by = 'player1', game.player1_name, game.player2_name
+                elif game.player2_choice and not game.player1_choice:
+                    outcome, game.winner, game.forfeit_by = 'player2', game.player2_name, game.player1_name
+                else:
+                    outcome, game.winner, game.forfeit_by = None, None, None
+                winner_id = {'player1': game.player1_id, 'player2': game.player2_id}.get(outcome, '')
+                game.status = 'forfeit'
+                game.updated_at = now
+                winners[outcome].append(game.pk)
+                if outcome or tournaments.is_tournament_game(game.game_id):
+                    # Tournament games settle either way, so their round can move on
+                    settlements.append((game.game_id, game.winner or '', game.forfeit_by or '', winner_id))
+            for outcome, pks in winners.items():
+                if pks:
+                    winner, forfeit_by = outcomes[outcome]
+                    OnlineGame.objects.filter(pk__in=pks).update(
+                        status='forfeit', winner=winner, forfeit_by=forfeit_by, updated_at=now)
+            settlement.enqueue_many(settlements)
+        for game in timed_out:
+            hub.publish(game)
+        ended.extend(timed_out)
+    return ended
+
+
+class DeadlineScheduler:
+    """Per-process scheduler thread firing round deadlines from a TimerWheel"""
+
+    def __init__(self, tick=TICK):
+        self.tick = tick
+        self._lock = threading.Lock()
+        self._wheel = TimerWheel(time.time(), tick)
+        self._thread = None
+
+    def __len__(self):
+        return len(self._wheel)
+
+    def watch(self, game):
+        """Track the deadline of game's current round, if it is waiting for choices"""
+        if game.status == 'playing' and game.round_start_time:
+            self.schedule(game.game_id, game.round_start_time)
+
+    def schedule(self, game_id, round_start_time):
+        if not settings.ROUND_DEADLINES:
+            return
+        self._ensure_started()
+        deadline = round_deadline(round_start_time).timestamp()
+        with self._lock:
+            self._wheel.schedule(game_id, deadline)
+
+    def cancel(self, game_id):
+        with self._lock:
+            self._wheel.cancel(game_id)
+
+    def _ensure_started(self):
+        # Threads don't survive fork, so a worker forked from a preloaded master starts its own
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='round-deadlines', daemon=True)
+                self._thread.start()
+
+    def _recover(self):
+        """Schedule every game that is waiting for choices (once, when the thread starts)"""
+        live = OnlineGame.objects.filter(status='playing', round_start_time__isnull=False).values_list(
+            'game_id', 'round_start_time')
+        for game_id, round_start_time in live.iterator(chunk_size=2000):
+            with self._lock:
+                if game_id not in self._wheel:
+                    self._wheel.schedule(game_id, round_deadline(round_start_time).timestamp())
+
+    def _run(self):
+        try:
+            self._recover()
+        except Exception:
+            traceback.print_exc()  # Games polled or restarted from now on are still tracked
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.tick
+            time.sleep(max(next_tick - time.monotonic(), 0))
+            with self._lock:
+                fired = self._wheel.advance(time.time())
+            if not fired:
+                continue
+            close_old_connections()
+            try:
+                expire([game_id for game_id, _ in fired])
+            except Exception:
+                traceback.print_exc()
+                # Try again on the next tick; games that moved on are skipped
+                with self._lock:
+                    for game_id, _ in fired:
+                        if game_id not in self._wheel:
+                            self._wheel.schedule(game_id, time.time())
+
+
+scheduler = DeadlineScheduler()
@@ -0,0 +1,127 @@
+"""
+Bulk Data Export
+
+Streams players, rounds and online games as NDJSON or CSV. Rows come
+from values() querysets read through iterator(chunk_size=...), i.e. a server-side
+cursor on PostgreSQL and chunked fetches on SQLite, and are encoded one at a
+time, so memory stays flat regardless of how many rows are exported.
+"""
+
+import csv
+import json
+from datetime import datetime, time as dt_time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import ArchivedOnlineGame, GameRound, OnlineGame, Player
+
+CHUNK_SIZE = 2000
+
+# dataset -> (model, exported fields, date field, mode field or None)
+DATASETS = {
+    'players': (
+        Player,
+        ('id', 'name', 'score', 'total_wins', 'total_losses', 'total_draws',
+         'total_games', 'normal_wins', 'hard_wins', 'veteran_wins', 'current_streak',
+         'best_streak', 'created_at', 'updated_at'),
+        'created_at',
+        None,
+    ),
+    'rounds': (
+        GameRound,
+        ('id', 'session_id', 'session__mode', 'session__difficulty', 'player_choice',
+         'ai_choice', 'result', 'created_at'),
+        'created_at',
+        'session__mode',
+    ),
+    'games': (
+        OnlineGame,
+        ('id', 'game_id', 'mode', 'status', 'player1_name', 'player2_name',
+         'player1_score', 'player2_score', 'current_round', 'winner', 'forfeit_by',
+         'created_at', 'updated_at'),
+        'created_at',
+        'mode',
+    ),
+    'archived_games': (
+        ArchivedOnlineGame,
+        ('id', 'game_id', 'mode', 'status', 'player1_name', 'player2_name',
+         'player1_score', 'player2_score', 'rounds_played', 'winner', 'forfeit_by',
+         'created_at', 'ended_at'),
+        'ended_at',
+        'mode',
+    ),
+}
+
+FORMATS = ('ndjson', 'csv')
+
+
+def parse_bound(value, end=False):
+    """Parse a YYYY-MM-DD or ISO datetime filter bound; dates cover the whole day"""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        moment = datetime.combine(day, dt_time.max if end else dt_time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_rows(dataset, since=None, until=None, mode=None, chunk_size=CHUNK_SIZE):
+    """Iterate rows (dicts) of a dataset, filtered by date range and mode"""
+    if dataset not in DATASETS:
+        raise ValueError(f'Unknown dataset: {dataset}')
+    model, fields, date_field, mode_field = DATASETS[dataset]
+
+    rows = model.objects.order_by('pk')
+    if since:
+        rows = rows.filter(**{f'{date_field}__gte': since})
+    if until:
+        rows = rows.filter(**{f'{date_field}__lte': until})
+    if mode:
+        if mode_field is None:
+            raise ValueError(f'{dataset} cannot be filtered by mode')
+        rows = rows.filter(**{mode_field: mode})
+    return rows.values(*fields).iterator(chunk_size=chunk_size)
+
+
+def export_fields(dataset):
+    return DATASETS[dataset][1]
+
+
+def _plain(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def ndjson_lines(rows):
+    """Encode rows as newline-delimited JSON"""
+    for row in rows:
+        yield json.dumps({key: _plain(value) for key, value in row.items()}) + '\n'
+
+
+class _Echo:
+    """File-like object whose write() just returns the line (for csv.writer)"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, fields):
+    """Encode rows as CSV with a header line"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([_plain(row[field]) for field in fields])
+
+
+def encode(rows, dataset, fmt):
+    """Lines of the export in the requested format"""
+    if fmt == 'csv':
+        return csv_lines(rows, export_fields(dataset))
+    if fmt == 'ndjson':
+        return ndjson_lines(rows)
+    raise ValueError(f'Unknown format: {fmt}')
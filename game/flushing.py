@@ -0,0 +1,54 @@
+"""
+Background Buffer Flushes
+
+The in-process write buffers (element usage rollups, opponent profiles) are
+filled by requests but written by a daemon thread per worker process. A
+request that finds its buffer due only wakes the thread, so it never waits
+on the write, never writes while holding its own transaction or row locks,
+and never fails because a flush failed. The thread also flushes on its own
+every interval seconds, so the last few entries are written once traffic
+stops instead of waiting for the next request or the process exit. The buffers' flush functions don't
+raise for bad rows; anything else they raise is printed and the thread keeps
+going.
+"""
+
+import threading
+import traceback
+
+from django.db import close_old_connections
+
+
+class BackgroundFlusher:
+    """Daemon thread calling flush() whenever woken and every interval seconds (None: only when woken)"""
+
+    def __init__(self, name, flush, interval=None):
+        self.name = name
+        self.flush = flush
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def wake(self):
+        self.start()
+        self._wakeup.set()
+
+    def start(self):
+        """Start the thread if this process doesn't have it running yet"""
+        # Threads don't survive fork, so a worker forked from a preloaded master starts its own
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc()
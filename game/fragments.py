@@ -0,0 +1,31 @@
+"""
+Template Fragment Caching
+
+The top-players blocks on the home and play pages are rendered once and kept
+in the 'template_fragments' cache ({% cache %} tags in the templates), so a
+page view no longer queries the leaderboard. The querysets in the views are
+lazy and only evaluated inside the tag, i.e. on a miss.
+
+Fragments are dropped when rankings.score_changed fires, i.e. when the score
+version moves on; the pages read the version so a pending move happens there
+too. The signal only reaches the process that moved it, so with the per-process
+local-memory backend other workers keep their copy until TIMEOUT (the same
+staleness the cached leaderboard API pages allow); a file-based backend
+shared by all workers sees the deletion at once.
+"""
+
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+
+from . import rankings
+
+CACHE_ALIAS = 'template_fragments'
+HOME_TOP_PLAYERS = 'home_top_players'
+GAME_TOP_PLAYERS = 'game_top_players'
+TOP_PLAYERS_FRAGMENTS = (HOME_TOP_PLAYERS, GAME_TOP_PLAYERS)
+TIMEOUT = rankings.PAGE_CACHE_TIMEOUT
+
+
+def drop_top_players(sender, **kwargs):
+    """score_changed receiver: forget the rendered top-players fragments"""
+    caches[CACHE_ALIAS].delete_many([make_template_fragment_key(name) for name in TOP_PLAYERS_FRAGMENTS])
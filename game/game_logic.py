@@ -14,8 +14,11 @@ Elements and their relationships:
 - Shield: Blocks Gun, Rock, Scissors
 """
 
+import json
 import random
-from collections import Counter
+import secrets
+from collections import Counter, deque
+from functools import lru_cache
 
 
 # Define all elements and what they beat
@@ -76,6 +79,7 @@ ELEMENTS = {
 CLASSIC_ELEMENTS = ['rock', 'paper', 'scissors']
 EXTENDED_ELEMENTS = ['rock', 'paper', 'scissors', 'fire', 'water']
 FULL_ELEMENTS = list(ELEMENTS.keys())
+MODES = ('classic', 'extended', 'full')
 
 
 def get_elements_for_mode(mode='classic'):
@@ -88,78 +92,301 @@ def get_elements_for_mode(mode='classic'):
         return FULL_ELEMENTS
 
 
+# Why the winner beats the loser, for the round result message
+WIN_DESCRIPTIONS = {
+    ('rock', 'scissors'): 'Rock crushes Scissors!',
+    ('rock', 'lizard'): 'Rock crushes Lizard!',
+    ('rock', 'fire'): 'Rock smothers Fire!',
+    ('paper', 'rock'): 'Paper covers Rock!',
+    ('paper', 'air'): 'Paper catches Air!',
+    ('paper', 'water'): 'Paper absorbs Water!',
+    ('scissors', 'paper'): 'Scissors cuts Paper!',
+    ('scissors', 'air'): 'Scissors cuts through Air!',
+    ('scissors', 'lizard'): 'Scissors decapitates Lizard!',
+    ('fire', 'paper'): 'Fire burns Paper!',
+    ('fire', 'scissors'): 'Fire melts Scissors!',
+    ('fire', 'air'): 'Fire consumes Air!',
+    ('fire', 'lizard'): 'Fire roasts Lizard!',
+    ('water', 'fire'): 'Water extinguishes Fire!',
+    ('water', 'rock'): 'Water erodes Rock!',
+    ('water', 'lizard'): 'Water drowns Lizard!',
+    ('water', 'gun'): 'Water rusts Gun!',
+    ('air', 'fire'): 'Air suffocates Fire!',
+    ('air', 'rock'): 'Air erodes Rock!',
+    ('air', 'water'): 'Air evaporates Water!',
+    ('lizard', 'paper'): 'Lizard eats Paper!',
+    ('lizard', 'air'): 'Lizard breathes Air!',
+    ('lizard', 'lightning'): 'Lizard grounds Lightning!',
+    ('gun', 'rock'): 'Gun shatters Rock!',
+    ('gun', 'scissors'): 'Gun destroys Scissors!',
+    ('gun', 'fire'): 'Gun blows out Fire!',
+    ('gun', 'lizard'): 'Gun shoots Lizard!',
+    ('gun', 'air'): 'Gun pierces Air!',
+    ('gun', 'lightning'): 'Gun conducts Lightning!',
+    ('lightning', 'water'): 'Lightning electrifies Water!',
+    ('lightning', 'scissors'): 'Lightning melts Scissors!',
+    ('lightning', 'gun'): 'Lightning magnetizes Gun!',
+    ('lightning', 'fire'): 'Lightning outshines Fire!',
+    ('shield', 'gun'): 'Shield blocks Gun!',
+    ('shield', 'rock'): 'Shield deflects Rock!',
+    ('shield', 'scissors'): 'Shield blocks Scissors!',
+    ('shield', 'lightning'): 'Shield grounds Lightning!',
+}
+
+# Lookup tables built once at import: (player, ai) -> result, (winner, loser) -> reason
+OUTCOMES = {
+    (player_choice, ai_choice): 'draw' if player_choice == ai_choice else
+    'win' if ai_choice in ELEMENTS[player_choice]['beats'] else 'lose'
+    for player_choice in ELEMENTS for ai_choice in ELEMENTS
+}
+WIN_REASONS = {
+    (winner, loser): WIN_DESCRIPTIONS.get(
+        (winner, loser), f'{ELEMENTS[winner]["emoji"]} {winner.capitalize()} beats {loser.capitalize()}!'
+    )
+    for winner in ELEMENTS for loser in ELEMENTS[winner]['beats']
+}
+
+
 def determine_winner(player_choice, ai_choice):
     """
     Determine the winner of a round
     Returns: 'win' (player wins), 'lose' (AI wins), 'draw'
     """
-    if player_choice == ai_choice:
-        return 'draw'
-    
-    player_beats = ELEMENTS.get(player_choice, {}).get('beats', [])
-    
-    if ai_choice in player_beats:
-        return 'win'
-    else:
-        return 'lose'
+    result = OUTCOMES.get((player_choice, ai_choice))
+    if result is None:  # Not an element: only a draw with itself
+        result = 'draw' if player_choice == ai_choice else 'lose'
+    return result
 
 
 def get_win_reason(winner_choice, loser_choice):
     """Get a description of why one element beats another"""
-    winner_data = ELEMENTS.get(winner_choice, {})
-    descriptions = {
-        ('rock', 'scissors'): 'Rock crushes Scissors!',
-        ('rock', 'lizard'): 'Rock crushes Lizard!',
-        ('rock', 'fire'): 'Rock smothers Fire!',
-        ('paper', 'rock'): 'Paper covers Rock!',
-        ('paper', 'air'): 'Paper catches Air!',
-        ('paper', 'water'): 'Paper absorbs Water!',
-        ('scissors', 'paper'): 'Scissors cuts Paper!',
-        ('scissors', 'air'): 'Scissors cuts through Air!',
-        ('scissors', 'lizard'): 'Scissors decapitates Lizard!',
-        ('fire', 'paper'): 'Fire burns Paper!',
-        ('fire', 'scissors'): 'Fire melts Scissors!',
-        ('fire', 'air'): 'Fire consumes Air!',
-        ('fire', 'lizard'): 'Fire roasts Lizard!',
-        ('water', 'fire'): 'Water extinguishes Fire!',
-        ('water', 'rock'): 'Water erodes Rock!',
-        ('water', 'lizard'): 'Water drowns Lizard!',
-        ('water', 'gun'): 'Water rusts Gun!',
-        ('air', 'fire'): 'Air suffocates Fire!',
-        ('air', 'rock'): 'Air erodes Rock!',
-        ('air', 'water'): 'Air evaporates Water!',
-        ('lizard', 'paper'): 'Lizard eats Paper!',
-        ('lizard', 'air'): 'Lizard breathes Air!',
-        ('lizard', 'lightning'): 'Lizard grounds Lightning!',
-        ('gun', 'rock'): 'Gun shatters Rock!',
-        ('gun', 'scissors'): 'Gun destroys Scissors!',
-        ('gun', 'fire'): 'Gun blows out Fire!',
-        ('gun', 'lizard'): 'Gun shoots Lizard!',
-        ('gun', 'air'): 'Gun pierces Air!',
-        ('gun', 'lightning'): 'Gun conducts Lightning!',
-        ('lightning', 'water'): 'Lightning electrifies Water!',
-        ('lightning', 'scissors'): 'Lightning melts Scissors!',
-        ('lightning', 'gun'): 'Lightning magnetizes Gun!',
-        ('lightning', 'fire'): 'Lightning outshines Fire!',
-        ('shield', 'gun'): 'Shield blocks Gun!',
-        ('shield', 'rock'): 'Shield deflects Rock!',
-        ('shield', 'scissors'): 'Shield blocks Scissors!',
-        ('shield', 'lightning'): 'Shield grounds Lightning!',
-    }
-    return descriptions.get((winner_choice, loser_choice), f'{winner_data.get("emoji", "")} {winner_choice.capitalize()} beats {loser_choice.capitalize()}!')
+    reason = WIN_REASONS.get((winner_choice, loser_choice))
+    if reason is None:
+        winner_data = ELEMENTS.get(winner_choice, {})
+        reason = f'{winner_data.get("emoji", "")} {winner_choice.capitalize()} beats {loser_choice.capitalize()}!'
+    return reason
+
+
+@lru_cache(maxsize=None)
+def _catalog(elements):
+    data = {key: ELEMENTS[key] for key in elements}
+    return data, json.dumps(data)
+
+
+def element_catalog(mode='classic'):
+    """(element data, its JSON) for a mode, as the game pages embed them; shared, don't mutate"""
+    return _catalog(tuple(get_elements_for_mode(mode)))
+
+
+class MoveProfile:
+    """Compact model of a player's habits: first-move counts and move transitions"""
+    
+    def __init__(self, first_moves=None, transitions=None):
+        self.first_moves = Counter(first_moves or {})
+        self.transitions = {prev: Counter(nexts) for prev, nexts in (transitions or {}).items()}
+    
+    def observe(self, previous, move):
+        """Count a move; previous is None for the first move of a session"""
+        if previous is None:
+            self.first_moves[move] += 1
+        else:
+            self.transitions.setdefault(previous, Counter())[move] += 1
+    
+    def merge(self, other):
+        """Add another profile's counts into this one"""
+        self.first_moves.update(other.first_moves)
+        for prev, nexts in other.transitions.items():
+            self.transitions.setdefault(prev, Counter()).update(nexts)
+    
+    def predict(self, previous, available_elements):
+        """Most likely next move given the previous one (None = session start)"""
+        counts = self.first_moves if previous is None else self.transitions.get(previous)
+        if not counts:
+            return None
+        candidates = [(n, move) for move, n in counts.items() if move in available_elements]
+        if not candidates:
+            return None
+        return max(candidates)[1]
+    
+    def to_json(self):
+        return {
+            'first_moves': dict(self.first_moves),
+            'transitions': {prev: dict(nexts) for prev, nexts in self.transitions.items()},
+        }
+    
+    def __bool__(self):
+        return bool(self.first_moves or self.transitions)
+
+
+def beats(choice, other):
+    """True if choice beats other"""
+    return other in ELEMENTS[choice]['beats']
+
+
+@lru_cache(maxsize=None)
+def counter_table(available_elements):
+    """For a tuple of elements: element -> the available element that beats it and the most others"""
+    table = {}
+    for choice in available_elements:
+        counters = [element for element in available_elements if choice in ELEMENTS[element]['beats']]
+        if counters:
+            table[choice] = max(
+                counters, key=lambda element: sum(other in ELEMENTS[element]['beats'] for other in available_elements)
+            )
+    return table
+
+
+def counter_move(choice, available_elements):
+    """Best available counter to choice (None if nothing beats it)"""
+    return counter_table(tuple(available_elements)).get(choice)
+
+
+def prebuild_tables():
+    """Build the lazily cached per-mode tables now (e.g. in the master before workers fork)"""
+    for mode in ('classic', 'extended', 'full'):
+        element_catalog(mode)
+        counter_table(tuple(get_elements_for_mode(mode)))
+
+
+class EnsemblePredictor:
+    """
+    Meta-strategy behind the master AI
+    A fixed set of predictors each guess the player's next move:
+    - frequency over the last 5 and 20 moves, and over the whole session
+    - n-grams of order 1-3 (what followed the last n moves before)
+    - reaction to the last result (how far the player shifts after a win/loss/draw)
+    - the cross-session MoveProfile, when there is one
+    Each guess is also played in two "second-guessing" rotations (the player
+    counters their own habit, once or twice). Every rotation keeps a decayed
+    score of how its counter-move would have fared, and the AI plays the counter
+    of the best-scoring one. All state is counters keyed by short tuples, so each
+    round costs the same however long the session gets.
+    """
+    
+    WINDOWS = (5, 20)
+    ORDERS = (1, 2, 3)
+    ROTATIONS = 3
+    DECAY = 0.85
+    MIN_SCORE = 1.0  # Below this no predictor is trusted and the AI plays randomly
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        self.last_moves = deque(maxlen=max(self.ORDERS))
+        self.windows = {size: (deque(maxlen=size), Counter()) for size in self.WINDOWS}
+        self.totals = Counter()
+        self.ngrams = {order: {} for order in self.ORDERS}
+        self.shifts = {}  # last player result -> Counter of index shifts
+        self.last_result = None
+        self.scores = {}
+        self.pending = {}  # (predictor, rotation) -> predicted player move
+    
+    @staticmethod
+    def _top(counts):
+        return max(counts.items(), key=lambda item: item[1])[0] if counts else None
+    
+    def _guesses(self, available_elements, profile):
+        """Each predictor's guess of the player's next move"""
+        previous = self.last_moves[-1] if self.last_moves else None
+        guesses = {'freq_all': self._top(self.totals)}
+        for size, (_, counts) in self.windows.items():
+            guesses[f'freq_{size}'] = self._top(counts)
+        history = tuple(self.last_moves)
+        for order in self.ORDERS:
+            if len(history) >= order:
+                guesses[f'ngram_{order}'] = self._top(self.ngrams[order].get(history[-order:], {}))
+        if previous in available_elements and self.last_result in self.shifts:
+            shift = self._top(self.shifts[self.last_result])
+            index = available_elements.index(previous)
+            guesses['reaction'] = available_elements[(index + shift) % len(available_elements)]
+        if profile:
+            guesses['profile'] = profile.predict(previous, available_elements)
+        return {name: move for name, move in guesses.items() if move in available_elements}
+    
+    def choose(self, available_elements, profile=None):
+        """Counter of the best-scoring rotated prediction (None if nothing is ahead)"""
+        self.pending = {}
+        best, best_score = None, self.MIN_SCORE
+        for name, move in self._guesses(available_elements, profile).items():
+            for rotation in range(self.ROTATIONS):
+                if rotation:
+                    move = counter_move(move, available_elements) or move
+                key = (name, rotation)
+                self.pending[key] = move
+                score = self.scores.get(key, 0.0)
+                if score > best_score:
+                    best, best_score = move, score
+        return counter_move(best, available_elements) if best else None
+    
+    def observe(self, move, ai_choice, available_elements):
+        """Score the pending predictions against the real move, then learn from it"""
+        for key, predicted in self.pending.items():
+            reply = counter_move(predicted, available_elements)
+            payoff = 0
+            if reply and reply != move:
+                payoff = 1 if beats(reply, move) else -1 if beats(move, reply) else 0
+            self.scores[key] = self.scores.get(key, 0.0) * self.DECAY + payoff
+        self.pending = {}
+        
+        history = tuple(self.last_moves)
+        for order in self.ORDERS:
+            if len(history) >= order:
+                self.ngrams[order].setdefault(history[-order:], Counter())[move] += 1
+        previous = history[-1] if history else None
+        if previous in available_elements and move in available_elements and self.last_result:
+            shift = (available_elements.index(move) - available_elements.index(previous)) % len(available_elements)
+            self.shifts.setdefault(self.last_result, Counter())[shift] += 1
+        
+        for window, counts in self.windows.values():
+            if len(window) == window.maxlen:
+                counts[window[0]] -= 1
+            window.append(move)
+            counts[move] += 1
+        self.totals[move] += 1
+        self.last_moves.append(move)
+        if ai_choice is None:
+            self.last_result = None
+        else:
+            self.last_result = determine_winner(move, ai_choice)
+
+
+def new_seed():
+    """Fresh 64-bit seed for a session's RNG"""
+    return secrets.randbits(64)
 
 
 class GameAI:
     """AI opponent with different difficulty levels"""
     
-    def __init__(self, difficulty='normal'):
+    def __init__(self, difficulty='normal', profile=None, seed=None):
         self.difficulty = difficulty
+        self.seed = new_seed() if seed is None else seed
+        self.rng = random.Random(self.seed)  # Per-session stream, reproducible from the seed
         self.player_history = []
         self.pattern_length = 5
+        self.profile = profile  # MoveProfile carried over from earlier sessions
+        self.replay_id = None  # GameSession recording this RNG stream, set by the views
+        self.ensemble = EnsemblePredictor() if difficulty == 'master' else None
+        self.last_choice = None
+        self.last_elements = None
+    
+    def load_profile(self, profile):
+        """Warm-start predictions from a player's cross-session MoveProfile"""
+        self.profile = profile
+    
+    def _predict_from_profile(self, available_elements):
+        """Predict the next move from the stored profile while history is short"""
+        if not self.profile:
+            return None
+        previous = self.player_history[-1] if self.player_history else None
+        return self.profile.predict(previous, available_elements)
     
     def add_to_history(self, player_choice):
         """Add player's choice to history"""
         self.player_history.append(player_choice)
+        if self.ensemble is not None and self.last_elements:
+            self.ensemble.observe(player_choice, self.last_choice, self.last_elements)
         # Keep history manageable
         if len(self.player_history) > 100:
             self.player_history = self.player_history[-50:]
@@ -170,17 +397,25 @@ class GameAI:
             return self._normal_choice(available_elements)
         elif self.difficulty == 'hard':
             return self._hard_choice(available_elements)
+        elif self.difficulty == 'master':
+            return self._master_choice(available_elements)
         else:  # veteran
             return self._veteran_choice(available_elements)
     
     def _normal_choice(self, available_elements):
         """Normal: Pure random choice"""
-        return random.choice(available_elements)
+        return self.rng.choice(available_elements)
     
     def _hard_choice(self, available_elements):
         """Hard: Analyzes player patterns with 40% accuracy"""
-        if len(self.player_history) < 3 or random.random() > 0.4:
-            return random.choice(available_elements)
+        if self.rng.random() > 0.4:
+            return self.rng.choice(available_elements)
+        if len(self.player_history) < 3:
+            # Too little history this session - fall back on the stored profile
+            predicted = self._predict_from_profile(available_elements)
+            if predicted:
+                return self._find_counter(predicted, available_elements)
+            return self.rng.choice(available_elements)
         
         # Simple frequency analysis
         recent = self.player_history[-10:]
@@ -192,8 +427,14 @@ class GameAI:
     
     def _veteran_choice(self, available_elements):
         """Veteran: Advanced pattern recognition with 70% accuracy"""
-        if len(self.player_history) < 5 or random.random() > 0.7:
-            return random.choice(available_elements)
+        if self.rng.random() > 0.7:
+            return self.rng.choice(available_elements)
+        if len(self.player_history) < 5:
+            # Too little history this session - fall back on the stored profile
+            predicted = self._predict_from_profile(available_elements)
+            if predicted:
+                return self._find_counter(predicted, available_elements)
+            return self.rng.choice(available_elements)
         
         # Pattern matching - look for sequences
         predicted = self._predict_next_move(available_elements)
@@ -206,6 +447,13 @@ class GameAI:
         most_common = counts.most_common(1)[0][0]
         return self._find_counter(most_common, available_elements)
     
+    def _master_choice(self, available_elements):
+        """Master: ensemble of predictors, playing whichever has been right lately"""
+        choice = self.ensemble.choose(available_elements, self.profile) or self.rng.choice(available_elements)
+        self.last_choice = choice
+        self.last_elements = available_elements
+        return choice
+    
     def _predict_next_move(self, available_elements):
         """Predict player's next move based on patterns"""
         if len(self.player_history) < self.pattern_length:
@@ -237,8 +485,30 @@ class GameAI:
         for element in available_elements:
             if player_choice in ELEMENTS[element]['beats']:
                 return element
-        return random.choice(available_elements)
+        return self.rng.choice(available_elements)
     
-    def reset(self):
-        """Reset AI history"""
+    def reset(self, seed=None):
+        """Reset AI history and start a new RNG stream"""
+        self.seed = new_seed() if seed is None else seed
+        self.rng = random.Random(self.seed)
         self.player_history = []
+        if self.ensemble is not None:
+            self.ensemble.reset()
+        self.last_choice = None
+        self.last_elements = None
+
+
+def replay(difficulty, mode, seed, moves, profile=None):
+    """
+    Rebuild a session's AI decisions from its seed and the player's moves
+    Pass the MoveProfile the session was warm-started with, if any.
+    Returns [(player_choice, ai_choice, result)] in play order.
+    """
+    ai = GameAI(difficulty, profile=profile, seed=seed)
+    available_elements = get_elements_for_mode(mode)
+    rounds = []
+    for move in moves:
+        ai_choice = ai.get_choice(available_elements)
+        rounds.append((move, ai_choice, determine_winner(move, ai_choice)))
+        ai.add_to_history(move)
+    return rounds
@@ -0,0 +1,76 @@
+"""
+Retention sweep for OnlineGame and MatchmakingQueue.
+
+Run it from cron, or keep it running with --loop, e.g.:
+
+    python manage.py archive_games --days 7
+    python manage.py archive_games --days 7 --format ndjson --output-dir archive/
+    python manage.py archive_games --loop --interval 300
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.retention import NDJSONSegmentWriter, archive_games, purge_queue
+
+
+class Command(BaseCommand):
+    help = 'Archive old/abandoned online games and purge expired matchmaking entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7,
+                            help='Keep ended games for this many days (default: 7)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows moved or deleted per transaction (default: 1000)')
+        parser.add_argument('--format', choices=['table', 'ndjson'], default='table',
+                            help='Archive into ArchivedOnlineGame (table) or gzipped NDJSON segments')
+        parser.add_argument('--output-dir', default='archive',
+                            help='Directory for NDJSON segments (default: archive/)')
+        parser.add_argument('--segment-rows', type=int, default=100000,
+                            help='Games per NDJSON segment file (default: 100000)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, sweeping every --interval seconds')
+        parser.add_argument('--interval', type=int, default=300,
+                            help='Seconds between sweeps with --loop (default: 300)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        while True:
+            self.sweep(options)
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def sweep(self, options):
+        batch_size = options['batch_size']
+
+        writer = None
+        if options['format'] == 'ndjson':
+            writer = NDJSONSegmentWriter(options['output_dir'], segment_rows=options['segment_rows'])
+
+        started = time.monotonic()
+        moved = 0
+        try:
+            for moved in archive_games(options['days'], batch_size, writer):
+                self.report('Archived', moved, 'games', started)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is not None and writer.paths:
+            self.stdout.write(f"Segments: {', '.join(str(path) for path in writer.paths)}")
+
+        started = time.monotonic()
+        purged = 0
+        for purged in purge_queue(batch_size):
+            self.report('Purged', purged, 'queue entries', started)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Sweep done: {moved} games archived, {purged} queue entries purged.'
+        ))
+
+    def report(self, label, done, what, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f'{label} {done} {what} ({done / elapsed:,.0f} rows/s)')
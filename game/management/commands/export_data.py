@@ -0,0 +1,54 @@
+"""
+Stream a dataset to a file or stdout, e.g.:
+
+    python manage.py export_data players --format csv --output players.csv
+    python manage.py export_data rounds --since 2026-01-01 --mode classic > rounds.ndjson
+"""
+
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.export import DATASETS, FORMATS, encode, export_rows, parse_bound
+
+
+class Command(BaseCommand):
+    help = 'Export players, rounds or online games as NDJSON or CSV at constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS))
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--since', help='Only rows on/after this date (YYYY-MM-DD or ISO datetime)')
+        parser.add_argument('--until', help='Only rows on/before this date (YYYY-MM-DD or ISO datetime)')
+        parser.add_argument('--mode', help='Only rows for this game mode')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched per cursor round trip (default: 2000)')
+        parser.add_argument('--output', help='Write to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            rows = export_rows(
+                options['dataset'],
+                since=parse_bound(options['since']),
+                until=parse_bound(options['until'], end=True),
+                mode=options['mode'],
+                chunk_size=max(options['chunk_size'], 1),
+            )
+            lines = encode(rows, options['dataset'], options['format'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        out = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        started = time.monotonic()
+        count = -1 if options['format'] == 'csv' else 0  # Don't count the CSV header
+        try:
+            for line in lines:
+                out.write(line)
+                count += 1
+        finally:
+            if options['output']:
+                out.close()
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stderr.write(f'Exported {max(count, 0)} rows ({max(count, 0) / elapsed:,.0f} rows/s)')
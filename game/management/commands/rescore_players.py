@@ -0,0 +1,63 @@
+"""
+Recompute every player's score after the score weights change.
+
+Scores are rewritten with set-based UPDATEs over primary-key ranges, so each
+statement touches at most --batch-size rows and nothing is loaded into Python.
+Ranks are not stored: they are counted live off the leaderboard index
+(rankings.with_live_rank, rankings.position_of), so they follow the new
+scores at once.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from game.models import Player
+from game.rankings import bump_score_version
+
+
+class Command(BaseCommand):
+    help = 'Recompute all player scores from Player.score_expression()'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows per UPDATE (default: 5000)')
+        parser.add_argument('--single-statement', action='store_true',
+                            help='Rescore every row in one UPDATE instead of id-range batches')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+
+        self.rescore(batch_size, options['single_statement'])
+        bump_score_version()  # Cached leaderboard pages still show the old scores
+
+    def rescore(self, batch_size, single_statement):
+        """Rewrite Player.score with DB expressions"""
+        started = time.monotonic()
+
+        if single_statement:
+            updated = Player.objects.update(score=Player.score_expression())
+            self.report('Scored', updated, updated, started)
+            return
+
+        bounds = Player.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            self.stdout.write('No players to rescore.')
+            return
+
+        total = Player.objects.count()
+        updated = 0
+        for low in range(bounds['low'], bounds['high'] + 1, batch_size):
+            updated += Player.objects.filter(
+                id__gte=low, id__lt=low + batch_size
+            ).update(score=Player.score_expression())
+            self.report('Scored', updated, total, started)
+
+    def report(self, label, done, total, started):
+        """Print progress with throughput"""
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'{label} {done}/{total} players '
+            f'({done / elapsed:,.0f} rows/s, {elapsed:.1f}s)'
+        )
@@ -0,0 +1,104 @@
+"""
+Drop closed leaderboard windows, optionally archiving them first.
+
+Windows are kept per kind (--keep-daily, --keep-weekly, --keep-seasons,
+counting the open one). Window keys sort chronologically, so everything below
+the oldest kept key is closed. Those windows are optionally streamed to a gzipped
+NDJSON file per window and then deleted with one DELETE per window. The
+cursor and the delete both run on the (window, ...) index.
+"""
+
+import gzip
+import json
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from game.models import WindowedScore
+from game.rankings import WINDOWS, bump_score_version, window_key
+
+
+def oldest_kept_key(kind, keep, now):
+    """Key of the oldest window of this kind that should survive"""
+    back = max(keep, 1) - 1
+    if kind == 'daily':
+        return window_key(kind, now - timedelta(days=back))
+    if kind == 'weekly':
+        return window_key(kind, now - timedelta(weeks=back))
+    day = timezone.localdate(now)
+    months = day.year * 12 + (day.month - 1) - 3 * back
+    return f'season:{months // 12}-Q{(months % 12) // 3 + 1}'
+
+
+class Command(BaseCommand):
+    help = 'Archive and/or delete closed daily, weekly and season leaderboard windows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-daily', type=int, default=14,
+                            help='Daily windows to keep, including today (default: 14)')
+        parser.add_argument('--keep-weekly', type=int, default=8,
+                            help='Weekly windows to keep, including this week (default: 8)')
+        parser.add_argument('--keep-seasons', type=int, default=4,
+                            help='Season windows to keep, including this season (default: 4)')
+        parser.add_argument('--archive-dir',
+                            help='Write each dropped window to <dir>/<window>.ndjson.gz before deleting')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='List the windows that would be dropped without touching them')
+
+    def handle(self, *args, **options):
+        keep = {
+            'daily': options['keep_daily'],
+            'weekly': options['keep_weekly'],
+            'season': options['keep_seasons'],
+        }
+        archive_dir = Path(options['archive_dir']) if options['archive_dir'] else None
+        if archive_dir:
+            archive_dir.mkdir(parents=True, exist_ok=True)
+
+        now = timezone.now()
+        started = time.monotonic()
+        dropped_rows = 0
+        for kind in WINDOWS:
+            windows = (
+                WindowedScore.objects.filter(
+                    window__startswith=f'{kind}:',
+                    window__lt=oldest_kept_key(kind, keep[kind], now),
+                )
+                .values('window').annotate(rows=Count('id')).order_by('window')
+            )
+            for entry in list(windows):
+                window, rows = entry['window'], entry['rows']
+                if options['dry_run']:
+                    self.stdout.write(f'Would drop {window} ({rows} rows)')
+                    continue
+                if archive_dir:
+                    self.archive(window, archive_dir)
+                WindowedScore.objects.filter(window=window).delete()
+                dropped_rows += rows
+                self.stdout.write(f'Dropped {window} ({rows} rows)')
+
+        if dropped_rows:
+            bump_score_version()
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {dropped_rows} rows removed ({dropped_rows / elapsed:,.0f} rows/s)'
+        ))
+
+    def archive(self, window, archive_dir):
+        """Stream one window's rows, best first, into a gzipped NDJSON file"""
+        path = archive_dir / f"{window.replace(':', '_')}.ndjson.gz"
+        rows = (
+            WindowedScore.objects.filter(window=window)
+            .order_by('-score', '-total_wins', 'total_losses', 'id')
+            .values('player_id', 'player__name', 'score', 'total_wins',
+                    'total_losses', 'total_draws', 'total_games')
+        )
+        with gzip.open(path, 'wt', encoding='utf-8') as out:
+            for position, row in enumerate(rows.iterator(chunk_size=2000), start=1):
+                row['rank'] = position
+                row['window'] = window
+                out.write(json.dumps(row) + '\n')
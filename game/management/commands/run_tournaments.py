@@ -0,0 +1,35 @@
+"""
+Start scheduled tournaments once they are due, and move on any tournament
+whose round is over but wasn't advanced (see game/tournaments.py), e.g.:
+
+    python manage.py run_tournaments
+    python manage.py run_tournaments --loop --interval 5
+
+Rounds normally advance as their last game settles; this picks up
+tournaments whose advance failed or whose worker died in between.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from game.tournaments import advance_due
+
+
+class Command(BaseCommand):
+    help = 'Start due tournaments and advance finished rounds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, checking every --interval seconds')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds between passes with --loop (default: 5)')
+
+    def handle(self, *args, **options):
+        while True:
+            advanced = advance_due()
+            if advanced or not options['loop']:
+                self.stdout.write(f'Advanced {len(advanced)} tournaments')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
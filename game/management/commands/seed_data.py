@@ -0,0 +1,142 @@
+"""
+Generate synthetic players, sessions/rounds, online games and queue entries
+for scale testing, e.g.:
+
+    python manage.py seed_data --players 1000000
+    python manage.py seed_data --players 0 --sessions 500000 --rounds-per-session 20 --workers 4
+    python manage.py seed_data --players 0 --online-games 200000 --queue 50000
+
+Players, online games and queue entries are named <prefix>-NNNNNNNN...,
+numbered after what earlier runs with the same prefix created, so repeated
+runs append. Chunks of --batch-size rows are built and inserted by --workers
+processes (fork). Building rows is most of the cost, so that part scales with
+cores. On SQLite the inserts themselves still take turns on the write lock.
+"""
+
+import multiprocessing
+import time
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+
+from game import seeding
+from game.models import GameSession, MatchmakingQueue, OnlineGame, Player
+
+
+def _run_chunk(func, start_count):
+    start, count = start_count
+    return func(start=start, count=count)
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate realistic synthetic data for scale testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=100000,
+                            help='Players to create (default: 100000)')
+        parser.add_argument('--sessions', type=int, default=0,
+                            help='Single-player sessions to create, with their rounds (default: 0)')
+        parser.add_argument('--rounds-per-session', type=int, default=20,
+                            help='Mean rounds per session (default: 20)')
+        parser.add_argument('--online-games', type=int, default=0,
+                            help='Online games in assorted states (default: 0)')
+        parser.add_argument('--queue', type=int, default=0,
+                            help='Matchmaking queue entries (default: 0)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows built and inserted per chunk/transaction (default: 5000)')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes building and inserting chunks (default: 1)')
+        parser.add_argument('--days', type=int, default=90,
+                            help='Spread timestamps over this many past days (default: 90)')
+        parser.add_argument('--seed', type=int, default=0, help='RNG seed (default: 0)')
+        parser.add_argument('--prefix', default='seed', help='Name prefix for generated rows (default: seed)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        if options['rounds_per_session'] < 1:
+            raise CommandError('--rounds-per-session must be positive')
+        if options['sessions'] and not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError(f'{connection.vendor} cannot return ids from bulk inserts; sessions need them')
+
+        self.workers = max(options['workers'], 1)
+        if self.workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+            self.stderr.write('fork is not available on this platform; using one worker')
+            self.workers = 1
+
+        prefix = options['prefix']
+        common = dict(seed=options['seed'], now=timezone.now(), batch_size=batch_size)
+        started = time.monotonic()
+        total = 0
+
+        if options['players']:
+            first = seeding.next_index(Player, 'name', prefix)
+            total += self.run_phase('players', partial(
+                seeding.seed_players, prefix=prefix, days=options['days'], **common
+            ), first, options['players'], batch_size)
+
+        players = []
+        if options['sessions'] or options['online_games']:
+            players = seeding.player_sample(prefix, seed=options['seed'])
+            if not players:
+                raise CommandError(f'No {prefix}-* players to attach sessions/games to; seed players first')
+
+        if options['sessions']:
+            # Keep each chunk's rounds near --batch-size
+            sessions_per_chunk = max(batch_size // options['rounds_per_session'], 1)
+            total += self.run_phase('sessions', partial(
+                seeding.seed_sessions, player_ids=[pk for pk, _ in players],
+                rounds_per_session=options['rounds_per_session'], days=options['days'], **common
+            ), GameSession.objects.count(), options['sessions'], sessions_per_chunk, unit=('sessions', 'rounds'))
+
+        if options['online_games']:
+            first = seeding.next_index(OnlineGame, 'game_id', prefix)
+            total += self.run_phase('online games', partial(
+                seeding.seed_online_games, prefix=prefix, players=players, days=options['days'], **common
+            ), first, options['online_games'], batch_size)
+
+        if options['queue']:
+            first = seeding.next_index(MatchmakingQueue, 'player_id', f'{prefix}-q')
+            total += self.run_phase('queue entries', partial(
+                seeding.seed_queue, prefix=prefix,
+                seed=common['seed'], now=common['now'], batch_size=batch_size,
+            ), first, options['queue'], batch_size)
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)'
+        ))
+
+    def run_phase(self, label, func, first, count, chunk, unit=None):
+        """Run func over [first, first + count) in chunks; returns rows inserted"""
+        chunks = [(start, min(chunk, first + count - start)) for start in range(first, first + count, chunk)]
+        started = time.monotonic()
+        done = [0, 0] if unit else [0]
+        report_every = max(len(chunks) // 20, 1)
+
+        def progress(index, result):
+            for i, value in enumerate(result if unit else (result,)):
+                done[i] += value
+            if index % report_every == 0 or index == len(chunks):
+                elapsed = max(time.monotonic() - started, 1e-6)
+                rows = sum(done)
+                parts = ', '.join(f'{n:,} {name}' for n, name in zip(done, unit)) if unit else f'{rows:,}'
+                self.stdout.write(f'  {label}: {parts} ({rows / elapsed:,.0f} rows/s)')
+
+        run = partial(_run_chunk, func)
+        if self.workers > 1 and len(chunks) > 1:
+            connections.close_all()  # Children must open their own connections
+            with multiprocessing.get_context('fork').Pool(self.workers) as pool:
+                for index, result in enumerate(pool.imap_unordered(run, chunks), 1):
+                    progress(index, result)
+        else:
+            for index, start_count in enumerate(chunks, 1):
+                progress(index, run(start_count))
+
+        rows = sum(done)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f'{label}: {rows:,} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)')
+        return rows
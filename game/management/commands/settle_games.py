@@ -0,0 +1,38 @@
+"""
+Apply pending PvP settlements (ended games whose player stats are not
+recorded yet, see game/settlement.py), e.g.:
+
+    python manage.py settle_games
+    python manage.py settle_games --loop --interval 1    # with SETTLEMENT_MODE=command
+
+Web workers apply settlements themselves unless SETTLEMENT_MODE=command; this
+also drains anything a worker left behind.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from game.settlement import BATCH_SIZE, apply_pending
+
+
+class Command(BaseCommand):
+    help = 'Apply pending PvP game settlements to player stats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help=f'Settlements per transaction (default: {BATCH_SIZE})')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, applying every --interval seconds')
+        parser.add_argument('--interval', type=float, default=1,
+                            help='Seconds between passes with --loop (default: 1)')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            applied = apply_pending(options['batch_size'])
+            if applied or not options['loop']:
+                self.stdout.write(f'Applied {applied} settlements in {time.monotonic() - started:.2f}s')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
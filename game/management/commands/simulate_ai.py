@@ -0,0 +1,83 @@
+"""
+Compare cold-start and profile warm-started GameAI against scripted players, e.g.:
+
+    python manage.py simulate_ai --strategy biased --difficulty veteran
+    python manage.py simulate_ai --strategy cycler --sessions 1000 --rounds 8 --seed 7
+    python manage.py simulate_ai --strategy reactive --compare --latency
+
+Prints the AI win rate at each round index for both, so you can see how many
+rounds the warm start saves before the in-session pattern analysis catches up.
+--compare prints the win rate of every difficulty against every strategy, and
+--latency the per-move cost as one long session grows.
+"""
+
+from django.core.management.base import BaseCommand
+
+from game.simulator import STRATEGIES, measure_latency, run_sessions
+
+DIFFICULTIES = ['normal', 'hard', 'veteran', 'master']
+
+
+class Command(BaseCommand):
+    help = 'Simulate sessions against a scripted player and compare cold vs warm-started AI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='biased')
+        parser.add_argument('--difficulty', choices=DIFFICULTIES, default='veteran')
+        parser.add_argument('--mode', default='classic')
+        parser.add_argument('--sessions', type=int, default=500,
+                            help='Sessions played in sequence (default: 500)')
+        parser.add_argument('--rounds', type=int, default=10,
+                            help='Rounds per session (default: 10)')
+        parser.add_argument('--seed', type=int, help='Seed for reproducible runs')
+        parser.add_argument('--compare', action='store_true',
+                            help='Win rate of every difficulty against every strategy')
+        parser.add_argument('--latency', action='store_true',
+                            help='Time per move for every difficulty over one long session')
+        parser.add_argument('--latency-rounds', type=int, default=10000,
+                            help='Length of the --latency session (default: 10000)')
+
+    def handle(self, *args, **options):
+        kwargs = dict(
+            difficulty=options['difficulty'], mode=options['mode'],
+            sessions=max(options['sessions'], 1), rounds=max(options['rounds'], 1),
+            seed=options['seed'],
+        )
+        if options['compare'] or options['latency']:
+            if options['compare']:
+                self.compare(kwargs)
+            if options['latency']:
+                self.latency(options)
+            return
+
+        cold = run_sessions(options['strategy'], warm=False, **kwargs)
+        warm = run_sessions(options['strategy'], warm=True, **kwargs)
+
+        self.stdout.write(f"{'round':>5}  {'cold':>6}  {'warm':>6}")
+        for index, (c, w) in enumerate(zip(cold, warm), 1):
+            self.stdout.write(f'{index:>5}  {c:>6.1%}  {w:>6.1%}')
+        self.stdout.write(
+            f"{'all':>5}  {sum(cold) / len(cold):>6.1%}  {sum(warm) / len(warm):>6.1%}"
+        )
+
+    def compare(self, kwargs):
+        self.stdout.write('AI win rate per session (warm start)')
+        self.stdout.write(f"{'strategy':>10}" + ''.join(f'{name:>9}' for name in DIFFICULTIES))
+        for strategy in sorted(STRATEGIES):
+            rates = []
+            for difficulty in DIFFICULTIES:
+                per_round = run_sessions(strategy, warm=True, **dict(kwargs, difficulty=difficulty))
+                rates.append(sum(per_round) / len(per_round))
+            self.stdout.write(f'{strategy:>10}' + ''.join(f'{rate:>9.1%}' for rate in rates))
+
+    def latency(self, options):
+        rounds = max(options['latency_rounds'], 5)
+        self.stdout.write(f'Microseconds per move over a {rounds}-round session ({options["strategy"]})')
+        results = {
+            difficulty: measure_latency(difficulty, options['strategy'], options['mode'],
+                                        rounds=rounds, seed=options['seed'])
+            for difficulty in DIFFICULTIES
+        }
+        self.stdout.write(f"{'from':>8}" + ''.join(f'{name:>9}' for name in DIFFICULTIES))
+        for row in zip(*results.values()):
+            self.stdout.write(f'{row[0][0]:>8}' + ''.join(f'{us:>9.1f}' for _, us in row))
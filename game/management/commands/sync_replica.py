@@ -0,0 +1,55 @@
+"""
+Copy the default SQLite database into the SQLite read replica
+(REPLICA_DATABASE_URL), so replica routing can be tried locally, e.g.:
+
+    python manage.py sync_replica
+    python manage.py sync_replica --loop --interval 2    # a replica lagging ~2s behind
+
+This uses SQLite's online backup API, so the copy is consistent even while
+the game keeps writing. On PostgreSQL, use streaming replication instead.
+"""
+
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from game.routers import REPLICA_DB
+
+SQLITE_ENGINE = 'django.db.backends.sqlite3'
+
+
+class Command(BaseCommand):
+    help = 'Refresh the SQLite read replica from the default database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, copying every --interval seconds')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds between copies with --loop (default: 5)')
+
+    def handle(self, *args, **options):
+        replica = settings.DATABASES.get(REPLICA_DB)
+        if replica is None:
+            raise CommandError('No replica database configured; set REPLICA_DATABASE_URL')
+        if replica['ENGINE'] != SQLITE_ENGINE or settings.DATABASES['default']['ENGINE'] != SQLITE_ENGINE:
+            raise CommandError('sync_replica only copies SQLite to SQLite; use real replication for other databases')
+
+        while True:
+            started = time.monotonic()
+            self.copy(replica)
+            self.stdout.write(f'Replica refreshed in {time.monotonic() - started:.2f}s')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, replica):
+        source = connections['default']
+        source.ensure_connection()
+        target = sqlite3.connect(replica['NAME'], timeout=replica.get('OPTIONS', {}).get('timeout', 5))
+        try:
+            source.connection.backup(target)
+        finally:
+            target.close()
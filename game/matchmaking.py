@@ -0,0 +1,173 @@
+"""
+Matchmaking Queue Counters
+
+Queue position and players online are served without a COUNT(*) per poll,
+and from the database, so every worker process gives the same answer:
+- A searcher's ticket is its queue row's id, so tickets are unique and in
+  join order however many processes hand them out.
+- Queue position is ticket - head + 1, where head is the oldest live
+  (searching) ticket: one seek on the (status, ticket) index. Searchers
+  that are matched, leave or expire stop being live, so head follows them
+  without any bookkeeping (gaps behind a searcher count towards its position).
+- Players online is a COUNT of live entries over the same index, cached in
+  each process for ONLINE_REFRESH seconds, so it costs one count per process
+  per interval however many searchers poll.
+
+Polls write as little as possible: a searcher's last_seen is only refreshed
+every KEEPALIVE_SECONDS, and expired entries are purged by one poll per
+SWEEP_INTERVAL in each process, not by every poll. A searcher nobody matched
+within MATCHMAKING_AI_FALLBACK_SECONDS leaves the queue and is handed an AI
+opponent in the same response (AIOpponents); the game's first round takes a
+GameAI from a pool built ahead of time.
+"""
+
+import random
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+
+from .game_logic import GameAI
+from .models import MatchmakingQueue
+
+QUEUE_EXPIRY_SECONDS = 60  # Searchers that stop polling for this long are dropped
+KEEPALIVE_SECONDS = 20  # How often a polling searcher's last_seen is written
+SWEEP_INTERVAL = 10  # Seconds between expiry sweeps, per process
+
+# Human-looking names the AI fallback plays under
+AI_NAMES = (
+    'Alex', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Quinn', 'Avery',
+    'Charlie', 'Sam', 'Jamie', 'Drew', 'Skyler', 'Reese', 'Parker', 'Blake',
+    'Max', 'Leo', 'Mia', 'Zoe', 'Kai', 'Finn', 'Luna', 'Nova', 'Ace', 'Rex',
+    'Phoenix', 'Storm', 'River', 'Sage', 'Hunter', 'Raven', 'Jade', 'Blaze',
+    'Shadow', 'Frost', 'Thunder', 'Arrow', 'Hawk', 'Wolf', 'Tiger', 'Viper',
+)
+AI_DIFFICULTIES = ('normal', 'hard', 'veteran')
+AI_MODES = ('classic', 'extended', 'full')
+POOL_SIZE = 8  # Idle GameAI instances kept ready per difficulty
+AI_SESSION_PREFIX = 'ai_'  # Session ids of games against the AI fallback
+
+ONLINE_REFRESH = 5  # Seconds a process reuses its count of searchers online
+
+
+def join_queue(player_id, player_name, mode, now):
+    """Add a searcher to the queue; returns its entry, whose ticket is its row id"""
+    entry = MatchmakingQueue.objects.create(
+        player_id=player_id, player_name=player_name, mode=mode, status='searching', last_seen=now
+    )
+    MatchmakingQueue.objects.filter(pk=entry.pk).update(ticket=F('id'))
+    entry.ticket = entry.pk
+    return entry
+
+
+def head_ticket():
+    """Ticket of the oldest searcher still waiting, or None"""
+    return MatchmakingQueue.objects.filter(
+        status='searching', ticket__isnull=False
+    ).order_by('ticket').values_list('ticket', flat=True).first()
+
+
+def queue_position(ticket):
+    """Position of ticket in the queue (1 = next to be matched)"""
+    head = head_ticket()
+    if ticket is None or head is None:
+        return 1
+    return max(ticket - head + 1, 1)
+
+
+_online = (0, None)  # (count, monotonic time it expires)
+_online_lock = threading.Lock()
+
+
+def players_online():
+    """Number of searchers currently waiting, at most ONLINE_REFRESH seconds old"""
+    global _online
+    count, expires = _online
+    if expires is not None and time.monotonic() < expires:
+        return count
+    with _online_lock:
+        count, expires = _online
+        if expires is None or time.monotonic() >= expires:
+            count = MatchmakingQueue.objects.filter(status='searching').count()
+            _online = (count, time.monotonic() + ONLINE_REFRESH)
+    return count
+
+
+def keepalive_due(entry, now):
+    """Whether a poll should refresh entry.last_seen"""
+    return now - entry.last_seen >= timedelta(seconds=KEEPALIVE_SECONDS)
+
+
+def expiry_cutoff(now):
+    """Entries last seen before this have expired"""
+    return now - timedelta(seconds=QUEUE_EXPIRY_SECONDS)
+
+
+_next_sweep = None
+
+
+def sweep_due(now):
+    """True for the first poll in each SWEEP_INTERVAL (per process); that poll purges expired entries"""
+    global _next_sweep
+    if _next_sweep is not None and now < _next_sweep:
+        return False
+    _next_sweep = now + timedelta(seconds=SWEEP_INTERVAL)
+    return True
+
+
+def ai_fallback_due(entry, now):
+    """Whether a searcher has waited long enough to be given an AI opponent"""
+    wait = settings.MATCHMAKING_AI_FALLBACK_SECONDS
+    return bool(wait) and entry.status == 'searching' and now - entry.created_at >= timedelta(seconds=wait)
+
+
+class AIOpponents:
+    """
+    AI opponents for searchers nobody matched
+    Idle GameAI instances are built ahead of time (fill(), run by the
+    gunicorn warm-up). Handing out an opponent reserves nothing: the game
+    page's rounds may be served by any worker, so the session's first round
+    takes an idle instance from the pool of whichever process serves it.
+    Instances are re-seeded when taken, so ones built before a fork don't
+    share an RNG stream between workers.
+    """
+
+    def __init__(self, size=POOL_SIZE):
+        self.size = size
+        self._idle = {difficulty: [] for difficulty in AI_DIFFICULTIES}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(idle) for idle in self._idle.values())
+
+    def fill(self):
+        """Top up every difficulty's idle instances to size"""
+        with self._lock:
+            for difficulty, idle in self._idle.items():
+                idle.extend(GameAI(difficulty) for _ in range(self.size - len(idle)))
+
+    def assign(self):
+        """Pick an AI opponent for a searcher; returns the game page parameters"""
+        return {
+            'mode': random.choice(AI_MODES),
+            'difficulty': random.choice(AI_DIFFICULTIES),
+            'ai_name': random.choice(AI_NAMES),
+            'session_id': f'{AI_SESSION_PREFIX}{uuid.uuid4().hex}',
+        }
+
+    def claim(self, session_id, difficulty, seed=None):
+        """A pooled GameAI, re-seeded, for the first round of a session from assign(); else None"""
+        if not session_id.startswith(AI_SESSION_PREFIX):
+            return None
+        with self._lock:
+            idle = self._idle.get(difficulty)
+            ai = idle.pop() if idle else None
+        if ai is not None:
+            ai.reset(seed)
+        return ai
+
+
+ai_opponents = AIOpponents()
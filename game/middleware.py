@@ -0,0 +1,52 @@
+"""
+Game Middleware
+"""
+
+from django.conf import settings
+
+from . import routers
+from .profiling import profiler
+
+
+class ReplicaPinMiddleware:
+    """
+    Read-your-writes for the read replica (see game/routers.py)
+    Installs the per-request routing state, pinned if the client's pin cookie
+    is present, and (re)sets the cookie whenever the request wrote to 'default'.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = routers.begin_request(pinned=routers.PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing = routers.end_request(token)
+        if routing.wrote and routers.replica_configured():
+            response.set_cookie(routers.PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Sample the stacks of a share of each URL name's requests (see game/profiling.py)
+    Off unless PROFILING_SAMPLE_RATES (or the admin endpoint) sets a rate.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            if getattr(request, 'profiled', False):
+                profiler.end()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if profiler.should_sample(request.resolver_match.url_name):
+            profiler.begin(request.resolver_match.url_name)
+            request.profiled = True
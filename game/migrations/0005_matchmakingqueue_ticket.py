@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-18 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0004_onlinegame_player1_last_seen_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchmakingqueue',
+            name='ticket',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='matchmakingqueue',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='matchmakingqueue',
+            index=models.Index(fields=['status', 'ticket'], name='game_matchm_status_c25601_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 23:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0005_matchmakingqueue_ticket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='rank',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-19 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0006_player_rank'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(fields=['-score', '-total_wins', 'total_losses', 'id'], name='player_leaderboard_idx'),
+        ),
+    ]
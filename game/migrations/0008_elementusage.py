@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-19 00:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0007_player_leaderboard_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ElementUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('mode', models.CharField(max_length=20)),
+                ('difficulty', models.CharField(max_length=10)),
+                ('player_choice', models.CharField(max_length=20)),
+                ('ai_choice', models.CharField(max_length=20)),
+                ('result', models.CharField(max_length=10)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'mode', 'difficulty', 'player_choice', 'ai_choice', 'result'), name='element_usage_rollup_key')],
+            },
+        ),
+    ]
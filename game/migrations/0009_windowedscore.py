@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-19 00:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0008_elementusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WindowedScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(max_length=20)),
+                ('score', models.IntegerField(default=0)),
+                ('total_wins', models.IntegerField(default=0)),
+                ('total_losses', models.IntegerField(default=0)),
+                ('total_draws', models.IntegerField(default=0)),
+                ('total_games', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='window_scores', to='game.player')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['window', '-score', '-total_wins', 'total_losses', 'id'], name='windowed_leaderboard_idx')],
+                'constraints': [models.UniqueConstraint(fields=('window', 'player'), name='windowed_score_window_player')],
+            },
+        ),
+    ]
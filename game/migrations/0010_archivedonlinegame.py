@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-19 00:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0009_windowedscore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOnlineGame',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game_id', models.CharField(max_length=100, unique=True)),
+                ('mode', models.CharField(max_length=20)),
+                ('player1_name', models.CharField(max_length=50)),
+                ('player2_name', models.CharField(max_length=50)),
+                ('player1_score', models.IntegerField(default=0)),
+                ('player2_score', models.IntegerField(default=0)),
+                ('rounds_played', models.IntegerField(default=0)),
+                ('status', models.CharField(max_length=20)),
+                ('winner', models.CharField(blank=True, max_length=50, null=True)),
+                ('forfeit_by', models.CharField(blank=True, max_length=50, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField(db_index=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='onlinegame',
+            index=models.Index(fields=['status', 'updated_at'], name='game_online_status_5b03ce_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-19 00:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0010_archivedonlinegame'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpponentProfile',
+            fields=[
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='opponent_profile', serialize=False, to='game.player')),
+                ('first_moves', models.JSONField(default=dict)),
+                ('transitions', models.JSONField(default=dict)),
+                ('moves_seen', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 00:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0011_opponentprofile'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gamesession',
+            name='difficulty',
+            field=models.CharField(choices=[('normal', 'Normal'), ('hard', 'Hard'), ('veteran', 'Veteran'), ('master', 'Master')], default='normal', max_length=10),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-19 00:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0012_gamesession_master_difficulty'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingSettlement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game_id', models.CharField(max_length=100, unique=True)),
+                ('winner_name', models.CharField(max_length=50)),
+                ('loser_name', models.CharField(max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
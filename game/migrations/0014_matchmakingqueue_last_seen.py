@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-19 01:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0013_pendingsettlement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchmakingqueue',
+            name='last_seen',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2 on 2026-10-19 01:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0014_matchmakingqueue_last_seen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tournament',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('format', models.CharField(choices=[('single_elim', 'Single elimination'), ('swiss', 'Swiss')], default='single_elim', max_length=20)),
+                ('mode', models.CharField(default='classic', max_length=20)),
+                ('status', models.CharField(default='scheduled', max_length=20)),
+                ('rounds', models.IntegerField(default=0)),
+                ('current_round', models.IntegerField(default=0)),
+                ('open_matches', models.IntegerField(default=0)),
+                ('winner_name', models.CharField(blank=True, max_length=50, null=True)),
+                ('starts_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'starts_at'], name='game_tourna_status_e19aa2_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TournamentEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('player_id', models.CharField(max_length=100)),
+                ('player_name', models.CharField(max_length=50)),
+                ('seed', models.IntegerField(default=0)),
+                ('points', models.IntegerField(default=0)),
+                ('had_bye', models.BooleanField(default=False)),
+                ('eliminated', models.BooleanField(default=False)),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='game.tournament')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TournamentMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('round', models.IntegerField()),
+                ('slot', models.IntegerField()),
+                ('game_id', models.CharField(blank=True, max_length=100, null=True, unique=True)),
+                ('status', models.CharField(default='playing', max_length=20)),
+                ('player1', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='game.tournamententry')),
+                ('player2', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='game.tournamententry')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='game.tournament')),
+                ('winner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='game.tournamententry')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='tournamententry',
+            constraint=models.UniqueConstraint(fields=('tournament', 'player_id'), name='tournament_entry_player'),
+        ),
+        migrations.AddConstraint(
+            model_name='tournamentmatch',
+            constraint=models.UniqueConstraint(fields=('tournament', 'round', 'slot'), name='tournament_match_slot'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-19 01:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0015_tournaments'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gameround',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='gamesession',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='onlinegame',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='player',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='gameround',
+            index=models.Index(fields=['result', 'created_at'], name='game_gamero_result_71d27d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(fields=['mode', 'created_at'], name='game_gamese_mode_256e09_idx'),
+        ),
+    ]
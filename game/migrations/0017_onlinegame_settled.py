@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0016_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='onlinegame',
+            name='settled',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0017_onlinegame_settled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='profile',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gamesession',
+            name='seed',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-19 11:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0018_gamesession_replay'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='player',
+            name='rank',
+        ),
+    ]
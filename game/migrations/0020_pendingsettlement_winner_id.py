@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0019_remove_player_rank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingsettlement',
+            name='winner_id',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
@@ -1,8 +1,17 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
 
 
 class Player(models.Model):
     """Store player data for rankings"""
+    # Score weights: wins*10 + veteran_wins*5 + hard_wins*3 - losses*2
+    WIN_POINTS = 10
+    VETERAN_BONUS = 5
+    HARD_BONUS = 3
+    LOSS_PENALTY = 2
+    
     name = models.CharField(max_length=50, unique=True)
     total_wins = models.IntegerField(default=0)
     total_losses = models.IntegerField(default=0)
@@ -21,11 +30,15 @@ class Player(models.Model):
     # Score calculation: wins*10 + veteran_wins*5 + hard_wins*3 - losses*2
     score = models.IntegerField(default=0)
     
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-score', '-total_wins', 'total_losses']
+        indexes = [
+            # Keyset pagination order used by game.rankings
+            models.Index(fields=['-score', '-total_wins', 'total_losses', 'id'], name='player_leaderboard_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - Score: {self.score}"
@@ -33,13 +46,23 @@ class Player(models.Model):
     def calculate_score(self):
         """Calculate player score based on performance"""
         self.score = (
-            self.total_wins * 10 +
-            self.veteran_wins * 5 +
-            self.hard_wins * 3 -
-            self.total_losses * 2
+            self.total_wins * self.WIN_POINTS +
+            self.veteran_wins * self.VETERAN_BONUS +
+            self.hard_wins * self.HARD_BONUS -
+            self.total_losses * self.LOSS_PENALTY
         )
         return self.score
     
+    @classmethod
+    def score_expression(cls):
+        """Database expression equivalent of calculate_score for bulk updates"""
+        return (
+            F('total_wins') * cls.WIN_POINTS +
+            F('veteran_wins') * cls.VETERAN_BONUS +
+            F('hard_wins') * cls.HARD_BONUS -
+            F('total_losses') * cls.LOSS_PENALTY
+        )
+    
     def win_rate(self):
         """Calculate win rate percentage"""
         if self.total_games == 0:
@@ -71,6 +94,78 @@ class Player(models.Model):
         
         self.calculate_score()
         self.save()
+    
+    @classmethod
+    def points_for(cls, result, difficulty):
+        """Score change for a single game result"""
+        if result == 'win':
+            points = cls.WIN_POINTS
+            if difficulty == 'hard':
+                points += cls.HARD_BONUS
+            elif difficulty == 'veteran':
+                points += cls.VETERAN_BONUS
+            return points
+        if result == 'lose':
+            return -cls.LOSS_PENALTY
+        return 0
+    
+    @classmethod
+    def record_result(cls, player_id, result, difficulty):
+        """
+        Apply one game result to a player row with a single atomic UPDATE
+        Same bookkeeping as update_stats, without reading the row first.
+        Returns the number of rows updated (0 if the player no longer exists).
+        """
+        return cls.record_results(player_id, [result], difficulty)
+    
+    @classmethod
+    def record_results(cls, player_id, results, difficulty):
+        """
+        Apply a sequence of game results (in play order) with a single UPDATE
+        Streaks are folded in Python: wins before the first loss extend the
+        stored streak, later runs start from zero.
+        """
+        counts = {'win': 0, 'lose': 0, 'draw': 0}
+        lead_wins = 0  # Wins before the first loss
+        run = 0
+        best_run = 0  # Longest run that started after a loss
+        had_loss = False
+        points = 0
+        for result in results:
+            result = result if result in counts else 'draw'
+            counts[result] += 1
+            points += cls.points_for(result, difficulty)
+            if result == 'win':
+                if had_loss:
+                    run += 1
+                    best_run = max(best_run, run)
+                else:
+                    lead_wins += 1
+            elif result == 'lose':
+                had_loss = True
+                run = 0
+        
+        updates = {
+            'total_games': F('total_games') + len(results),
+            'total_wins': F('total_wins') + counts['win'],
+            'total_losses': F('total_losses') + counts['lose'],
+            'total_draws': F('total_draws') + counts['draw'],
+            'updated_at': timezone.now(),
+        }
+        if counts['win'] and difficulty in ('normal', 'hard', 'veteran'):
+            field = f'{difficulty}_wins'
+            updates[field] = F(field) + counts['win']
+        if had_loss:
+            updates['current_streak'] = run
+            updates['best_streak'] = Greatest(
+                F('best_streak'), F('current_streak') + lead_wins, best_run
+            )
+        elif lead_wins:
+            updates['current_streak'] = F('current_streak') + lead_wins
+            updates['best_streak'] = Greatest(F('best_streak'), F('current_streak') + lead_wins)
+        
+        updates['score'] = cls.score_expression() + points
+        return cls.objects.filter(pk=player_id).update(**updates)
 
 
 class GameSession(models.Model):
@@ -79,6 +174,7 @@ class GameSession(models.Model):
         ('normal', 'Normal'),
         ('hard', 'Hard'),
         ('veteran', 'Veteran'),
+        ('master', 'Master'),
     ]
     
     player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='sessions', null=True, blank=True)
@@ -88,9 +184,19 @@ class GameSession(models.Model):
     ai_wins = models.IntegerField(default=0)
     draws = models.IntegerField(default=0)
     total_rounds = models.IntegerField(default=0)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Replay data of the AI's RNG stream (see replay_session): the 64-bit seed as decimal
+    # text (it doesn't fit a signed BIGINT) and the MoveProfile the AI was warm-started from
+    seed = models.CharField(max_length=20, blank=True, default='')
+    profile = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Admin filter choices and date drill-down within a mode
+            models.Index(fields=['mode', 'created_at']),
+        ]
+    
     def __str__(self):
         return f"Game Session {self.id} - {self.difficulty}"
 
@@ -101,7 +207,13 @@ class GameRound(models.Model):
     player_choice = models.CharField(max_length=20)
     ai_choice = models.CharField(max_length=20)
     result = models.CharField(max_length=10)  # win, lose, draw
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        indexes = [
+            # Admin filter choices and date drill-down within a result
+            models.Index(fields=['result', 'created_at']),
+        ]
     
     def __str__(self):
         return f"Round {self.id}: {self.player_choice} vs {self.ai_choice}"
@@ -114,10 +226,15 @@ class MatchmakingQueue(models.Model):
     mode = models.CharField(max_length=20, default='classic')
     status = models.CharField(max_length=20, default='searching')  # searching, matched, expired
     matched_game_id = models.CharField(max_length=100, null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    ticket = models.BigIntegerField(null=True, blank=True)  # Monotonic join order
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)  # When the search started
+    last_seen = models.DateTimeField(default=timezone.now, db_index=True)  # Last keep-alive from a poll
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'ticket']),
+        ]
     
     def __str__(self):
         return f"{self.player_name} - {self.status}"
@@ -150,9 +267,207 @@ class OnlineGame(models.Model):
     
     round_result = models.CharField(max_length=100, null=True, blank=True)  # JSON string of last round result
     round_start_time = models.DateTimeField(null=True, blank=True)  # When the current round started
+    settled = models.BooleanField(default=False)  # Queued for settlement; a game settles once (game/settlement.py)
     
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Retention sweeps and featured-game lookups
+            models.Index(fields=['status', 'updated_at']),
+        ]
+    
     def __str__(self):
         return f"Game {self.game_id}: {self.player1_name} vs {self.player2_name}"
+
+
+class PendingSettlement(models.Model):
+    """Outbox row: an ended OnlineGame whose player stats are not applied yet (see game/settlement.py)"""
+    game_id = models.CharField(max_length=100, unique=True)  # A game settles once
+    winner_name = models.CharField(max_length=50)
+    loser_name = models.CharField(max_length=50)
+    winner_id = models.CharField(max_length=100, blank=True, default='')  # Client id; names aren't unique
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Settle {self.game_id}: {self.winner_name} beat {self.loser_name}"
+
+
+class Tournament(models.Model):
+    """Scheduled PvP tournament played on OnlineGames (see game/tournaments.py)"""
+    FORMAT_CHOICES = [
+        ('single_elim', 'Single elimination'),
+        ('swiss', 'Swiss'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    format = models.CharField(max_length=20, choices=FORMAT_CHOICES, default='single_elim')
+    mode = models.CharField(max_length=20, default='classic')
+    status = models.CharField(max_length=20, default='scheduled')  # scheduled, running, finished
+    rounds = models.IntegerField(default=0)  # Planned rounds, set when it starts
+    current_round = models.IntegerField(default=0)
+    open_matches = models.IntegerField(default=0)  # Games of the current round still being played
+    winner_name = models.CharField(max_length=50, null=True, blank=True)
+    starts_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'starts_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.get_format_display()}, {self.status})"
+
+
+class TournamentEntry(models.Model):
+    """A player registered in a tournament"""
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='entries')
+    player_id = models.CharField(max_length=100)  # Client id the player's games are played under
+    player_name = models.CharField(max_length=50)
+    seed = models.IntegerField(default=0)  # 1 = top seed
+    points = models.IntegerField(default=0)  # Swiss: one per win or bye
+    had_bye = models.BooleanField(default=False)
+    eliminated = models.BooleanField(default=False)  # Single elimination
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tournament', 'player_id'], name='tournament_entry_player'),
+        ]
+    
+    def __str__(self):
+        return f"{self.player_name} in {self.tournament_id}"
+
+
+class TournamentMatch(models.Model):
+    """One pairing of a tournament round; a bye has no player2 and no game"""
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='matches')
+    round = models.IntegerField()
+    slot = models.IntegerField()  # Bracket position within the round
+    game_id = models.CharField(max_length=100, unique=True, null=True, blank=True)  # OnlineGame.game_id
+    player1 = models.ForeignKey(TournamentEntry, on_delete=models.CASCADE, related_name='+')
+    player2 = models.ForeignKey(TournamentEntry, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    winner = models.ForeignKey(TournamentEntry, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20, default='playing')  # playing, done
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tournament', 'round', 'slot'], name='tournament_match_slot'),
+        ]
+    
+    def __str__(self):
+        return f"Tournament {self.tournament_id} round {self.round} slot {self.slot}"
+
+
+class ElementUsage(models.Model):
+    """Daily rollup of element picks per mode and difficulty (incrementally maintained)"""
+    day = models.DateField()
+    mode = models.CharField(max_length=20)
+    difficulty = models.CharField(max_length=10)  # normal, hard, veteran, master, or pvp
+    player_choice = models.CharField(max_length=20)
+    ai_choice = models.CharField(max_length=20)  # Opponent's choice (player 2 in PvP)
+    result = models.CharField(max_length=10)  # win, lose, draw from the player's side
+    count = models.BigIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'mode', 'difficulty', 'player_choice', 'ai_choice', 'result'],
+                name='element_usage_rollup_key',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.mode}/{self.difficulty}: {self.player_choice} vs {self.ai_choice} x{self.count}"
+
+
+class WindowedScore(models.Model):
+    """Player totals for one leaderboard window (daily, weekly or season)"""
+    window = models.CharField(max_length=20)  # e.g. daily:2026-10-19, weekly:2026-W43, season:2026-Q4
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='window_scores')
+    score = models.IntegerField(default=0)
+    total_wins = models.IntegerField(default=0)
+    total_losses = models.IntegerField(default=0)
+    total_draws = models.IntegerField(default=0)
+    total_games = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['window', 'player'], name='windowed_score_window_player'),
+        ]
+        indexes = [
+            # Keyset pagination order used by game.rankings, per window
+            models.Index(fields=['window', '-score', '-total_wins', 'total_losses', 'id'], name='windowed_leaderboard_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.window} {self.player_id} - Score: {self.score}"
+    
+    @property
+    def name(self):
+        return self.player.name
+    
+    @property
+    def best_streak(self):
+        return self.player.best_streak
+    
+    def win_rate(self):
+        """Calculate win rate percentage within the window"""
+        if self.total_games == 0:
+            return 0
+        return round((self.total_wins / self.total_games) * 100, 1)
+    
+    @classmethod
+    def record_results(cls, player_id, results, difficulty, windows):
+        """
+        Add game results to the player's rows for each window key
+        Missing rows are created first (ignoring conflicts), then all windows
+        are bumped in one UPDATE.
+        """
+        cls.objects.bulk_create(
+            [cls(window=window, player_id=player_id) for window in windows],
+            ignore_conflicts=True,
+        )
+        return cls.objects.filter(player_id=player_id, window__in=windows).update(
+            total_games=F('total_games') + len(results),
+            total_wins=F('total_wins') + results.count('win'),
+            total_losses=F('total_losses') + results.count('lose'),
+            total_draws=F('total_draws') + (len(results) - results.count('win') - results.count('lose')),
+            score=F('score') + sum(Player.points_for(result, difficulty) for result in results),
+            updated_at=timezone.now(),
+        )
+
+
+class ArchivedOnlineGame(models.Model):
+    """Compact record of a finished, forfeited or abandoned OnlineGame"""
+    game_id = models.CharField(max_length=100, unique=True)
+    mode = models.CharField(max_length=20)
+    player1_name = models.CharField(max_length=50)
+    player2_name = models.CharField(max_length=50)
+    player1_score = models.IntegerField(default=0)
+    player2_score = models.IntegerField(default=0)
+    rounds_played = models.IntegerField(default=0)
+    status = models.CharField(max_length=20)  # finished, forfeit, abandoned
+    winner = models.CharField(max_length=50, null=True, blank=True)
+    forfeit_by = models.CharField(max_length=50, null=True, blank=True)
+    created_at = models.DateTimeField()
+    ended_at = models.DateTimeField(db_index=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Archived {self.game_id}: {self.player1_name} vs {self.player2_name}"
+
+
+class OpponentProfile(models.Model):
+    """Cross-session move habits of a player, used to warm-start GameAI"""
+    player = models.OneToOneField(Player, on_delete=models.CASCADE, primary_key=True, related_name='opponent_profile')
+    first_moves = models.JSONField(default=dict)  # {element: count}
+    transitions = models.JSONField(default=dict)  # {previous: {next: count}}
+    moves_seen = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Profile of {self.player_id} ({self.moves_seen} moves)"
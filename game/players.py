@@ -0,0 +1,116 @@
+"""
+Player Identity Cache
+
+Named players are addressed by primary key once they are known. Each worker
+keeps a bounded LRU of name -> id so repeat rounds skip the get_or_create
+lookup, and clients are handed a signed player token they can send back to
+skip even the cache on other workers.
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.core import signing
+from django.db import transaction
+
+from .models import Player, WindowedScore
+from .rankings import current_windows, mark_scores_changed
+
+PLAYER_ID_CACHE_SIZE = 10000
+TOKEN_SALT = 'game.player-token'
+
+
+class PlayerIdCache:
+    """Thread-safe bounded LRU mapping player name to primary key"""
+
+    def __init__(self, max_size=PLAYER_ID_CACHE_SIZE):
+        self.max_size = max_size
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            player_id = self._ids.get(name)
+            if player_id is not None:
+                self._ids.move_to_end(name)
+            return player_id
+
+    def put(self, name, player_id):
+        with self._lock:
+            self._ids[name] = player_id
+            self._ids.move_to_end(name)
+            while len(self._ids) > self.max_size:
+                self._ids.popitem(last=False)
+
+    def discard(self, name):
+        with self._lock:
+            self._ids.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+    def __len__(self):
+        return len(self._ids)
+
+
+player_ids = PlayerIdCache()
+
+
+def make_player_token(player_id, name):
+    """Signed token binding a player name to its primary key"""
+    return signing.dumps([player_id, name], salt=TOKEN_SALT, compress=True)
+
+
+def read_player_token(token, name):
+    """Return the player id in token if it is valid for name, else None"""
+    try:
+        player_id, token_name = signing.loads(token, salt=TOKEN_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    if token_name != name:
+        return None
+    return player_id
+
+
+def resolve_player_id(name, token=None):
+    """
+    Get the primary key for a named player, creating the player if needed
+    Checks the token, then this worker's cache, then the database.
+    """
+    if token:
+        player_id = read_player_token(token, name)
+        if player_id is not None:
+            player_ids.put(name, player_id)
+            return player_id
+
+    player_id = player_ids.get(name)
+    if player_id is None:
+        player_id = Player.objects.get_or_create(name=name)[0].pk
+        player_ids.put(name, player_id)
+    return player_id
+
+
+def record_results_for(name, results, difficulty, token=None):
+    """
+    Apply game results (in play order) to a named player by primary key
+    All-time stats and the open leaderboard windows are updated in one
+    transaction. Falls back to a fresh lookup if the cached id points at a
+    deleted row. Returns the player id that was updated.
+    """
+    results = list(results)
+    player_id = resolve_player_id(name, token)
+    with transaction.atomic():
+        if not Player.record_results(player_id, results, difficulty):
+            player_ids.discard(name)
+            player_id = Player.objects.get_or_create(name=name)[0].pk
+            player_ids.put(name, player_id)
+            Player.record_results(player_id, results, difficulty)
+        WindowedScore.record_results(player_id, results, difficulty, current_windows())
+        transaction.on_commit(mark_scores_changed)
+    return player_id
+
+
+def record_result_for(name, result, difficulty, token=None):
+    """Apply a single game result to a named player (see record_results_for)"""
+    return record_results_for(name, [result], difficulty, token)
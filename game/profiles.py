@@ -0,0 +1,134 @@
+"""
+Cross-Session Opponent Profiles
+
+Named players' moves are counted into an in-process buffer as
+(previous move -> move) observations, where previous is None for a session's
+opening move. The buffer is merged into OpponentProfile rows in batches:
+FLUSH_EVERY moves or FLUSH_INTERVAL seconds, and at exit. One flush reads
+the touched profiles in a single locked query (creating missing rows first),
+merges in Python and writes them back.
+Flushes run on a background thread (see game/flushing.py). A batch that fails
+(e.g. a player deleted meanwhile) is retried one player at a time and the
+players that still fail are dropped.
+
+When a session's GameAI is created, the player's profile is loaded through
+the cache, so warm-starting costs at most one query per session.
+"""
+
+import atexit
+import threading
+import time
+import traceback
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .flushing import BackgroundFlusher
+from .game_logic import MoveProfile
+from .models import OpponentProfile
+
+FLUSH_EVERY = 500  # Moves buffered before writing
+FLUSH_INTERVAL = 30  # Seconds between writes when traffic is light
+PROFILE_CACHE_TIMEOUT = 600
+
+_pending = {}  # player_id -> MoveProfile of unflushed observations
+_pending_moves = 0
+_last_flush = time.monotonic()
+_lock = threading.Lock()
+
+
+def _cache_key(player_id):
+    return f'opponent-profile:{player_id}'
+
+
+def load_profile(player_id):
+    """The player's MoveProfile (possibly empty), cached between sessions"""
+    data = cache.get(_cache_key(player_id))
+    if data is None:
+        row = OpponentProfile.objects.filter(pk=player_id).values('first_moves', 'transitions').first()
+        data = row or {'first_moves': {}, 'transitions': {}}
+        cache.set(_cache_key(player_id), data, PROFILE_CACHE_TIMEOUT)
+    return MoveProfile(data['first_moves'], data['transitions'])
+
+
+def record_moves(player_id, observations):
+    """Buffer (previous, move) observations for a player, waking the flush thread if due"""
+    global _pending_moves
+    with _lock:
+        profile = _pending.setdefault(player_id, MoveProfile())
+        for previous, move in observations:
+            profile.observe(previous, move)
+        _pending_moves += len(observations)
+        due = (_pending_moves >= FLUSH_EVERY or
+               time.monotonic() - _last_flush >= FLUSH_INTERVAL)
+    if due:
+        flusher.wake()
+    else:
+        flusher.start()  # Its timer writes what's buffered if no more traffic comes
+
+
+def _moves_in(observed):
+    return sum(observed.first_moves.values()) + sum(
+        sum(nexts.values()) for nexts in observed.transitions.values()
+    )
+
+
+def _write(batch):
+    with transaction.atomic():
+        # Create missing rows up front, so a worker flushing the same new player at the
+        # same time waits on the row lock below and merges into it rather than losing its moves
+        OpponentProfile.objects.bulk_create(
+            [OpponentProfile(player_id=player_id) for player_id in batch], ignore_conflicts=True
+        )
+        rows = list(OpponentProfile.objects.select_for_update().filter(pk__in=list(batch)))
+        for row in rows:
+            observed = batch[row.pk]
+            merged = MoveProfile(row.first_moves, row.transitions)
+            merged.merge(observed)
+            data = merged.to_json()
+            row.updated_at = timezone.now()
+            row.first_moves = data['first_moves']
+            row.transitions = data['transitions']
+            row.moves_seen = (row.moves_seen or 0) + _moves_in(observed)
+        OpponentProfile.objects.bulk_update(rows, ['first_moves', 'transitions', 'moves_seen', 'updated_at'])
+    cache.delete_many([_cache_key(player_id) for player_id in batch])
+
+
+def flush():
+    """Merge buffered observations into OpponentProfile rows; returns moves written (dropped ones excluded)"""
+    global _pending, _pending_moves, _last_flush
+    with _lock:
+        batch, _pending = _pending, {}
+        moves, _pending_moves = _pending_moves, 0
+        _last_flush = time.monotonic()
+    if not batch:
+        return 0
+
+    try:
+        _write(batch)
+        return moves
+    except Exception:
+        traceback.print_exc()
+    # Retry player by player and drop the players that still fail
+    written = 0
+    for player_id, observed in batch.items():
+        try:
+            _write({player_id: observed})
+            written += _moves_in(observed)
+        except Exception:
+            print(f'opponent profiles: dropped {_moves_in(observed)} moves for player {player_id}')
+    return written
+
+
+flusher = BackgroundFlusher('profile-flush', flush, FLUSH_INTERVAL)
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
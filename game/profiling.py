@@ -0,0 +1,244 @@
+"""
+Request Profiling
+
+An opt-in profiling surface for admins (the /api/profiling/ views), for
+seeing where a live worker spends its time or memory. Everything is per
+worker process, and the responses say which pid served them.
+
+Sampling: ProfilingMiddleware profiles a share of the requests of each URL
+name, e.g. PROFILING_SAMPLE_RATES='play_round=5,get_game_state=1' (percent;
+'*' matches any name). Rates can be changed at run time. While at least one
+profiled request is running, a sampler thread reads those request threads'
+stacks every PROFILING_INTERVAL seconds with sys._current_frames(). Nothing
+is traced or instrumented, so a request that isn't sampled only pays for a
+dict lookup. The sampler also sleeps while no request is being profiled.
+Samples are kept as collapsed stacks, one 'url_name;module:function;...
+count' line per distinct stack: the input format of flamegraph.pl,
+speedscope and inferno.
+
+Allocations: tracemalloc is started on demand. It records a baseline
+snapshot and then reports the biggest growth since then, by line or by
+traceback, next to the entry counts of the in-process caches
+(ai_instances and the like). Tracing slows down every allocation, so stop
+it when done.
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+MAX_DEPTH = 64  # Frames kept per sample, innermost first
+MAX_STACKS = 5000  # Distinct stacks kept per URL name; later ones are counted as '(other)'
+TRACE_FRAMES = 1  # Frames kept per allocation; more makes key_type=traceback useful but tracing slower
+MAX_TRACE_FRAMES = 100
+
+
+def parse_percent(name, percent):
+    """A sampling rate as a float from 0 to 100, raising ValueError for anything else"""
+    try:
+        percent = float(percent)
+    except (TypeError, ValueError):
+        raise ValueError(f'Rate for {name} must be a number, got {percent!r}')
+    if not 0 <= percent <= 100:
+        raise ValueError(f'Rate for {name} must be from 0 to 100, got {percent}')
+    return percent
+
+
+def parse_rates(value):
+    """'name=percent,...' -> {name: percent}, raising ValueError if malformed"""
+    rates = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        name, sep, percent = item.partition('=')
+        if not sep or not name.strip():
+            raise ValueError(f'Expected name=percent, got {item.strip()!r}')
+        rates[name.strip()] = parse_percent(name.strip(), percent)
+    return rates
+
+
+def collapse(frame):
+    """A frame's stack as 'module:function;...', outermost first"""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples the stacks of the request threads that are being profiled"""
+
+    def __init__(self, interval=None):
+        self.interval = interval
+        self.rates = None  # Read from settings on first use
+        self._active = {}  # thread id -> url name
+        self._stacks = defaultdict(Counter)  # url name -> collapsed stack -> samples
+        self._requests = Counter()  # url name -> profiled requests
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def should_sample(self, url_name):
+        if self.rates is None:
+            self.rates = parse_rates(settings.PROFILING_SAMPLE_RATES)
+        if not self.rates:
+            return False
+        rate = self.rates.get(url_name, self.rates.get('*', 0))
+        return rate > 0 and random.random() * 100 < rate
+
+    def set_rates(self, rates):
+        self.rates = {name: parse_percent(name, percent) for name, percent in rates.items()}
+
+    def begin(self, url_name):
+        """Profile the calling thread's current request"""
+        with self._lock:
+            self._active[threading.get_ident()] = url_name
+            self._requests[url_name] += 1
+        self._ensure_started()
+        self._wakeup.set()
+
+    def end(self):
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+
+    def collapsed(self, url_name=None):
+        """Collapsed-stack lines, most sampled first, rooted at their URL name"""
+        with self._lock:
+            names = [url_name] if url_name else list(self._stacks)
+            rows = [(count, f'{name};{stack}') for name in names for stack, count in self._stacks[name].items()]
+        return '\n'.join(f'{stack} {count}' for count, stack in sorted(rows, reverse=True))
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self._requests.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rates': self.rates or {},
+                'interval': self.interval or settings.PROFILING_INTERVAL,
+                'requests': dict(self._requests),
+                'samples': {name: sum(stacks.values()) for name, stacks in self._stacks.items()},
+                'active': len(self._active),
+            }
+
+    def _ensure_started(self):
+        # Threads don't survive fork, so a worker forked from a preloaded master starts its own
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        interval = self.interval or settings.PROFILING_INTERVAL
+        while True:
+            # Cleared before looking, so a request that starts meanwhile sets it again
+            self._wakeup.clear()
+            with self._lock:
+                active = list(self._active.items())
+            if not active:
+                self._wakeup.wait()
+                continue
+            frames = sys._current_frames()
+            stacks = [(url_name, collapse(frames[ident])) for ident, url_name in active if ident in frames]
+            del frames
+            with self._lock:
+                for url_name, stack in stacks:
+                    counts = self._stacks[url_name]
+                    if stack not in counts and len(counts) >= MAX_STACKS:
+                        stack = '(other)'
+                    counts[stack] += 1
+            time.sleep(interval)
+
+
+class AllocationTracer:
+    """tracemalloc growth since a baseline snapshot"""
+
+    def __init__(self):
+        self.baseline = None
+        self.started_at = None
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing() and self.baseline is not None
+
+    def start(self, frames=TRACE_FRAMES):
+        """Start tracing (restarting it if frames changed) and take the baseline"""
+        if tracemalloc.is_tracing() and tracemalloc.get_traceback_limit() != frames:
+            # The frame limit is fixed while tracing; traces recorded so far are dropped
+            tracemalloc.stop()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.baseline = self._snapshot()
+        self.started_at = time.time()
+
+    def stop(self):
+        tracemalloc.stop()
+        self.baseline = None
+        self.started_at = None
+
+    def diff(self, key_type='lineno', limit=20):
+        """The limit biggest growths since the baseline, grouped by 'lineno', 'filename' or 'traceback'"""
+        changes = self._snapshot().compare_to(self.baseline, key_type)
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            'since': self.started_at,
+            'traced_bytes': current,
+            'peak_bytes': peak,
+            'top': [
+                {
+                    'where': [f'{frame.filename}:{frame.lineno}' for frame in stat.traceback],
+                    'size_diff': stat.size_diff,
+                    'size': stat.size,
+                    'count_diff': stat.count_diff,
+                    'count': stat.count,
+                }
+                for stat in changes[:limit]
+            ],
+        }
+
+    @staticmethod
+    def _snapshot():
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ])
+
+
+def cache_sizes():
+    """Entry counts of the per-process caches worth watching for growth"""
+    from . import deadlines, matchmaking, players, views
+    from .broadcast import hub
+
+    return {
+        'ai_instances': len(views.ai_instances),
+        'idle_ai_opponents': len(matchmaking.ai_opponents),
+        'player_ids': len(players.player_ids),
+        'round_deadlines': len(deadlines.scheduler),
+        'broadcast_channels': len(hub),
+    }
+
+
+def status():
+    return {
+        'pid': os.getpid(),
+        'sampling': profiler.stats(),
+        'tracemalloc': tracer.tracing,
+        'tracemalloc_frames': tracemalloc.get_traceback_limit() if tracer.tracing else None,
+        'caches': cache_sizes(),
+    }
+
+
+profiler = SamplingProfiler()
+tracer = AllocationTracer()
@@ -0,0 +1,250 @@
+"""
+Leaderboard Rankings
+
+The leaderboard is ordered by (score desc, total_wins desc, total_losses asc,
+id asc), which is backed by a matching composite index on Player. Pages are
+fetched with keyset ("seek") conditions on that tuple instead of OFFSET, so
+page 10,000 costs the same index range scan as page 1.
+
+Cursors are opaque URL-safe strings holding the sort key of the row at the
+edge of a page plus its 1-based position, so rank numbers stay continuous
+across pages without counting.
+
+The same pagination serves the time-windowed boards (daily, weekly, season),
+which read WindowedScore rows filtered to one window key. Responses are
+cached and ETagged against a score version in the cache. Recording a result
+only marks the scores as changed; the next read moves the version on, at most
+once every LEADERBOARD_REFRESH seconds, so under a steady stream of results
+a cached page still serves every reader in between instead of being thrown
+away after each game. score_changed is sent when the version moves so other
+caches built from the standings (the top-players fragments) can drop their
+copies.
+"""
+
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Func, OuterRef, Q, Subquery
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Player, WindowedScore
+
+LEADERBOARD_ORDER = ('-score', '-total_wins', 'total_losses', 'id')
+REVERSE_ORDER = ('score', 'total_wins', '-total_losses', '-id')
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+WINDOWS = ('daily', 'weekly', 'season')
+SCORE_VERSION_KEY = 'leaderboard:version'
+SCORES_CHANGED_KEY = 'leaderboard:changed'  # Set while results are waiting for a new version
+REFRESH_KEY = 'leaderboard:refreshed'  # Present for LEADERBOARD_REFRESH seconds after a bump
+PAGE_CACHE_TIMEOUT = 60
+
+# Sent with the new version whenever the standings change
+score_changed = Signal()
+
+
+def window_key(window, now=None):
+    """Key of the window of the given kind that contains now"""
+    day = timezone.localdate(now)
+    if window == 'daily':
+        return f'daily:{day.isoformat()}'
+    if window == 'weekly':
+        year, week, _ = day.isocalendar()
+        return f'weekly:{year}-W{week:02d}'
+    if window == 'season':
+        return f'season:{day.year}-Q{(day.month - 1) // 3 + 1}'
+    raise ValueError(f'Unknown window: {window}')
+
+
+def current_windows(now=None):
+    """Keys of every window that is currently open"""
+    return [window_key(window, now) for window in WINDOWS]
+
+
+def board(window=None):
+    """Base queryset for the all-time board or one of the windowed boards"""
+    if not window or window == 'all':
+        return Player.objects.all()
+    return WindowedScore.objects.filter(window=window_key(window)).select_related('player')
+
+
+def score_version():
+    """Current leaderboard version; moves on when results were recorded since the last refresh"""
+    values = cache.get_many([SCORE_VERSION_KEY, SCORES_CHANGED_KEY])
+    version = values.get(SCORE_VERSION_KEY)
+    if version is None:
+        cache.add(SCORE_VERSION_KEY, 1, timeout=None)
+        version = cache.get(SCORE_VERSION_KEY, 1)
+    # Only one reader per interval wins the add and bumps; the others keep using the cached pages
+    if SCORES_CHANGED_KEY in values and cache.add(REFRESH_KEY, 1, timeout=settings.LEADERBOARD_REFRESH):
+        cache.delete(SCORES_CHANGED_KEY)
+        version = bump_score_version()
+    return version
+
+
+def mark_scores_changed():
+    """Note that results were recorded; score_version picks it up within LEADERBOARD_REFRESH seconds"""
+    cache.add(SCORES_CHANGED_KEY, 1, timeout=None)
+
+
+def bump_score_version():
+    """Invalidate cached leaderboard pages now"""
+    try:
+        version = cache.incr(SCORE_VERSION_KEY)
+    except ValueError:
+        cache.add(SCORE_VERSION_KEY, 1, timeout=None)
+        version = score_version()
+    score_changed.send(sender=bump_score_version, version=version)
+    return version
+
+
+def sort_key(player):
+    """Leaderboard sort key of a player"""
+    return (player.score, player.total_wins, player.total_losses, player.id)
+
+
+def encode_cursor(player, position):
+    """Build an opaque cursor pointing at player, who sits at position"""
+    raw = json.dumps([*sort_key(player), position], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (sort_key, position) from a cursor, raising ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError('Invalid cursor')
+    if (not isinstance(values, list) or len(values) != 5
+            or not all(isinstance(v, int) for v in values)):
+        raise ValueError('Invalid cursor')
+    return tuple(values[:4]), values[4]
+
+
+def ranked_after(key):
+    """Q matching players that come after key in leaderboard order"""
+    score, wins, losses, player_id = key
+    # The redundant leading bound lets the planner seek into the index
+    return Q(score__lte=score) & (
+        Q(score__lt=score) |
+        Q(score=score, total_wins__lt=wins) |
+        Q(score=score, total_wins=wins, total_losses__gt=losses) |
+        Q(score=score, total_wins=wins, total_losses=losses, id__gt=player_id)
+    )
+
+
+def ranked_before(key):
+    """Q matching players that come before key in leaderboard order"""
+    score, wins, losses, player_id = key
+    return Q(score__gte=score) & (
+        Q(score__gt=score) |
+        Q(score=score, total_wins__gt=wins) |
+        Q(score=score, total_wins=wins, total_losses__lt=losses) |
+        Q(score=score, total_wins=wins, total_losses=losses, id__lt=player_id)
+    )
+
+
+def clamp_page_size(limit):
+    """Validate a requested page size, raising ValueError for junk"""
+    if limit in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def page_after(cursor=None, limit=DEFAULT_PAGE_SIZE, queryset=None):
+    """
+    Fetch the page that follows cursor (or the first page)
+    Returns (players, first_position)
+    """
+    players = (queryset if queryset is not None else board()).order_by(*LEADERBOARD_ORDER)
+    position = 0
+    if cursor:
+        key, position = decode_cursor(cursor)
+        players = players.filter(ranked_after(key))
+    return list(players[:limit]), position + 1
+
+
+def page_before(cursor, limit=DEFAULT_PAGE_SIZE, queryset=None):
+    """
+    Fetch the page that precedes cursor
+    Returns (players, first_position)
+    """
+    queryset = queryset if queryset is not None else board()
+    key, position = decode_cursor(cursor)
+    players = list(
+        queryset.filter(ranked_before(key)).order_by(*REVERSE_ORDER)[:limit]
+    )
+    players.reverse()
+    return players, position - len(players)
+
+
+def position_of(player, queryset=None):
+    """1-based leaderboard position of player, counted off the leaderboard index"""
+    queryset = queryset if queryset is not None else board()
+    return queryset.filter(ranked_before(sort_key(player))).count() + 1
+
+
+def page_around(player, limit=DEFAULT_PAGE_SIZE, queryset=None):
+    """
+    Fetch a window of about limit players centred on player
+    Returns (players, first_position)
+    """
+    queryset = queryset if queryset is not None else board()
+    position = position_of(player, queryset)
+    key = sort_key(player)
+    above = list(
+        queryset.filter(ranked_before(key)).order_by(*REVERSE_ORDER)[:(limit - 1) // 2]
+    )
+    above.reverse()
+    below = list(
+        queryset.filter(ranked_after(key)).order_by(*LEADERBOARD_ORDER)[:limit - 1 - len(above)]
+    )
+    return above + [player] + below, position - len(above)
+
+
+def with_live_rank(queryset):
+    """
+    Annotate live_rank onto a queryset so a player's row and rank come back
+    in one query. This is the competition rank (1, 2, 2, 4...): one more than
+    the players with a higher score. position_of gives the 1-based position
+    in leaderboard order instead.
+    """
+    higher = Player.objects.filter(
+        score__gt=OuterRef('score')
+    ).order_by().annotate(n=Func(F('id'), function='COUNT')).values('n')
+    return queryset.annotate(live_rank=Subquery(higher) + 1)
+
+
+def serialize_page(players, first_position, limit):
+    """Build the JSON payload for a leaderboard page"""
+    data = [{
+        'rank': first_position + idx,
+        'name': p.name,
+        'score': p.score,
+        'wins': p.total_wins,
+        'losses': p.total_losses,
+        'draws': p.total_draws,
+        'games': p.total_games,
+        'win_rate': p.win_rate(),
+        'best_streak': p.best_streak,
+    } for idx, p in enumerate(players)]
+
+    last_position = first_position + len(players) - 1
+    return {
+        'leaderboard': data,
+        'next_cursor': encode_cursor(players[-1], last_position) if len(players) >= limit else None,
+        'prev_cursor': encode_cursor(players[0], first_position) if players and first_position > 1 else None,
+    }
@@ -0,0 +1,169 @@
+"""
+Retention and Archival
+
+Keeps the live OnlineGame and MatchmakingQueue tables small:
+- Ended games (finished, forfeit) older than the retention window, and games
+  nobody has touched for ABANDONED_AFTER, are moved out in primary-key batches.
+  They go either to ArchivedOnlineGame rows or to gzipped NDJSON segment
+  files, and are then deleted.
+- Expired queue entries are deleted in bounded batches.
+
+Each batch is its own short transaction, so the sweeps never hold long locks
+on the hot tables. Both sweeps are generators that yield the running total
+after every batch, so callers can report progress.
+"""
+
+import gzip
+import json
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.db import router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import matchmaking
+from .models import ArchivedOnlineGame, MatchmakingQueue, OnlineGame
+from .routers import gamestate_db
+
+ENDED_STATUSES = ('finished', 'forfeit')
+ABANDONED_AFTER = timedelta(hours=1)
+
+ARCHIVE_FIELDS = (
+    'game_id', 'mode', 'player1_name', 'player2_name', 'player1_score',
+    'player2_score', 'current_round', 'status', 'winner', 'forfeit_by',
+    'created_at', 'updated_at',
+)
+
+
+def retired_games(days, now=None):
+    """Games that are due for archival"""
+    now = now or timezone.now()
+    return OnlineGame.objects.filter(
+        Q(status__in=ENDED_STATUSES, updated_at__lt=now - timedelta(days=days)) |
+        (~Q(status__in=ENDED_STATUSES) & Q(updated_at__lt=now - ABANDONED_AFTER))
+    )
+
+
+def _archive_row(game):
+    """Compact archive record for one game (values() dict)"""
+    status = game['status'] if game['status'] in ENDED_STATUSES else 'abandoned'
+    return {
+        'game_id': game['game_id'],
+        'mode': game['mode'],
+        'player1_name': game['player1_name'],
+        'player2_name': game['player2_name'],
+        'player1_score': game['player1_score'],
+        'player2_score': game['player2_score'],
+        'rounds_played': game['current_round'],
+        'status': status,
+        'winner': game['winner'],
+        'forfeit_by': game['forfeit_by'],
+        'created_at': game['created_at'],
+        'ended_at': game['updated_at'],
+    }
+
+
+def _fsync_directory(directory):
+    """Make a new file's directory entry durable"""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class NDJSONSegmentWriter:
+    """
+    Appends archive rows to gzipped NDJSON segments, rolling over every segment_rows
+    Each write() appends the batch as a complete gzip member (concatenated
+    members are one valid gzip stream, e.g. for gzip.open or zcat) and
+    fsyncs the file, so a segment is readable up to the last batch even if
+    the process dies, and a batch is on disk before its games are deleted.
+    """
+
+    def __init__(self, directory, prefix='online_games', segment_rows=100000):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.segment_rows = segment_rows
+        self.stamp = timezone.now().strftime('%Y%m%dT%H%M%S')
+        self.segment = 0
+        self.rows_in_segment = 0
+        self.handle = None
+        self.paths = []
+
+    def _open(self):
+        self.segment += 1
+        path = self.directory / f'{self.prefix}-{self.stamp}-{self.segment:04d}.ndjson.gz'
+        self.paths.append(path)
+        self.handle = open(path, 'ab')
+        _fsync_directory(self.directory)
+        self.rows_in_segment = 0
+
+    def write(self, rows):
+        rows = list(rows)
+        while rows:
+            if self.handle is None or self.rows_in_segment >= self.segment_rows:
+                self.close()
+                self._open()
+            room = self.segment_rows - self.rows_in_segment
+            part, rows = rows[:room], rows[room:]
+            data = ''.join(json.dumps(row, default=str) + '\n' for row in part)
+            self.handle.write(gzip.compress(data.encode('utf-8')))
+            # Durable, not just in the page cache, before the batch's rows are deleted
+            self.handle.flush()
+            os.fsync(self.handle.fileno())
+            self.rows_in_segment += len(part)
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+def archive_games(days=7, batch_size=1000, writer=None, now=None):
+    """
+    Move retired games out of OnlineGame in primary-key batches
+    Writes to ArchivedOnlineGame, or to writer (NDJSONSegmentWriter) if given.
+    Yields the number of games moved so far after each batch.
+    """
+    queryset = retired_games(days, now)
+    archive_db = router.db_for_write(ArchivedOnlineGame)
+    moved = 0
+    while True:
+        games = list(queryset.order_by('pk').values('pk', *ARCHIVE_FIELDS)[:batch_size])
+        if not games:
+            break
+        rows = [_archive_row(game) for game in games]
+        # Games and archive may be on different databases (see routers.py): the inner
+        # archive transaction commits first, so a failed delete only leaves rows that
+        # the next sweep re-archives (ignore_conflicts) and deletes
+        with transaction.atomic(using=gamestate_db()), transaction.atomic(using=archive_db):
+            if writer is None:
+                ArchivedOnlineGame.objects.bulk_create(
+                    [ArchivedOnlineGame(**row) for row in rows], ignore_conflicts=True
+                )
+            else:
+                writer.write(rows)
+            OnlineGame.objects.filter(pk__in=[game['pk'] for game in games]).delete()
+        moved += len(games)
+        yield moved
+
+
+def purge_queue(batch_size=1000, now=None):
+    """
+    Delete expired matchmaking entries in bounded batches
+    Yields the number of entries removed so far after each batch.
+    """
+    now = now or timezone.now()
+    expired = MatchmakingQueue.objects.filter(last_seen__lt=matchmaking.expiry_cutoff(now))
+    removed = 0
+    while True:
+        entries = list(expired.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not entries:
+            break
+        MatchmakingQueue.objects.filter(pk__in=entries).delete()
+        removed += len(entries)
+        yield removed
@@ -0,0 +1,122 @@
+"""
+Database Routing
+
+Two optional database aliases, each enabled by its own environment variable
+in settings:
+- 'gamestate' (GAMESTATE_DATABASE_URL): MatchmakingQueue and OnlineGame, the
+  tables that take a constant stream of small writes, get their own database
+  and so their own write lock / WAL / buffer pool. PendingSettlement lives
+  with OnlineGame, since both are written in one transaction, and so do the
+  tournament tables, which settlements update. Their transactions must use
+  transaction.atomic(using=gamestate_db()).
+- 'replica' (REPLICA_DATABASE_URL): a read replica of 'default'. Only views
+  wrapped in @replica_reads (leaderboard, home, rules) read from it.
+
+Read-your-writes: once a request writes to 'default', the rest of that
+request reads from the primary, and ReplicaPinMiddleware sets a cookie that
+keeps that client's reads on the primary for REPLICA_PIN_SECONDS, longer than
+the replica is expected to lag. A player who just played a round sees their
+own score, not the replica's older copy.
+
+Without either variable every model stays on 'default', as before.
+"""
+
+import functools
+from contextvars import ContextVar
+
+from django.conf import settings
+
+GAMESTATE_DB = 'gamestate'
+REPLICA_DB = 'replica'
+GAMESTATE_MODELS = frozenset({
+    'matchmakingqueue', 'onlinegame', 'pendingsettlement', 'tournament', 'tournamententry', 'tournamentmatch',
+})
+PIN_COOKIE = 'db_pin'
+
+
+class RequestRouting:
+    """Per-request routing flags, installed by ReplicaPinMiddleware"""
+    __slots__ = ('replica_reads', 'pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        self.replica_reads = False
+        self.pinned = pinned
+        self.wrote = False
+
+
+_routing = ContextVar('db_routing', default=None)
+
+
+def gamestate_db():
+    """Alias holding the game-state tables"""
+    return GAMESTATE_DB if GAMESTATE_DB in settings.DATABASES else 'default'
+
+
+def replica_configured():
+    return REPLICA_DB in settings.DATABASES
+
+
+def begin_request(pinned):
+    return _routing.set(RequestRouting(pinned))
+
+
+def end_request(token):
+    routing = _routing.get()
+    _routing.reset(token)
+    return routing
+
+
+def reads_pinned():
+    """Whether this request must read from the primary (it or a recent one wrote)"""
+    routing = _routing.get()
+    return routing is None or routing.pinned or not routing.replica_reads
+
+
+def replica_reads(view):
+    """Let a read-only view's queries go to the replica (unless the client is pinned)"""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        routing = _routing.get()
+        if routing is None:
+            return view(request, *args, **kwargs)
+        routing.replica_reads = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            routing.replica_reads = False
+    return wrapper
+
+
+def _is_gamestate(model):
+    return model._meta.app_label == 'game' and model._meta.model_name in GAMESTATE_MODELS
+
+
+class GameRouter:
+    def db_for_read(self, model, **hints):
+        if _is_gamestate(model):
+            return gamestate_db()
+        if replica_configured() and not reads_pinned():
+            return REPLICA_DB
+        return None
+
+    def db_for_write(self, model, **hints):
+        if _is_gamestate(model):
+            return gamestate_db()
+        routing = _routing.get()
+        if routing is not None:
+            routing.pinned = routing.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replica rows are the primary's rows, so they may be related to each other
+        aliases = {obj1._state.db, obj2._state.db}
+        return aliases <= {'default', REPLICA_DB} or len(aliases) == 1
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA_DB:
+            return False  # Replicated from 'default', never migrated directly
+        if app_label == 'game' and model_name in GAMESTATE_MODELS:
+            return db == gamestate_db()
+        if db == GAMESTATE_DB:
+            return False
+        return None
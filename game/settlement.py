@@ -0,0 +1,145 @@
+"""
+PvP Settlement Outbox
+
+When an online game ends, the move that ends it only writes a
+PendingSettlement row next to the OnlineGame update, in the same transaction,
+so the game row's lock is released as soon as the game itself is saved.
+Queueing also sets OnlineGame.settled, and a game that already has it set is
+never queued again. Every path that ends a game does so under the game row's
+lock, so however the ends race (both players' polls, a deadline, a forfeit),
+or however late a stale one lands, a game settles once.
+Player stats are applied afterwards, in batches: each batch claims its rows
+by deleting them and records every player's wins and losses in one update,
+all in one transaction. A row is applied exactly once; if a worker dies
+before applying it, the row stays and the next sweep picks it up. Tournament
+games are also settled when they end without a winner (blank names), and the
+same transaction records their match results by the winner's client id, as
+display names can repeat within a tournament (see game/tournaments.py).
+
+With a separate game-state database (see game/routers.py) the claim and the
+player update commit on different databases; the player update commits
+first, so a crash between the two can apply a settlement twice, never lose it.
+
+Who applies them depends on SETTLEMENT_MODE:
+- 'thread' (default): a background thread per worker process, woken after
+  every settlement commit and sweeping every SWEEP_INTERVAL seconds
+- 'inline': right after the commit, still in the request
+- 'command': only `python manage.py settle_games` (e.g. run with --loop)
+"""
+
+import threading
+import traceback
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from . import tournaments
+from .models import OnlineGame, PendingSettlement
+from .players import record_results_for
+from .routers import gamestate_db
+
+BATCH_SIZE = 100
+SWEEP_INTERVAL = 5.0  # Seconds between sweeps when nothing wakes the worker
+
+
+def enqueue(game_id, winner_name, loser_name, winner_id=''):
+    """Record an ended game for settlement; call inside the transaction that ends it"""
+    enqueue_many([(game_id, winner_name, loser_name, winner_id)])
+
+
+def enqueue_many(games):
+    """
+    Record several ended games, as (game_id, winner_name, loser_name, winner_id) tuples, in one insert
+    Call inside the transaction that ends them. Games whose settled flag is
+    already set are skipped; the rest get it set, and the flag outlives the
+    outbox row that apply_batch deletes.
+    """
+    if not games:
+        return
+    unsettled = set(OnlineGame.objects.select_for_update().filter(
+        game_id__in=[game_id for game_id, *_ in games], settled=False
+    ).values_list('game_id', flat=True))
+    if not unsettled:
+        return
+    OnlineGame.objects.filter(game_id__in=unsettled).update(settled=True)
+    PendingSettlement.objects.bulk_create([
+        PendingSettlement(game_id=game_id, winner_name=winner_name, loser_name=loser_name, winner_id=winner_id)
+        for game_id, winner_name, loser_name, winner_id in games if game_id in unsettled
+    ], ignore_conflicts=True)
+    transaction.on_commit(_committed, using=gamestate_db())
+
+
+def _committed():
+    if settings.SETTLEMENT_MODE == 'inline':
+        apply_pending()
+    elif settings.SETTLEMENT_MODE == 'thread':
+        worker.wake()
+
+
+def apply_batch(limit=BATCH_SIZE):
+    """Apply up to limit pending settlements, oldest first; returns how many were applied"""
+    with transaction.atomic(using=gamestate_db()):
+        pending = list(PendingSettlement.objects.order_by('pk')[:limit])
+        if not pending:
+            return 0
+        claimed = PendingSettlement.objects.filter(pk__in=[row.pk for row in pending]).delete()[0]
+        if claimed != len(pending):
+            # Another worker took some of them first; let it have this batch
+            transaction.set_rollback(True, using=gamestate_db())
+            return 0
+        tournaments.record_results([(row.game_id, row.winner_id) for row in pending])
+        results = defaultdict(list)
+        for row in pending:
+            results[row.winner_name].append('win')
+            results[row.loser_name].append('lose')
+        for name, player_results in results.items():
+            if name and name.strip():
+                record_results_for(name, player_results, None)
+    return len(pending)
+
+
+def apply_pending(limit=BATCH_SIZE):
+    """Apply batches until nothing is pending; returns how many were applied"""
+    applied = 0
+    while True:
+        count = apply_batch(limit)
+        applied += count
+        if count < limit:
+            return applied
+
+
+class SettlementWorker:
+    """Background thread applying settlements for this process, started on first use"""
+
+    def __init__(self, interval=SWEEP_INTERVAL):
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def wake(self):
+        self._ensure_started()
+        self._wakeup.set()
+
+    def _ensure_started(self):
+        # Threads don't survive fork, so a worker forked from a preloaded master starts its own
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='settlement', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                apply_pending()
+            except Exception:
+                traceback.print_exc()  # Rows stay pending and are retried on the next sweep
+
+
+worker = SettlementWorker()
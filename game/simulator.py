@@ -0,0 +1,129 @@
+"""
+Headless AI Simulator
+
+Plays scripted players against GameAI without touching the database, so AI
+changes can be compared offline. Every strategy is a callable
+(rng, history, opponent, available_elements) -> move, where history and
+opponent are the player's and the AI's moves so far. run_sessions() plays a
+series of short sessions and reports the AI's win rate at each round index, either cold
+(a fresh GameAI per session) or warm (seeded with a MoveProfile built up over
+the player's earlier sessions). measure_latency() times the AI's per-move cost
+as one long session grows.
+"""
+
+import random
+import time
+
+from .game_logic import GameAI, MoveProfile, counter_move, determine_winner, get_elements_for_mode
+
+
+def biased(rng, history, opponent, available_elements):
+    """Opens with and keeps favouring the first element (60%)"""
+    if rng.random() < 0.6:
+        return available_elements[0]
+    return rng.choice(available_elements)
+
+
+def cycler(rng, history, opponent, available_elements):
+    """Steps through the elements in order, starting at the first"""
+    if not history:
+        return available_elements[0]
+    return available_elements[(available_elements.index(history[-1]) + 1) % len(available_elements)]
+
+
+def sticky(rng, history, opponent, available_elements):
+    """Repeats the previous move 70% of the time"""
+    if history and rng.random() < 0.7:
+        return history[-1]
+    return rng.choice(available_elements)
+
+
+def reactive(rng, history, opponent, available_elements):
+    """Win-stay, lose-shift: keeps a winning move, otherwise counters the AI's last move"""
+    if not history:
+        return rng.choice(available_elements)
+    if determine_winner(history[-1], opponent[-1]) == 'win':
+        return history[-1]
+    return counter_move(opponent[-1], available_elements) or rng.choice(available_elements)
+
+
+def uniform(rng, history, opponent, available_elements):
+    """Pure random - no habit to learn"""
+    return rng.choice(available_elements)
+
+
+STRATEGIES = {
+    'biased': biased,
+    'cycler': cycler,
+    'reactive': reactive,
+    'sticky': sticky,
+    'uniform': uniform,
+}
+
+
+def play_session(ai, strategy, rounds, available_elements, rng, profile=None):
+    """Play one session; returns AI results per round ('win'/'lose'/'draw' from the AI's side)"""
+    history, opponent = [], []
+    results = []
+    for _ in range(rounds):
+        move = strategy(rng, history, opponent, available_elements)
+        ai_choice = ai.get_choice(available_elements)
+        results.append(determine_winner(ai_choice, move))
+        if profile is not None:
+            profile.observe(history[-1] if history else None, move)
+        ai.add_to_history(move)
+        history.append(move)
+        opponent.append(ai_choice)
+    return results
+
+
+def run_sessions(strategy, difficulty='veteran', mode='classic', sessions=200,
+                 rounds=10, warm=False, seed=None):
+    """
+    Play sessions in sequence and return the AI win rate per round index
+    With warm=True each session's AI starts from the profile of all earlier sessions.
+    """
+    rng = random.Random(seed)  # Player RNG; AI seeds are drawn from it too
+    available_elements = get_elements_for_mode(mode)
+    strategy = STRATEGIES[strategy] if isinstance(strategy, str) else strategy
+
+    profile = MoveProfile()
+    wins = [0] * rounds
+    for _ in range(sessions):
+        ai = GameAI(
+            difficulty,
+            profile=MoveProfile(profile.first_moves, profile.transitions) if warm else None,
+            seed=rng.getrandbits(64),
+        )
+        results = play_session(ai, strategy, rounds, available_elements, rng, profile)
+        for index, result in enumerate(results):
+            wins[index] += result == 'win'
+    return [count / sessions for count in wins]
+
+
+def measure_latency(difficulty, strategy='biased', mode='classic', rounds=10000, buckets=5, seed=None):
+    """
+    Play one long session and time get_choice + add_to_history
+    Returns [(first round of bucket, mean microseconds per move)] for equal-sized buckets.
+    """
+    rng = random.Random(seed)  # Player RNG; AI seeds are drawn from it too
+    available_elements = get_elements_for_mode(mode)
+    strategy = STRATEGIES[strategy] if isinstance(strategy, str) else strategy
+    ai = GameAI(difficulty, seed=rng.getrandbits(64))
+
+    size = max(rounds // buckets, 1)
+    history, opponent = [], []
+    timings = []
+    elapsed = 0.0
+    for index in range(rounds):
+        move = strategy(rng, history, opponent, available_elements)
+        started = time.perf_counter()
+        ai_choice = ai.get_choice(available_elements)
+        ai.add_to_history(move)
+        elapsed += time.perf_counter() - started
+        history.append(move)
+        opponent.append(ai_choice)
+        if (index + 1) % size == 0:
+            timings.append((index + 2 - size, elapsed / size * 1e6))
+            elapsed = 0.0
+    return timings
@@ -0,0 +1,309 @@
+"""
+Tournaments
+
+Single-elimination and Swiss tournaments played on ordinary OnlineGames.
+A round is scheduled all at once: pairings are computed in memory from one
+read of the players (and, for Swiss, of the earlier matches), then every game
+of the round is created with one bulk_create and the match rows with another.
+All of a round's games start together. The round deadlines
+(game/deadlines.py) end any game that a no-show holds up.
+
+Results arrive through the settlement outbox (game/settlement.py). Every
+ended tournament game is settled, with or without a winner. The batch that
+applies a settlement also records the match result, in the same
+transaction. It runs one UPDATE per outcome and decrements the tournament's
+open_matches counter. Once that counter is zero, the next round is
+scheduled after the commit, so nothing ever polls the games of a round.
+
+- Single elimination: ceil(log2(players)) rounds. Seeds are placed in
+  standard bracket order (1 v n, 2 v n-1, ...), and the top seeds get the
+  byes up to the next power of two. The winners of slots 2k and 2k+1 meet in
+  slot k of the next round. If a game ends with no winner (neither player
+  chose), the better seed goes through.
+- Swiss: ceil(log2(players)) rounds unless set. Players are ranked by
+  points, then Buchholz (their opponents' points), then seed. Pairing goes
+  greedily from the top: each player meets the next one they haven't played.
+  If that leaves a rematch at the bottom, it is swapped with an earlier pair.
+  With an odd number of players, the lowest-ranked player who hasn't had a
+  bye gets one, worth a point. A game with no winner scores nothing.
+
+Scheduled tournaments start, and stalled ones are picked up again, with
+`python manage.py run_tournaments --loop`.
+"""
+
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import deadlines
+from .models import OnlineGame, Tournament, TournamentEntry, TournamentMatch
+from .routers import gamestate_db
+
+GAME_PREFIX = 'tournament-'
+
+
+def is_tournament_game(game_id):
+    return game_id.startswith(GAME_PREFIX)
+
+
+def create(name, players, format='single_elim', mode='classic', rounds=0, starts_at=None):
+    """Register a tournament and its players, given as (player_id, player_name) in seed order"""
+    players = list(players)
+    if len(players) < 2:
+        raise ValueError('A tournament needs at least 2 players')
+    with transaction.atomic(using=gamestate_db()):
+        tournament = Tournament.objects.create(
+            name=name, format=format, mode=mode, rounds=rounds, starts_at=starts_at or timezone.now()
+        )
+        TournamentEntry.objects.bulk_create([
+            TournamentEntry(tournament=tournament, player_id=player_id, player_name=player_name, seed=seed)
+            for seed, (player_id, player_name) in enumerate(players, 1)
+        ])
+    return tournament
+
+
+def bracket_order(size):
+    """Seeds of a power-of-two bracket in slot order; seeds 1 and 2 can only meet in the final"""
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for first in order for seed in (first, total - first)]
+    return order
+
+
+def swiss_pairings(ranked, met, had_bye=()):
+    """
+    Pair a Swiss round; ranked are player keys, best first
+    met holds frozenset({a, b}) for every pair that already played. Returns
+    (pairs, bye), bye being None with an even number of players.
+    """
+    pool = list(ranked)
+    bye = None
+    if len(pool) % 2:
+        bye = next((key for key in reversed(pool) if key not in had_bye), pool[-1])
+        pool.remove(bye)
+    pairs = []
+    while pool:
+        first = pool.pop(0)
+        index = next((index for index, other in enumerate(pool) if frozenset((first, other)) not in met), None)
+        if index is not None:
+            pairs.append((first, pool.pop(index)))
+        else:
+            pairs.append(_swap_rematch(pairs, first, pool.pop(0), met))
+    return pairs, bye
+
+
+def _swap_rematch(pairs, first, second, met):
+    # first and second already met: trade partners with the nearest earlier pair that allows it
+    for index in range(len(pairs) - 1, -1, -1):
+        a, b = pairs[index]
+        for x, y in ((a, b), (b, a)):
+            if frozenset((x, first)) not in met and frozenset((y, second)) not in met:
+                pairs[index] = (x, first)
+                return (y, second)
+    return (first, second)  # No way around it: a rematch
+
+
+def advance(tournament_id):
+    """
+    Start the tournament's next round, or finish it, if the current round is over
+    Safe to call any time; returns the games created.
+    """
+    with transaction.atomic(using=gamestate_db()):
+        tournament = Tournament.objects.select_for_update().get(pk=tournament_id)
+        if tournament.status == 'finished' or tournament.open_matches > 0:
+            return []
+        if tournament.status == 'scheduled' and tournament.starts_at > timezone.now():
+            return []
+        games = []
+        # A round made only of byes is over as soon as it starts
+        while not games and tournament.status != 'finished':
+            if tournament.format == 'swiss':
+                games = _next_swiss_round(tournament)
+            else:
+                games = _next_elimination_round(tournament)
+    for game in games:
+        deadlines.scheduler.watch(game)
+    return games
+
+
+def advance_due(now=None):
+    """Start scheduled tournaments that are due and advance any whose round is over; returns their ids"""
+    now = now or timezone.now()
+    due = list(Tournament.objects.filter(
+        Q(status='scheduled', starts_at__lte=now) | Q(status='running', open_matches__lte=0)
+    ).values_list('pk', flat=True))
+    for tournament_id in due:
+        advance(tournament_id)
+    return due
+
+
+def _next_elimination_round(tournament):
+    if tournament.current_round == 0:
+        entries = list(tournament.entries.order_by('seed'))
+        size = 2 ** math.ceil(math.log2(max(len(entries), 2)))
+        tournament.rounds = int(math.log2(size))
+        order = [entries[seed - 1] if seed <= len(entries) else None for seed in bracket_order(size)]
+        return _schedule(tournament, list(zip(order[0::2], order[1::2])))
+    winner_ids = list(TournamentMatch.objects.filter(
+        tournament=tournament, round=tournament.current_round
+    ).order_by('slot').values_list('winner_id', flat=True))
+    entries = TournamentEntry.objects.in_bulk(winner_ids)
+    if tournament.current_round >= tournament.rounds or len(winner_ids) < 2:
+        _finish(tournament, entries[winner_ids[0]])
+        return []
+    winners = [entries[pk] for pk in winner_ids]
+    return _schedule(tournament, list(zip(winners[0::2], winners[1::2])))
+
+
+def standings(tournament):
+    """Swiss standings, best first, and the pairs that already met"""
+    entries = {entry.pk: entry for entry in tournament.entries.all()}
+    opponents = defaultdict(list)
+    met = set()
+    pairs = TournamentMatch.objects.filter(tournament=tournament, player2__isnull=False).values_list(
+        'player1_id', 'player2_id')
+    for first, second in pairs:
+        opponents[first].append(second)
+        opponents[second].append(first)
+        met.add(frozenset((first, second)))
+    buchholz = {pk: sum(entries[other].points for other in opponents[pk]) for pk in entries}
+    ranked = sorted(entries.values(), key=lambda entry: (-entry.points, -buchholz[entry.pk], entry.seed))
+    return ranked, met
+
+
+def _next_swiss_round(tournament):
+    ranked, met = standings(tournament)
+    if tournament.current_round == 0 and not tournament.rounds:
+        tournament.rounds = math.ceil(math.log2(max(len(ranked), 2)))
+    if tournament.current_round >= tournament.rounds:
+        _finish(tournament, ranked[0])
+        return []
+    entries = {entry.pk: entry for entry in ranked}
+    pairs, bye = swiss_pairings(
+        [entry.pk for entry in ranked], met, {entry.pk for entry in ranked if entry.had_bye}
+    )
+    pairs = [(entries[first], entries[second]) for first, second in pairs]
+    if bye is not None:
+        pairs.append((entries[bye], None))
+    return _schedule(tournament, pairs)
+
+
+def _schedule(tournament, pairs):
+    """Create the next round's games and matches, pairs being (entry, entry or None for a bye) by slot"""
+    number = tournament.current_round + 1
+    now = timezone.now()
+    games = []
+    matches = []
+    byes = []
+    for slot, (first, second) in enumerate(pairs):
+        if first is None:
+            first, second = second, None
+        if second is None:
+            matches.append(TournamentMatch(
+                tournament=tournament, round=number, slot=slot, player1=first, winner=first, status='done'
+            ))
+            byes.append(first.pk)
+            continue
+        game_id = f'{GAME_PREFIX}{tournament.pk}-{number}-{slot}'
+        games.append(OnlineGame(
+            game_id=game_id, mode=tournament.mode, status='playing', round_start_time=now,
+            player1_id=first.player_id, player1_name=first.player_name,
+            player2_id=second.player_id, player2_name=second.player_name,
+        ))
+        matches.append(TournamentMatch(
+            tournament=tournament, round=number, slot=slot, game_id=game_id, player1=first, player2=second
+        ))
+    OnlineGame.objects.bulk_create(games)
+    TournamentMatch.objects.bulk_create(matches)
+    if byes and tournament.format == 'swiss':
+        TournamentEntry.objects.filter(pk__in=byes).update(points=F('points') + 1, had_bye=True)
+    tournament.status = 'running'
+    tournament.current_round = number
+    tournament.open_matches = len(games)
+    tournament.save(update_fields=['status', 'rounds', 'current_round', 'open_matches'])
+    return games
+
+
+def _finish(tournament, winner):
+    tournament.status = 'finished'
+    tournament.winner_name = winner.player_name
+    tournament.finished_at = timezone.now()
+    tournament.save(update_fields=['status', 'rounds', 'winner_name', 'finished_at'])
+
+
+def record_results(settled):
+    """
+    Record the outcome of settled games, as (game_id, winner_id) pairs; other games are ignored
+    Call inside the settlement's transaction. Tournaments whose round is
+    over are advanced once it commits.
+    """
+    winners = {game_id: winner_id for game_id, winner_id in settled if is_tournament_game(game_id)}
+    if not winners:
+        return
+    matches = TournamentMatch.objects.filter(game_id__in=list(winners), status='playing').select_related(
+        'tournament', 'player1', 'player2')
+    won_by = {'player1': [], 'player2': []}
+    undecided = []
+    points = []
+    eliminated = []
+    closed = defaultdict(int)
+    for match in matches:
+        winner_id = winners[match.game_id]
+        if winner_id and winner_id == match.player1.player_id:
+            side = 'player1'
+        elif winner_id and winner_id == match.player2.player_id:
+            side = 'player2'
+        elif match.tournament.format == 'single_elim':
+            side = 'player1' if match.player1.seed < match.player2.seed else 'player2'  # Better seed goes through
+        else:
+            side = None
+        closed[match.tournament_id] += 1
+        if side is None:
+            undecided.append(match.pk)
+            continue
+        won_by[side].append(match.pk)
+        winner, loser = (match.player1, match.player2) if side == 'player1' else (match.player2, match.player1)
+        if match.tournament.format == 'swiss':
+            points.append(winner.pk)
+        else:
+            eliminated.append(loser.pk)
+    if not closed:
+        return
+    # One UPDATE per outcome, not one per match
+    for side, pks in won_by.items():
+        if pks:
+            TournamentMatch.objects.filter(pk__in=pks).update(winner=F(side), status='done')
+    if undecided:
+        TournamentMatch.objects.filter(pk__in=undecided).update(status='done')
+    if points:
+        TournamentEntry.objects.filter(pk__in=points).update(points=F('points') + 1)
+    if eliminated:
+        TournamentEntry.objects.filter(pk__in=eliminated).update(eliminated=True)
+    for tournament_id, count in closed.items():
+        Tournament.objects.filter(pk=tournament_id).update(open_matches=F('open_matches') - count)
+    over = list(Tournament.objects.filter(pk__in=list(closed), open_matches__lte=0).values_list('pk', flat=True))
+    if over:
+        transaction.on_commit(lambda: [advance(tournament_id) for tournament_id in over], using=gamestate_db())
+
+
+def current_game(tournament_id, player_id):
+    """Where a player stands: the tournament's status and round, and their game in it if they have one"""
+    tournament = Tournament.objects.filter(pk=tournament_id).values('status', 'current_round', 'winner_name').first()
+    if tournament is None:
+        return None
+    match = TournamentMatch.objects.filter(
+        Q(player1__player_id=player_id) | Q(player2__player_id=player_id),
+        tournament_id=tournament_id, round=tournament['current_round'],
+    ).values('game_id', 'status').first()
+    return {
+        'status': tournament['status'],
+        'round': tournament['current_round'],
+        'winner': tournament['winner_name'],
+        'game_id': match['game_id'] if match else None,
+        'bye': bool(match) and match['game_id'] is None,
+        'match_over': bool(match) and match['status'] == 'done',
+    }
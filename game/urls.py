@@ -8,6 +8,8 @@ urlpatterns = [
     path('play/', views.game_view, name='play'),
     path('pvp/', views.pvp_view, name='pvp'),
     path('api/play/', views.play_round, name='play_round'),
+    path('api/play/batch/', views.play_batch, name='play_batch'),
+    path('api/replay/', views.replay_session, name='replay_session'),
     path('api/reset/', views.reset_game, name='reset_game'),
     path('api/elements/', views.get_elements, name='get_elements'),
     path('api/leaderboard/', views.get_leaderboard_data, name='get_leaderboard_data'),
@@ -18,6 +20,15 @@ urlpatterns = [
     path('api/game/choice/', views.make_choice, name='make_choice'),
     path('api/game/next/', views.next_round, name='next_round'),
     path('api/game/forfeit/', views.forfeit_game, name='forfeit_game'),
+    path('api/game/spectate/', views.spectate_game, name='spectate_game'),
+    path('spectate/<str:game_id>/', views.spectate_view, name='spectate'),
+    path('api/tournament/<int:tournament_id>/game/', views.tournament_game, name='tournament_game'),
+    path('api/analytics/elements/', views.get_element_stats, name='get_element_stats'),
+    path('api/export/<str:dataset>/', views.export_data, name='export_data'),
+    path('api/profiling/', views.profiling_status, name='profiling_status'),
+    path('api/profiling/stacks/', views.profiling_stacks, name='profiling_stacks'),
+    path('api/profiling/allocations/', views.profiling_allocations, name='profiling_allocations'),
     path('rules/', views.rules, name='rules'),
     path('leaderboard/', views.leaderboard, name='leaderboard'),
+    path('analytics/', views.analytics_dashboard, name='analytics'),
 ]
@@ -1,11 +1,20 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import F
-from django.db import transaction
+from django.views.decorators.cache import cache_control, cache_page
+from django.views.decorators.http import condition
+from django.core.cache import cache
+from django.conf import settings
+from django.db.models import Sum
+from django.db import IntegrityError, transaction
+from django.urls import reverse
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.http import urlencode
+import hashlib
 import json
+import math
+import os
 import uuid
 import random
 
@@ -14,43 +23,36 @@ from .game_logic import (
     get_elements_for_mode, 
     determine_winner, 
     get_win_reason,
-    GameAI
+    GameAI,
+    MODES,
+    MoveProfile,
+    element_catalog,
+    replay,
 )
 from .models import Player, GameSession, MatchmakingQueue, OnlineGame
+from . import (
+    analytics, deadlines, export, fragments, matchmaking, profiles, profiling, rankings, retention, settlement,
+    tournaments,
+)
+from .routers import gamestate_db, replica_configured, reads_pinned, replica_reads
+from .broadcast import hub
+from .players import make_player_token, record_result_for, record_results_for, resolve_player_id
 
 # Store AI instances per session
 ai_instances = {}
 
 
-def update_player_stats_for_pvp(player_name, result):
-    """Update or create player stats for PvP games"""
-    if not player_name or player_name.strip() == '':
-        return
-    
-    player, created = Player.objects.get_or_create(name=player_name)
-    
-    player.total_games += 1
-    
-    if result == 'win':
-        player.total_wins += 1
-        player.current_streak += 1
-        if player.current_streak > player.best_streak:
-            player.best_streak = player.current_streak
-    elif result == 'lose':
-        player.total_losses += 1
-        player.current_streak = 0
-    else:
-        player.total_draws += 1
-    
-    player.calculate_score()
-    player.save()
-
-
+@replica_reads
 def home(request):
     """Render the home page"""
-    # Get top 5 players for display
+    # Top 5 players; lazy, only queried when the cached fragment is missing
     top_players = Player.objects.all()[:5]
-    return render(request, 'game/home.html', {'top_players': top_players})
+    rankings.score_version()  # Drops the cached fragment if results are due for a new version
+    return render(request, 'game/home.html', {
+        'top_players': top_players,
+        'fragment_timeout': fragments.TIMEOUT,
+        'live_games': hub.featured_games(),
+    })
 
 
 def game_view(request):
@@ -60,12 +62,13 @@ def game_view(request):
     player_name = request.GET.get('player', '')
     ai_name = request.GET.get('ai_name', '')  # Custom AI name from auto-match
     auto_match = request.GET.get('auto_match', '')  # Flag for auto-matched AI game
+    session_id = request.GET.get('session_id', '')  # Set by the matchmaking AI fallback
     
-    elements = get_elements_for_mode(mode)
-    element_data = {key: ELEMENTS[key] for key in elements}
+    element_data, elements_json = element_catalog(mode)
     
-    # Get top players for sidebar
+    # Top players for the sidebar; lazy, only queried when the cached fragment is missing
     top_players = Player.objects.all()[:10]
+    rankings.score_version()  # Drops the cached fragment if results are due for a new version
     
     context = {
         'difficulty': difficulty,
@@ -73,9 +76,11 @@ def game_view(request):
         'player_name': player_name,
         'ai_name': ai_name,
         'auto_match': auto_match,
+        'session_id': session_id,
         'elements': element_data,
-        'elements_json': json.dumps(element_data),
+        'elements_json': elements_json,
         'top_players': top_players,
+        'fragment_timeout': fragments.TIMEOUT,
     }
     return render(request, 'game/game.html', context)
 
@@ -88,13 +93,14 @@ def pvp_view(request):
     player_id = str(uuid.uuid4())
     
     # Include ALL elements - actual mode will be randomly selected at match time
-    all_elements = ELEMENTS
+    all_elements, elements_json = element_catalog('full')
     
     context = {
         'player_name': player_name,
         'player_id': player_id,
         'elements': all_elements,
-        'elements_json': json.dumps(all_elements),
+        'elements_json': elements_json,
+        'round_time_limit': settings.ROUND_TIME_LIMIT,
     }
     return render(request, 'game/pvp.html', context)
 
@@ -111,9 +117,11 @@ def join_matchmaking(request):
         player_name = data.get('player_name', 'Player')
         mode = data.get('mode', 'classic')
         
-        # Clean up old/expired entries (older than 60 seconds)
-        expiry_time = timezone.now() - timedelta(seconds=60)
-        MatchmakingQueue.objects.filter(created_at__lt=expiry_time).delete()
+        now = timezone.now()
+        
+        # Purge entries that stopped polling, once per sweep interval rather than every poll
+        if matchmaking.sweep_due(now):
+            next(retention.purge_queue(now=now), None)
         
         # Check if player is already in queue
         existing = MatchmakingQueue.objects.filter(player_id=player_id).first()
@@ -123,29 +131,36 @@ def join_matchmaking(request):
                     'status': 'matched',
                     'game_id': existing.matched_game_id
                 })
-            # Update timestamp
-            existing.created_at = timezone.now()
-            existing.save()
-        else:
-            # Add to queue
-            MatchmakingQueue.objects.create(
-                player_id=player_id,
-                player_name=player_name,
-                mode=mode,
-                status='searching'
-            )
+            if matchmaking.ai_fallback_due(existing, now):
+                # Nobody came: leave the queue (unless matched meanwhile) and play an AI instead
+                if MatchmakingQueue.objects.filter(pk=existing.pk, status='searching').delete()[0]:
+                    opponent = matchmaking.ai_opponents.assign()
+                    return JsonResponse({
+                        'status': 'ai_match',
+                        **opponent,
+                        'redirect': f"{reverse('game:play')}?{urlencode({**opponent, 'player': player_name, 'auto_match': 1})}",
+                    })
+                existing = MatchmakingQueue.objects.filter(player_id=player_id).first()
+                if existing and existing.matched_game_id:
+                    return JsonResponse({'status': 'matched', 'game_id': existing.matched_game_id})
+            if existing and matchmaking.keepalive_due(existing, now):
+                MatchmakingQueue.objects.filter(pk=existing.pk).update(last_seen=now)
+            ticket = existing.ticket if existing else None
+        if not existing:
+            # Add to queue; the entry's ticket is its row id
+            ticket = matchmaking.join_queue(player_id, player_name, mode, now).ticket
         
         # Try to find a match (any player searching, regardless of mode)
         potential_match = MatchmakingQueue.objects.filter(
             status='searching'
-        ).exclude(player_id=player_id).order_by('created_at').first()
+        ).exclude(player_id=player_id).order_by('ticket').first()
         
         if potential_match:
             # Create a game with a RANDOM mode
             game_id = str(uuid.uuid4())
             random_mode = random.choice(['classic', 'extended', 'full'])
             
-            OnlineGame.objects.create(
+            game = OnlineGame.objects.create(
                 game_id=game_id,
                 mode=random_mode,
                 player1_id=potential_match.player_id,
@@ -157,31 +172,22 @@ def join_matchmaking(request):
             )
             
             # Update both queue entries
-            potential_match.status = 'matched'
-            potential_match.matched_game_id = game_id
-            potential_match.save()
+            MatchmakingQueue.objects.filter(
+                player_id__in=[potential_match.player_id, player_id]
+            ).update(status='matched', matched_game_id=game_id)
             
-            MatchmakingQueue.objects.filter(player_id=player_id).update(
-                status='matched',
-                matched_game_id=game_id
-            )
+            deadlines.scheduler.watch(game)
             
             return JsonResponse({
                 'status': 'matched',
                 'game_id': game_id
             })
         
-        # Still searching
-        queue_position = MatchmakingQueue.objects.filter(
-            mode=mode,
-            status='searching',
-            created_at__lt=timezone.now()
-        ).count()
-        
+        # Still searching - position from the oldest live ticket, online count cached per process
         return JsonResponse({
             'status': 'searching',
-            'queue_position': queue_position,
-            'players_online': MatchmakingQueue.objects.filter(status='searching').count()
+            'queue_position': matchmaking.queue_position(ticket),
+            'players_online': matchmaking.players_online()
         })
         
     except Exception as e:
@@ -219,34 +225,44 @@ def get_game_state(request):
         game_id = data.get('game_id')
         player_id = data.get('player_id')
         
-        game = OnlineGame.objects.filter(game_id=game_id).first()
-        if not game:
-            return JsonResponse({'error': 'Game not found'}, status=404)
-        
-        # Determine which player this is
-        is_player1 = game.player1_id == player_id
-        
-        # Update last seen time for this player
         now = timezone.now()
-        if is_player1:
-            game.player1_last_seen = now
+        disconnected = False
+        with transaction.atomic(using=gamestate_db()):
+            game = OnlineGame.objects.select_for_update().filter(game_id=game_id).first()
+            if not game:
+                return JsonResponse({'error': 'Game not found'}, status=404)
+            
+            # Determine which player this is
+            is_player1 = game.player1_id == player_id
+            
+            # Update last seen time for this player
+            updates = {'player1_last_seen' if is_player1 else 'player2_last_seen': now, 'updated_at': now}
+            
+            # Check if opponent has disconnected (only if game is still active)
+            if game.status in ['playing', 'round_complete']:
+                opponent_last_seen = game.player2_last_seen if is_player1 else game.player1_last_seen
+                if opponent_last_seen:
+                    time_since_seen = (now - opponent_last_seen).total_seconds()
+                    if time_since_seen > DISCONNECT_TIMEOUT:
+                        # Opponent disconnected - they forfeit
+                        opponent_name = game.player2_name if is_player1 else game.player1_name
+                        my_name = game.player1_name if is_player1 else game.player2_name
+                        updates.update(status='forfeit', winner=my_name, forfeit_by=opponent_name)
+                        disconnected = True
+            
+            # Only the fields this poll changed, so concurrent moves aren't overwritten
+            OnlineGame.objects.filter(pk=game.pk).update(**updates)
+            for field, value in updates.items():
+                setattr(game, field, value)
+            if disconnected:
+                winner_id = game.player1_id if is_player1 else game.player2_id
+                settlement.enqueue(game.game_id, game.winner, game.forfeit_by, winner_id)
+        
+        hub.publish(game)
+        if disconnected:
+            deadlines.scheduler.cancel(game.game_id)
         else:
-            game.player2_last_seen = now
-        
-        # Check if opponent has disconnected (only if game is still active)
-        if game.status in ['playing', 'round_complete']:
-            opponent_last_seen = game.player2_last_seen if is_player1 else game.player1_last_seen
-            if opponent_last_seen:
-                time_since_seen = (now - opponent_last_seen).total_seconds()
-                if time_since_seen > DISCONNECT_TIMEOUT:
-                    # Opponent disconnected - they forfeit
-                    opponent_name = game.player2_name if is_player1 else game.player1_name
-                    my_name = game.player1_name if is_player1 else game.player2_name
-                    game.status = 'forfeit'
-                    game.winner = my_name
-                    game.forfeit_by = opponent_name
-        
-        game.save()
+            deadlines.scheduler.watch(game)
         
         response = {
             'game_id': game.game_id,
@@ -294,7 +310,7 @@ def make_choice(request):
         choice = data.get('choice', '').lower()
         
         # Use atomic transaction with select_for_update to prevent race conditions
-        with transaction.atomic():
+        with transaction.atomic(using=gamestate_db()):
             game = OnlineGame.objects.select_for_update().filter(game_id=game_id).first()
             if not game:
                 return JsonResponse({'error': 'Game not found'}, status=404)
@@ -302,6 +318,11 @@ def make_choice(request):
             if game.status not in ['playing', 'round_complete']:
                 return JsonResponse({'error': 'Game is not active'}, status=400)
             
+            # The server's round clock decides; the scheduler ends the game shortly
+            if (game.status == 'playing' and game.round_start_time and
+                    deadlines.round_deadline(game.round_start_time) <= timezone.now()):
+                return JsonResponse({'error': 'Round timed out'}, status=400)
+            
             # Validate choice
             available_elements = get_elements_for_mode(game.mode)
             if choice not in available_elements:
@@ -341,6 +362,8 @@ def make_choice(request):
                     round_winner = None
                     reason = "It's a draw!"
                 
+                analytics.record_round(game.mode, 'pvp', game.player1_choice, game.player2_choice, result)
+                
                 # Store round result
                 game.round_result = json.dumps({
                     'player1_choice': game.player1_choice,
@@ -352,23 +375,24 @@ def make_choice(request):
                 })
                 
                 # Check if game is over (first to 3)
+                loser = winner_id = None
                 if game.player1_score >= 3:
                     game.status = 'finished'
-                    game.winner = game.player1_name
-                    # Update player stats
-                    update_player_stats_for_pvp(game.player1_name, 'win')
-                    update_player_stats_for_pvp(game.player2_name, 'lose')
+                    game.winner, loser, winner_id = game.player1_name, game.player2_name, game.player1_id
                 elif game.player2_score >= 3:
                     game.status = 'finished'
-                    game.winner = game.player2_name
-                    # Update player stats
-                    update_player_stats_for_pvp(game.player2_name, 'win')
-                    update_player_stats_for_pvp(game.player1_name, 'lose')
+                    game.winner, loser, winner_id = game.player2_name, game.player1_name, game.player2_id
                 else:
                     game.status = 'round_complete'
                 
                 game.save()
+                if loser is not None:
+                    # Player stats are applied after commit, off the game row's lock
+                    settlement.enqueue(game.game_id, game.winner, loser, winner_id)
         
+        hub.publish(game)
+        if game.status != 'playing':
+            deadlines.scheduler.cancel(game.game_id)
         return JsonResponse({
             'status': 'success',
             'choice_made': True,
@@ -390,7 +414,7 @@ def next_round(request):
         game_id = data.get('game_id')
         player_id = data.get('player_id')
         
-        with transaction.atomic():
+        with transaction.atomic(using=gamestate_db()):
             game = OnlineGame.objects.select_for_update().filter(game_id=game_id).first()
             if not game:
                 return JsonResponse({'error': 'Game not found'}, status=404)
@@ -418,6 +442,8 @@ def next_round(request):
                 game.round_start_time = timezone.now()  # Reset timer for new round
                 game.save()
         
+        hub.publish(game)
+        deadlines.scheduler.watch(game)
         return JsonResponse({
             'status': 'success',
             'both_ready': game.player1_ready and game.player2_ready
@@ -429,7 +455,7 @@ def next_round(request):
 
 @csrf_exempt
 def forfeit_game(request):
-    """Handle player forfeiting due to timeout"""
+    """Concede an online game: the requesting player forfeits (round timeouts are enforced server-side)"""
     if request.method != 'POST':
         return JsonResponse({'error': 'POST required'}, status=405)
     
@@ -437,32 +463,34 @@ def forfeit_game(request):
         data = json.loads(request.body)
         game_id = data.get('game_id')
         player_id = data.get('player_id')
-        forfeit_player_id = data.get('forfeit_player_id')  # Who timed out
-        
-        game = OnlineGame.objects.filter(game_id=game_id).first()
-        if not game:
-            return JsonResponse({'error': 'Game not found'}, status=404)
-        
-        if game.status in ['finished', 'forfeit']:
-            return JsonResponse({'status': 'already_ended'})
         
-        # Determine who forfeited
-        if forfeit_player_id == game.player1_id:
-            forfeit_name = game.player1_name
-            winner_name = game.player2_name
-        else:
-            forfeit_name = game.player2_name
-            winner_name = game.player1_name
-        
-        # Update game status
-        game.status = 'forfeit'
-        game.winner = winner_name
-        game.forfeit_by = forfeit_name
-        game.save()
+        with transaction.atomic(using=gamestate_db()):
+            game = OnlineGame.objects.select_for_update().filter(game_id=game_id).first()
+            if not game:
+                return JsonResponse({'error': 'Game not found'}, status=404)
+            
+            if game.status in ['finished', 'forfeit']:
+                return JsonResponse({'status': 'already_ended'})
+            
+            # Only the requesting player can forfeit
+            if player_id == game.player1_id:
+                forfeit_name = game.player1_name
+                winner_name, winner_id = game.player2_name, game.player2_id
+            elif player_id == game.player2_id:
+                forfeit_name = game.player2_name
+                winner_name, winner_id = game.player1_name, game.player1_id
+            else:
+                return JsonResponse({'error': 'Not a player in this game'}, status=403)
+            
+            # Update game status; player stats are settled after commit
+            game.status = 'forfeit'
+            game.winner = winner_name
+            game.forfeit_by = forfeit_name
+            game.save()
+            settlement.enqueue(game.game_id, winner_name, forfeit_name, winner_id)
         
-        # Update player stats for forfeit
-        update_player_stats_for_pvp(winner_name, 'win')
-        update_player_stats_for_pvp(forfeit_name, 'lose')
+        hub.publish(game)
+        deadlines.scheduler.cancel(game.game_id)
         
         return JsonResponse({
             'status': 'success',
@@ -474,6 +502,189 @@ def forfeit_game(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+def spectate_game(request):
+    """
+    Spectator snapshot of an online game
+    
+    Every spectator of a game in this worker shares one cached, pre-serialized
+    snapshot. Clients can send If-None-Match to get a 304 when nothing changed,
+    or ?since=<version>&wait=<seconds> to long-poll for the next change (up to
+    SPECTATE_MAX_WAIT, and only while the worker has a waiter slot free).
+    """
+    game_id = request.GET.get('game_id', '')
+    try:
+        since = int(request.GET.get('since', -1))
+        wait = float(request.GET.get('wait', 0))
+        if not math.isfinite(wait):
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': 'Invalid since/wait'}, status=400)
+    wait = min(max(wait, 0), settings.SPECTATE_MAX_WAIT)
+    
+    if wait and since >= 0:
+        snapshot = hub.wait_for_change(game_id, since, wait, settings.SPECTATE_MAX_WAITERS)
+    else:
+        snapshot = hub.get(game_id)
+    if snapshot is None:
+        return JsonResponse({'error': 'Game not found'}, status=404)
+    
+    version, body = snapshot
+    etag = f'"{game_id}-{version}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+
+def spectate_view(request, game_id):
+    """Render the spectator page for an online game"""
+    return render(request, 'game/spectate.html', {'game_id': game_id})
+
+
+def tournament_game(request, tournament_id):
+    """A tournament player's current round and game (?player_id=...)"""
+    state = tournaments.current_game(tournament_id, request.GET.get('player_id', ''))
+    if state is None:
+        return JsonResponse({'error': 'Tournament not found'}, status=404)
+    return JsonResponse(state)
+
+
+def record_session(ai, mode, player_id=None):
+    """Store the seed and warm-start profile of an AI's RNG stream for replay; returns the GameSession id"""
+    fields = {
+        'difficulty': ai.difficulty,
+        'mode': mode,
+        'seed': str(ai.seed),
+        'profile': ai.profile.to_json() if ai.profile else None,
+    }
+    try:
+        with transaction.atomic():
+            return GameSession.objects.create(player_id=player_id, **fields).pk
+    except IntegrityError:
+        # The player behind a stale token was deleted; the replay data is still worth keeping
+        return GameSession.objects.create(**fields).pk
+
+
+def get_session_ai(session_id, difficulty, mode, player_id=None, seed=None):
+    """Get or create the AI instance for a session, warm-started from the player's profile"""
+    ai_key = f"{session_id}_{difficulty}"
+    if ai_key not in ai_instances:
+        profile = profiles.load_profile(player_id) if player_id else None
+        # Sessions started by the matchmaking AI fallback take a pooled instance
+        ai = matchmaking.ai_opponents.claim(session_id, difficulty, seed)
+        if ai is None:
+            ai = GameAI(difficulty, profile=profile, seed=seed)
+        else:
+            ai.load_profile(profile)
+        ai.replay_id = record_session(ai, mode, player_id)
+        ai_instances[ai_key] = ai
+    return ai_instances[ai_key]
+
+
+MAX_SEED = 2 ** 64 - 1
+
+
+def parse_seed(value):
+    """Optional client-supplied RNG seed (non-negative 64-bit int) or None"""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= MAX_SEED:
+        raise ValueError('seed must be a non-negative 64-bit integer')
+    return value
+
+
+def parse_counts(value, name):
+    """A {element: count} object from a client-supplied profile; ValueError if malformed"""
+    if not isinstance(value, dict):
+        raise ValueError(f'{name} must be an object of element -> count')
+    for element, count in value.items():
+        if element not in ELEMENTS:
+            raise ValueError(f'Unknown element in {name}: {element}')
+        if isinstance(count, bool) or not isinstance(count, int) or count < 0:
+            raise ValueError(f'Counts in {name} must be non-negative integers')
+    return value
+
+
+def parse_profile(value):
+    """Optional client-supplied warm-start profile ({first_moves, transitions}) as a MoveProfile, or None"""
+    if not value:
+        return None
+    if not isinstance(value, dict):
+        raise ValueError('profile must be an object with first_moves and transitions')
+    first_moves = parse_counts(value.get('first_moves') or {}, 'first_moves')
+    transitions = value.get('transitions') or {}
+    if not isinstance(transitions, dict):
+        raise ValueError('transitions must be an object of element -> {element: count}')
+    for previous, nexts in transitions.items():
+        if previous not in ELEMENTS:
+            raise ValueError(f'Unknown element in transitions: {previous}')
+        parse_counts(nexts, f'transitions.{previous}')
+    return MoveProfile(first_moves, transitions)
+
+
+DIFFICULTIES = tuple(key for key, _ in GameSession.DIFFICULTY_CHOICES)
+
+
+def parse_mode_difficulty(data):
+    """The request's (mode, difficulty), which end up in analytics rollup keys; ValueError if unknown"""
+    mode = data.get('mode', 'classic')
+    difficulty = data.get('difficulty', 'normal')
+    if mode not in MODES:
+        raise ValueError(f'mode must be one of {", ".join(MODES)}')
+    if difficulty not in DIFFICULTIES:
+        raise ValueError(f'difficulty must be one of {", ".join(DIFFICULTIES)}')
+    return mode, difficulty
+
+
+def last_move(ai):
+    """The player's previous move this session (None at session start)"""
+    return ai.player_history[-1] if ai.player_history else None
+
+
+def resolve_round(ai, player_choice, available_elements, mode, difficulty):
+    """Play one move against the AI and return the round payload"""
+    ai_choice = ai.get_choice(available_elements)
+    result = determine_winner(player_choice, ai_choice)
+    
+    if result == 'win':
+        reason = get_win_reason(player_choice, ai_choice)
+    elif result == 'lose':
+        reason = get_win_reason(ai_choice, player_choice)
+    else:
+        reason = "It's a draw!"
+    
+    # Add to AI history
+    ai.add_to_history(player_choice)
+    analytics.record_round(mode, difficulty, player_choice, ai_choice, result)
+    
+    return {
+        'player_choice': player_choice,
+        'player_emoji': ELEMENTS[player_choice]['emoji'],
+        'ai_choice': ai_choice,
+        'ai_emoji': ELEMENTS[ai_choice]['emoji'],
+        'result': result,
+        'reason': reason,
+    }
+
+
+def get_player_data(player_id):
+    """Player card payload (stats, live rank and token) in one query"""
+    player = rankings.with_live_rank(Player.objects.filter(pk=player_id)).get()
+    return {
+        'name': player.name,
+        'score': player.score,
+        'total_wins': player.total_wins,
+        'total_games': player.total_games,
+        'win_rate': player.win_rate(),
+        'current_streak': player.current_streak,
+        'best_streak': player.best_streak,
+        'rank': player.live_rank,
+        'player_token': make_player_token(player.pk, player.name),
+    }
+
+
 @csrf_exempt
 def play_round(request):
     """Handle a round of the game"""
@@ -483,67 +694,117 @@ def play_round(request):
     try:
         data = json.loads(request.body)
         player_choice = data.get('choice', '').lower()
-        difficulty = data.get('difficulty', 'normal')
-        mode = data.get('mode', 'classic')
         session_id = data.get('session_id', 'default')
         player_name = data.get('player_name', '').strip()
         
+        try:
+            mode, difficulty = parse_mode_difficulty(data)
+            seed = parse_seed(data.get('seed'))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
         # Validate choice
         available_elements = get_elements_for_mode(mode)
         if player_choice not in available_elements:
             return JsonResponse({'error': 'Invalid choice'}, status=400)
         
-        # Get or create AI instance for this session
-        ai_key = f"{session_id}_{difficulty}"
-        if ai_key not in ai_instances:
-            ai_instances[ai_key] = GameAI(difficulty)
+        player_id = None
+        if player_name:
+            player_id = resolve_player_id(player_name, data.get('player_token'))
         
-        ai = ai_instances[ai_key]
+        ai = get_session_ai(session_id, difficulty, mode, player_id, seed)
+        previous = last_move(ai)
+        response = resolve_round(ai, player_choice, available_elements, mode, difficulty)
         
-        # Get AI choice
-        ai_choice = ai.get_choice(available_elements)
+        # Update player stats if player name provided
+        player_data = None
+        if player_name:
+            player_id = record_result_for(
+                player_name, response['result'], difficulty, token=data.get('player_token')
+            )
+            profiles.record_moves(player_id, [(previous, player_choice)])
+            player_data = get_player_data(player_id)
         
-        # Determine winner
-        result = determine_winner(player_choice, ai_choice)
+        response['player_data'] = player_data
+        response['seed'] = ai.seed
+        response['replay_id'] = ai.replay_id
+        return JsonResponse(response)
         
-        # Get win reason
-        if result == 'win':
-            reason = get_win_reason(player_choice, ai_choice)
-        elif result == 'lose':
-            reason = get_win_reason(ai_choice, player_choice)
-        else:
-            reason = "It's a draw!"
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+MAX_BATCH_MOVES = 1000
+
+
+@csrf_exempt
+def play_batch(request):
+    """
+    Play a sequence of moves for one session in a single request
+    
+    Moves go through the session's GameAI in order. Player stats are applied
+    in one atomic update and the rank is computed once for the whole batch.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+        moves = data.get('moves')
+        session_id = data.get('session_id', 'default')
+        player_name = data.get('player_name', '').strip()
         
-        # Add to AI history
-        ai.add_to_history(player_choice)
+        if not isinstance(moves, list) or not moves:
+            return JsonResponse({'error': 'moves must be a non-empty list'}, status=400)
+        if len(moves) > MAX_BATCH_MOVES:
+            return JsonResponse({'error': f'At most {MAX_BATCH_MOVES} moves per batch'}, status=400)
+        
+        try:
+            mode, difficulty = parse_mode_difficulty(data)
+            seed = parse_seed(data.get('seed'))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        # Validate every move before playing any of them
+        available_elements = get_elements_for_mode(mode)
+        moves = [str(move).lower() for move in moves]
+        for idx, move in enumerate(moves):
+            if move not in available_elements:
+                return JsonResponse({'error': f'Invalid choice at index {idx}'}, status=400)
+        
+        player_id = None
+        if player_name:
+            player_id = resolve_player_id(player_name, data.get('player_token'))
+        
+        ai = get_session_ai(session_id, difficulty, mode, player_id, seed)
+        observations = []
+        rounds = []
+        for move in moves:
+            observations.append((last_move(ai), move))
+            rounds.append(resolve_round(ai, move, available_elements, mode, difficulty))
+        results = [r['result'] for r in rounds]
         
-        # Update player stats if player name provided
         player_data = None
         if player_name:
-            player, created = Player.objects.get_or_create(name=player_name)
-            player.update_stats(result, difficulty)
-            player_data = {
-                'name': player.name,
-                'score': player.score,
-                'total_wins': player.total_wins,
-                'total_games': player.total_games,
-                'win_rate': player.win_rate(),
-                'current_streak': player.current_streak,
-                'best_streak': player.best_streak,
-                'rank': get_player_rank(player)
-            }
+            player_id = record_results_for(
+                player_name, results, difficulty, token=data.get('player_token')
+            )
+            profiles.record_moves(player_id, observations)
+            player_data = get_player_data(player_id)
         
-        response = {
-            'player_choice': player_choice,
-            'player_emoji': ELEMENTS[player_choice]['emoji'],
-            'ai_choice': ai_choice,
-            'ai_emoji': ELEMENTS[ai_choice]['emoji'],
-            'result': result,
-            'reason': reason,
+        return JsonResponse({
+            'rounds': rounds,
+            'summary': {
+                'wins': results.count('win'),
+                'losses': results.count('lose'),
+                'draws': results.count('draw'),
+            },
             'player_data': player_data,
-        }
-        
-        return JsonResponse(response)
+            'seed': ai.seed,
+            'replay_id': ai.replay_id,
+        })
         
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
@@ -551,10 +812,69 @@ def play_round(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
-def get_player_rank(player):
-    """Get player's current rank"""
-    rank = Player.objects.filter(score__gt=player.score).count() + 1
-    return rank
+MAX_REPLAY_MOVES = 10000
+
+
+@csrf_exempt
+def replay_session(request):
+    """
+    Rebuild a session's AI decisions from its seed and the player's moves
+    
+    Send the replay_id returned by play/batch/reset: the session's recorded
+    seed, difficulty, mode and warm-start profile are used. Without one, seed
+    (and difficulty, mode and, for a warm-started session, profile) must be
+    given. Nothing is recorded: no stats, analytics or profile updates.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+        moves = data.get('moves')
+        replay_id = data.get('replay_id')
+        
+        try:
+            if replay_id is not None:
+                if isinstance(replay_id, bool) or not isinstance(replay_id, int):
+                    raise ValueError('replay_id must be an integer')
+                recorded = GameSession.objects.filter(pk=replay_id).values(
+                    'difficulty', 'mode', 'seed', 'profile').first()
+                if not recorded or not recorded['seed']:
+                    return JsonResponse({'error': 'Session not found'}, status=404)
+                difficulty, mode, seed = recorded['difficulty'], recorded['mode'], int(recorded['seed'])
+                profile = MoveProfile(**recorded['profile']) if recorded['profile'] else None
+            else:
+                mode, difficulty = parse_mode_difficulty(data)
+                seed = parse_seed(data.get('seed'))
+                if seed is None:
+                    raise ValueError('seed or replay_id is required')
+                profile = parse_profile(data.get('profile'))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if not isinstance(moves, list):
+            return JsonResponse({'error': 'moves must be a list'}, status=400)
+        if len(moves) > MAX_REPLAY_MOVES:
+            return JsonResponse({'error': f'At most {MAX_REPLAY_MOVES} moves per replay'}, status=400)
+        
+        available_elements = get_elements_for_mode(mode)
+        moves = [str(move).lower() for move in moves]
+        for idx, move in enumerate(moves):
+            if move not in available_elements:
+                return JsonResponse({'error': f'Invalid choice at index {idx}'}, status=400)
+        
+        rounds = replay(difficulty, mode, seed, moves, profile)
+        return JsonResponse({
+            'seed': seed,
+            'rounds': [
+                {'player_choice': move, 'ai_choice': ai_choice, 'result': result}
+                for move, ai_choice, result in rounds
+            ],
+        })
+        
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
 
 
 @csrf_exempt
@@ -568,9 +888,19 @@ def reset_game(request):
         session_id = data.get('session_id', 'default')
         difficulty = data.get('difficulty', 'normal')
         
+        try:
+            seed = parse_seed(data.get('seed'))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
         ai_key = f"{session_id}_{difficulty}"
         if ai_key in ai_instances:
-            ai_instances[ai_key].reset()
+            ai = ai_instances[ai_key]
+            # A new RNG stream gets its own replay record, carrying over the session's mode and player
+            previous = GameSession.objects.filter(pk=ai.replay_id).values('mode', 'player_id').first() or {}
+            ai.reset(seed)
+            ai.replay_id = record_session(ai, previous.get('mode', 'classic'), previous.get('player_id'))
+            return JsonResponse({'status': 'success', 'seed': ai.seed, 'replay_id': ai.replay_id})
         
         return JsonResponse({'status': 'success'})
         
@@ -581,23 +911,26 @@ def reset_game(request):
 def get_elements(request):
     """Return all elements data"""
     mode = request.GET.get('mode', 'classic')
-    elements = get_elements_for_mode(mode)
-    element_data = {key: ELEMENTS[key] for key in elements}
-    return JsonResponse(element_data)
+    _, elements_json = element_catalog(mode)
+    return HttpResponse(elements_json, content_type='application/json')
 
 
+@cache_page(settings.STATIC_PAGE_MAX_AGE, cache=fragments.CACHE_ALIAS)
+@cache_control(public=True)
+@replica_reads
 def rules(request):
-    """Render the rules page"""
+    """Render the rules page (static between deploys: cached here and, for STATIC_PAGE_MAX_AGE, by browsers)"""
     return render(request, 'game/rules.html', {'elements': ELEMENTS})
 
 
+@replica_reads
 def leaderboard(request):
     """Render the leaderboard page"""
     players = Player.objects.all()[:100]
     
     # Get statistics
     total_players = Player.objects.count()
-    total_games = sum(p.total_games for p in Player.objects.all())
+    total_games = Player.objects.aggregate(total=Sum('total_games'))['total'] or 0
     
     context = {
         'players': players,
@@ -607,21 +940,217 @@ def leaderboard(request):
     return render(request, 'game/leaderboard.html', context)
 
 
+def _leaderboard_etag(request):
+    """ETag for a leaderboard page: the score version plus the query"""
+    query = hashlib.md5(request.GET.urlencode().encode()).hexdigest()[:12]
+    return f'lb-{rankings.score_version()}-{query}'
+
+
+@replica_reads
+@condition(etag_func=_leaderboard_etag)
 def get_leaderboard_data(request):
-    """API endpoint for leaderboard data"""
-    limit = int(request.GET.get('limit', 10))
-    players = Player.objects.all()[:limit]
-    
-    data = [{
-        'rank': idx + 1,
-        'name': p.name,
-        'score': p.score,
-        'wins': p.total_wins,
-        'losses': p.total_losses,
-        'draws': p.total_draws,
-        'games': p.total_games,
-        'win_rate': p.win_rate(),
-        'best_streak': p.best_streak,
-    } for idx, p in enumerate(players)]
-    
-    return JsonResponse({'leaderboard': data})
+    """
+    API endpoint for leaderboard data
+    
+    Query params:
+    - window: all (default), daily, weekly or season
+    - limit: page size (capped at rankings.MAX_PAGE_SIZE)
+    - cursor: next_cursor from a previous page
+    - before: prev_cursor from a previous page
+    - around: player name to centre the page on
+    """
+    cache_key = f'leaderboard:{rankings.score_version()}:{request.GET.urlencode()}'
+    # A client pinned to the primary after its own write must not get a page built from the replica
+    pinned = replica_configured() and reads_pinned()
+    payload = None if pinned else cache.get(cache_key)
+    if payload is not None:
+        return JsonResponse(payload)
+    
+    try:
+        window = request.GET.get('window', 'all')
+        if window != 'all' and window not in rankings.WINDOWS:
+            raise ValueError(f'Unknown window: {window}')
+        board = rankings.board(window)
+        limit = rankings.clamp_page_size(request.GET.get('limit'))
+        cursor = request.GET.get('cursor')
+        before = request.GET.get('before')
+        around = request.GET.get('around', '').strip()
+        
+        if around:
+            if window == 'all':
+                player = board.filter(name=around).first()
+            else:
+                player = board.filter(player__name=around).first()
+            if not player:
+                return JsonResponse({'error': 'Player not found'}, status=404)
+            players, first_position = rankings.page_around(player, limit, board)
+        elif before:
+            players, first_position = rankings.page_before(before, limit, board)
+        else:
+            players, first_position = rankings.page_after(cursor, limit, board)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    payload = rankings.serialize_page(players, first_position, limit)
+    payload['window'] = window
+    cache.set(cache_key, payload, rankings.PAGE_CACHE_TIMEOUT)
+    return JsonResponse(payload)
+
+
+ANALYTICS_MAX_DAYS = 365
+
+
+def _analytics_days(request):
+    """Parse the ?days= window for analytics views"""
+    days = int(request.GET.get('days', 7))
+    return min(max(days, 1), ANALYTICS_MAX_DAYS)
+
+
+def get_element_stats(request):
+    """API endpoint for element usage rollups"""
+    try:
+        days = _analytics_days(request)
+    except ValueError:
+        return JsonResponse({'error': 'days must be an integer'}, status=400)
+    
+    summary = analytics.element_usage(
+        days,
+        mode=request.GET.get('mode') or None,
+        difficulty=request.GET.get('difficulty') or None,
+    )
+    return JsonResponse(summary)
+
+
+def analytics_dashboard(request):
+    """Render element usage per mode and difficulty"""
+    try:
+        days = _analytics_days(request)
+    except ValueError:
+        days = 7
+    summary = analytics.element_usage(days)
+    
+    sections = []
+    for mode, by_difficulty in sorted(summary['results'].items()):
+        for difficulty, results in sorted(by_difficulty.items()):
+            rounds = sum(results.values())
+            player_picks = summary['player_picks'][mode].get(difficulty, {})
+            ai_picks = summary['ai_picks'][mode].get(difficulty, {})
+            sections.append({
+                'mode': mode,
+                'difficulty': difficulty,
+                'rounds': rounds,
+                # 'lose' is from the player's side, i.e. the AI's counter landed
+                'opponent_win_rate': round(results.get('lose', 0) * 100 / rounds, 1) if rounds else 0,
+                'elements': [{
+                    'name': key,
+                    'emoji': ELEMENTS[key]['emoji'],
+                    'player_picks': player_picks.get(key, 0),
+                    'player_share': round(player_picks.get(key, 0) * 100 / rounds, 1) if rounds else 0,
+                    'ai_picks': ai_picks.get(key, 0),
+                    'ai_share': round(ai_picks.get(key, 0) * 100 / rounds, 1) if rounds else 0,
+                } for key in get_elements_for_mode(mode)],
+            })
+    
+    return render(request, 'game/analytics.html', {
+        'days': days,
+        'since': summary['since'],
+        'sections': sections,
+    })
+
+
+@staff_member_required
+def export_data(request, dataset):
+    """
+    Stream a dataset (players, rounds, games, archived_games) for admins
+    
+    Query params: format (ndjson/csv), since, until (YYYY-MM-DD or ISO), mode
+    """
+    fmt = request.GET.get('format', 'ndjson')
+    try:
+        rows = export.export_rows(
+            dataset,
+            since=export.parse_bound(request.GET.get('since')),
+            until=export.parse_bound(request.GET.get('until'), end=True),
+            mode=request.GET.get('mode') or None,
+        )
+        lines = export.encode(rows, dataset, fmt)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{fmt}"'
+    return response
+
+
+@staff_member_required
+def profiling_status(request):
+    """
+    This worker's profiling state; POST {"rates": {url_name: percent}} sets the sampling rates
+    
+    Rates apply to the worker that serves the request (see game/profiling.py).
+    """
+    if request.method == 'POST':
+        try:
+            rates = json.loads(request.body).get('rates')
+            if not isinstance(rates, dict):
+                raise ValueError('rates must be an object of url name -> percent')
+            profiling.profiler.set_rates(rates)
+        except (ValueError, TypeError) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(profiling.status())
+
+
+@staff_member_required
+def profiling_stacks(request):
+    """
+    Sampled stacks in collapsed format (for flamegraph.pl, speedscope, ...)
+    
+    Query params: url_name (default: all), reset=1 to clear them afterwards
+    """
+    collapsed = profiling.profiler.collapsed(request.GET.get('url_name') or None)
+    if request.GET.get('reset') == '1':
+        profiling.profiler.reset()
+    response = HttpResponse(collapsed + '\n' if collapsed else '', content_type='text/plain')
+    response['X-Worker-Pid'] = str(os.getpid())
+    return response
+
+
+@staff_member_required
+def profiling_allocations(request):
+    """
+    tracemalloc growth since the baseline; POST {"action": "start" | "stop"} turns tracing on or off
+    
+    Query params: key_type (lineno, filename, traceback), limit (default 20).
+    Starting again while tracing takes a new baseline, and restarts tracing
+    if "frames" (frames kept per allocation) differs.
+    """
+    tracer = profiling.tracer
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body or b'{}')
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        action = data.get('action')
+        if action == 'start':
+            frames = data.get('frames', profiling.TRACE_FRAMES)
+            if isinstance(frames, bool) or not isinstance(frames, int) or not 1 <= frames <= profiling.MAX_TRACE_FRAMES:
+                return JsonResponse(
+                    {'error': f'frames must be an integer from 1 to {profiling.MAX_TRACE_FRAMES}'}, status=400)
+            tracer.start(frames)
+        elif action == 'stop':
+            tracer.stop()
+        else:
+            return JsonResponse({'error': 'action must be start or stop'}, status=400)
+        return JsonResponse(profiling.status())
+    
+    if not tracer.tracing:
+        return JsonResponse({'error': 'Allocation tracing is off; POST {"action": "start"} first'}, status=409)
+    key_type = request.GET.get('key_type', 'lineno')
+    if key_type not in ('lineno', 'filename', 'traceback'):
+        return JsonResponse({'error': 'key_type must be lineno, filename or traceback'}, status=400)
+    try:
+        limit = int(request.GET.get('limit', 20))
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    return JsonResponse({**tracer.diff(key_type, limit), **profiling.status()})
@@ -0,0 +1,82 @@
+"""
+Worker Warm-up
+
+Work every worker would otherwise redo on its first requests, done once in
+the gunicorn master before it forks (see gunicorn.conf.py), so the workers
+start warm and share the result copy-on-write:
+- the URL resolver (including the reverse lookups {% url %} needs) and the
+  view modules it imports
+- every template under templates/game/, compiled into the cached loader
+- the per-mode element catalogs and rule tables from game_logic
+- the idle GameAI instances the matchmaking AI fallback hands out
+- one GET of each read-only page through the full middleware stack, which
+  loads whatever the steps above missed (lazy imports, database backend
+  setup, template tag libraries)
+- optionally (leaderboard=True) the first page of each leaderboard window,
+  stored in the page cache (only shared with the workers by per-process caches
+  like the default LocMemCache; a shared cache simply keeps it)
+
+Database connections opened on the way are closed again, since a connection
+must not be shared across fork. Finally gc.freeze() moves everything loaded
+so far out of the collector's reach: collections in the workers would
+otherwise write to those objects' headers and un-share their pages.
+"""
+
+import gc
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template
+from django.test import Client, RequestFactory
+from django.urls import get_resolver
+
+from . import matchmaking, rankings
+from .game_logic import prebuild_tables
+
+WARM_PAGES = ('/', '/play/', '/pvp/', '/rules/', '/leaderboard/')
+
+
+def game_templates():
+    """Template names of every templates/game/*.html"""
+    directory = Path(settings.BASE_DIR) / 'templates'
+    return sorted(path.relative_to(directory).as_posix() for path in (directory / 'game').glob('*.html'))
+
+
+def _render_pages():
+    client = Client()
+    for path in WARM_PAGES:
+        client.get(path)
+
+
+def _leaderboard_snapshot():
+    from .views import get_leaderboard_data
+
+    factory = RequestFactory()
+    for window in ('all', *rankings.WINDOWS):
+        get_leaderboard_data(factory.get('/api/leaderboard/', {} if window == 'all' else {'window': window}))
+
+
+def warm_up(leaderboard=False):
+    """Run the warm-up steps; returns {step: seconds}"""
+    steps = [
+        ('urls', lambda: get_resolver().reverse_dict),
+        ('templates', lambda: [get_template(name) for name in game_templates()]),
+        ('rule tables', prebuild_tables),
+        ('ai opponents', matchmaking.ai_opponents.fill),
+        ('pages', _render_pages),
+    ]
+    if leaderboard:
+        steps.append(('leaderboard', _leaderboard_snapshot))
+
+    timings = {}
+    try:
+        for name, step in steps:
+            started = time.perf_counter()
+            step()
+            timings[name] = time.perf_counter() - started
+    finally:
+        connections.close_all()
+    gc.freeze()
+    return timings
@@ -0,0 +1,45 @@
+"""
+Gunicorn settings, picked up automatically from the project root (so the
+Procfile's plain `gunicorn rps_project.wsgi:application` uses them).
+
+The app is imported once in the master (preload_app) and warmed up there
+before any worker forks (game/warmup.py), so workers start with Django,
+compiled templates and game tables already in memory, shared copy-on-write.
+Environment:
+- WARMUP=0 skips the warm-up (workers still share the preloaded app)
+- WARMUP_LEADERBOARD=1 also pre-renders the first leaderboard pages
+- WEB_CONCURRENCY sets the worker count (gunicorn's own default: 1)
+- GUNICORN_THREADS sets the request threads per worker (default: 8)
+
+Workers are threaded (gthread) rather than sync. A spectator long-poll
+(/api/game/spectate/?wait=...) holds its thread while it waits, and with
+one thread per worker a few spectators would stall every player request.
+Each worker lets at most SPECTATE_MAX_WAITERS requests long-poll at once
+(see rps_project/settings.py), so keep that below GUNICORN_THREADS.
+"""
+
+import os
+
+preload_app = True
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported, before workers are spawned
+    if os.environ.get('WARMUP', '1') == '0':
+        return
+    from game.warmup import warm_up
+
+    timings = warm_up(leaderboard=os.environ.get('WARMUP_LEADERBOARD') == '1')
+    server.log.info('Warm-up done: %s', ', '.join(f'{name} {seconds * 1000:.0f}ms' for name, seconds in timings.items()))
+
+
+def post_worker_init(worker):
+    # Connections can't be inherited across fork, so open this worker's before it takes requests
+    if os.environ.get('WARMUP', '1') == '0':
+        return
+    from django.db import connections
+
+    for connection in connections.all():
+        connection.ensure_connection()
@@ -41,6 +41,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'game.middleware.ReplicaPinMiddleware',
+    'game.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'rps_project.urls'
@@ -49,8 +51,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept per process (and reloaded on change under
+            # runserver); game/warmup.py compiles them in the gunicorn master
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -74,6 +83,68 @@ DATABASES = {
     )
 }
 
+# Optional extra databases (see game/routers.py): GAMESTATE_DATABASE_URL moves the
+# hot OnlineGame/MatchmakingQueue tables to their own database (migrate it with
+# --database gamestate); REPLICA_DATABASE_URL is a read replica of default used by
+# the leaderboard, home and rules pages (on SQLite, refresh it with sync_replica)
+if os.environ.get('GAMESTATE_DATABASE_URL'):
+    DATABASES['gamestate'] = dj_database_url.parse(os.environ['GAMESTATE_DATABASE_URL'], conn_max_age=600)
+if os.environ.get('REPLICA_DATABASE_URL'):
+    DATABASES['replica'] = dj_database_url.parse(os.environ['REPLICA_DATABASE_URL'], conn_max_age=600)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['game.routers.GameRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))  # Primary-only reads after a client's write
+# Who applies ended PvP games to player stats (game/settlement.py): 'thread', 'inline' or 'command'
+SETTLEMENT_MODE = os.environ.get('SETTLEMENT_MODE', 'thread')
+# Server-side PvP round clock (game/deadlines.py); ROUND_DEADLINES=False leaves timeouts unenforced
+ROUND_DEADLINES = os.environ.get('ROUND_DEADLINES', 'True').lower() == 'true'
+ROUND_TIME_LIMIT = int(os.environ.get('ROUND_TIME_LIMIT', 15))  # Seconds to choose, shown by the client
+ROUND_DEADLINE_GRACE = float(os.environ.get('ROUND_DEADLINE_GRACE', 2))  # Extra seconds for polling and latency
+# Sampling profiler (game/profiling.py): percent of requests profiled per URL name, e.g.
+# 'play_round=5,get_game_state=1' ('*' for any); off when empty, and a malformed value stops startup
+# (game/apps.py). Admins can change it at run time.
+PROFILING_SAMPLE_RATES = os.environ.get('PROFILING_SAMPLE_RATES', '')
+PROFILING_INTERVAL = float(os.environ.get('PROFILING_INTERVAL', 0.01))  # Seconds between stack samples
+# Spectator long-polls (game/broadcast.py): the longest wait a client may ask for, and how many
+# requests per worker may be waiting at once (keep it below gunicorn's threads, see gunicorn.conf.py).
+# Past that, polls are answered at once and the client polls again a little later.
+SPECTATE_MAX_WAIT = float(os.environ.get('SPECTATE_MAX_WAIT', 15))
+SPECTATE_MAX_WAITERS = int(os.environ.get('SPECTATE_MAX_WAITERS', 4))
+
+# Cached leaderboard pages move to a new score version at most this often (seconds) while results
+# keep coming in, so a busy board is rebuilt a few times a minute rather than after every game.
+LEADERBOARD_REFRESH = float(os.environ.get('LEADERBOARD_REFRESH', 5))
+
+# Seconds a PvP searcher waits for a human before the server hands them an AI opponent (0: never)
+MATCHMAKING_AI_FALLBACK_SECONDS = float(os.environ.get('MATCHMAKING_AI_FALLBACK_SECONDS', 90))
+
+# SQLite profile: 'tuned' (WAL, relaxed fsync, IMMEDIATE write transactions and
+# lock retries; see game/sqlite.py) or 'default' (stock Django behaviour)
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'tuned')
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 5))  # Seconds to wait for the write lock
+for _database in DATABASES.values():
+    if _database['ENGINE'] == 'django.db.backends.sqlite3' and SQLITE_PROFILE == 'tuned':
+        _database.setdefault('OPTIONS', {})['timeout'] = SQLITE_BUSY_TIMEOUT
+
+# Cache
+# Leaderboard pages, opponent profiles and the like are cached here. The local-memory
+# default is per process; point CACHE_BACKEND/CACHE_LOCATION at a shared backend (e.g.
+# django.core.cache.backends.redis.RedisCache) to share them between workers.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'rps-game'),
+    },
+    # Rendered template fragments ({% cache %}, see game/fragments.py). Point
+    # FRAGMENT_CACHE_BACKEND at django.core.cache.backends.filebased.FileBasedCache
+    # (FRAGMENT_CACHE_LOCATION: a directory) to share them between workers.
+    'template_fragments': {
+        'BACKEND': os.environ.get('FRAGMENT_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('FRAGMENT_CACHE_LOCATION', 'rps-fragments'),
+    },
+}
+STATIC_PAGE_MAX_AGE = int(os.environ.get('STATIC_PAGE_MAX_AGE', 30 * 24 * 3600))  # Browser/proxy cache for pages like /rules/
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {